@@ -0,0 +1,81 @@
+import os, sys
+import shutil
+import utilities
+
+## Content-addressed store for the simulation files shared between configs (topology, pod id map, WCMP weights and
+## flow arrivals files). Every distinct file is stored once under the digest of its contents, and is hard-linked (or
+## copied, where hard links are not supported) to every path that needs it. The store also caches which artifact
+## digest was produced from which inputs, so an artifact whose inputs are unchanged is never regenerated.
+## The cache holds one small file per input digest, so several processes can use the same store concurrently.
+class ArtifactStore(object):
+	def __init__(self, root_directory):
+		self.root_directory = root_directory
+		self.objects_directory = os.path.join(root_directory, "objects")
+		self.cache_directory = os.path.join(root_directory, "cache")
+		self.temporary_directory = os.path.join(root_directory, "tmp")
+		for directory in (self.objects_directory, self.cache_directory, self.temporary_directory):
+			if not os.path.isdir(directory):
+				try:
+					os.makedirs(directory)
+				except OSError:
+					# Another process created it in the meantime.
+					if not os.path.isdir(directory):
+						raise
+		return
+
+	def get_object_filename(self, digest):
+		return os.path.join(self.objects_directory, digest[:2], digest[2:])
+
+	def has_object(self, digest):
+		return os.path.isfile(self.get_object_filename(digest))
+
+	# Stores the artifact written by write_function, which is called with an open file object, and returns its digest.
+	# If an identical artifact is already stored, the new copy is discarded.
+	def put(self, write_function):
+		temporary_filename = os.path.join(self.temporary_directory, "artifact.tmp{}".format(os.getpid()))
+		with open(temporary_filename, "w+") as f:
+			write_function(f)
+		digest = utilities.compute_file_digest(temporary_filename)
+		object_filename = self.get_object_filename(digest)
+		if os.path.isfile(object_filename):
+			os.remove(temporary_filename)
+		else:
+			if not os.path.isdir(os.path.dirname(object_filename)):
+				try:
+					os.makedirs(os.path.dirname(object_filename))
+				except OSError:
+					if not os.path.isdir(os.path.dirname(object_filename)):
+						raise
+			os.rename(temporary_filename, object_filename)
+		return digest
+
+	# Makes destination_filename refer to the stored artifact with the given digest, replacing any previous file atomically.
+	def link(self, digest, destination_filename):
+		object_filename = self.get_object_filename(digest)
+		if os.path.isfile(destination_filename) and os.path.samefile(object_filename, destination_filename):
+			return
+		temporary_filename = "{}.tmp{}".format(destination_filename, os.getpid())
+		if os.path.lexists(temporary_filename):
+			os.remove(temporary_filename)
+		try:
+			os.link(object_filename, temporary_filename)
+		except (OSError, AttributeError):
+			shutil.copyfile(object_filename, temporary_filename)
+		os.rename(temporary_filename, destination_filename)
+		return
+
+	# Returns the digest of the artifact that was produced from inputs with the given digest, or None if it is not cached.
+	def lookup(self, input_digest):
+		cache_filename = os.path.join(self.cache_directory, input_digest)
+		if not os.path.isfile(cache_filename):
+			return None
+		with open(cache_filename, "r") as f:
+			digest = f.read().strip()
+		if not self.has_object(digest):
+			return None
+		return digest
+
+	# Records that the artifact with the given digest was produced from inputs with the given input digest.
+	def record(self, input_digest, digest):
+		utilities.write_file_atomically(os.path.join(self.cache_directory, input_digest), lambda f: f.write(digest))
+		return
@@ -0,0 +1,237 @@
+import os, sys
+import argparse
+import json
+import multiprocessing
+import numpy as np
+import quantile_sketch
+import results_store
+import utilities
+
+## Flow completion time (FCT) summaries of the sweep, computed from the columnar results store in one streaming pass.
+## The completed flows of every run are binned by size, and each (app, topology, load, reconfiguration type,
+## reconfiguration period, size bucket) group keeps a REQ sketch of its FCTs and one of its slowdowns, so the memory
+## footprint only depends on the number of groups. Runs are summarized on a pool of worker processes and their sketches
+## merged, and summaries saved to disk can be merged with the summaries of other runs later on.
+## The slowdown of a flow is its FCT over the time it would take on an idle network: its serialization at the link
+## bandwidth of the run, plus the delay of the two server links it crosses at least.
+
+# Edges of the flow size buckets, in bytes; the last bucket is unbounded.
+FLOW_SIZE_BUCKET_EDGES_BYTES = [0, 10000, 100000, 1000000, 10000000]
+SUMMARY_QUANTILES = (0.5, 0.99, 0.999)
+METRICS = ("fct", "slowdown")
+# Sweep parameters of a group, followed by its size bucket.
+GROUP_PARAMETERS = ("app", "topology", "load", "reconfiguration_type", "reconfiguration_period_ns")
+
+# Formats a number of bytes, e.g. 10000 as 10KB.
+def format_num_bytes(num_bytes):
+	for unit, scale in (("GB", 1000000000), ("MB", 1000000), ("KB", 1000)):
+		if num_bytes >= scale and num_bytes % scale == 0:
+			return "{}{}".format(num_bytes // scale, unit)
+	return "{}B".format(num_bytes)
+
+# Names of the size buckets, e.g. "10KB-100KB", the last one being e.g. "10MB+".
+def get_size_bucket_names(size_bucket_edges):
+	names = ["{}-{}".format(format_num_bytes(low), format_num_bytes(high)) for low, high in zip(size_bucket_edges[:-1], size_bucket_edges[1:])]
+	return names + ["{}+".format(format_num_bytes(size_bucket_edges[-1]))]
+
+# Returns the idle network duration of flows of the given sizes, in ns, from the link parameters of a run.
+def compute_ideal_durations_ns(flow_sizes_bytes, run_properties):
+	link_bandwidth_bit_per_ns = float(run_properties["link_bandwidth_bit_per_ns"])
+	server_link_delay_ns = float(run_properties.get("server_link_delay_ns", 0))
+	return np.asarray(flow_sizes_bytes, dtype=np.float64) * 8 / link_bandwidth_bit_per_ns + 2 * server_link_delay_ns
+
+class FlowCompletionSummary(object):
+	def __init__(self, size_bucket_edges=FLOW_SIZE_BUCKET_EDGES_BYTES, k=quantile_sketch.DEFAULT_K):
+		assert(list(size_bucket_edges) == sorted(size_bucket_edges))
+		self.size_bucket_edges = list(size_bucket_edges)
+		self.size_bucket_names = get_size_bucket_names(self.size_bucket_edges)
+		self.k = k
+		# Maps every group key, the values of GROUP_PARAMETERS followed by the size bucket name, to its statistics.
+		self.groups = {}
+		return
+
+	# Retrieves the statistics of a group, creating them if needed.
+	def get_group(self, group_key):
+		if group_key not in self.groups:
+			self.groups[group_key] = {"num_flows": 0, "num_incomplete_flows": 0,
+									"fct": quantile_sketch.ReqSketch(k=self.k),
+									"slowdown": quantile_sketch.ReqSketch(k=self.k)}
+		return self.groups[group_key]
+
+	# Adds a batch of flows of a run. Incomplete flows are only counted.
+	def add_flows(self, run_parameters, durations_ns, flow_sizes_bytes, completed, ideal_durations_ns):
+		durations_ns = np.asarray(durations_ns, dtype=np.float64)
+		flow_sizes_bytes = np.asarray(flow_sizes_bytes)
+		completed = np.asarray(completed, dtype=bool)
+		buckets = np.searchsorted(self.size_bucket_edges, flow_sizes_bytes, side="right") - 1
+		# Sizes below the first edge go to the first bucket.
+		buckets = np.maximum(buckets, 0)
+		run_key = tuple(run_parameters[name] for name in GROUP_PARAMETERS)
+		for bucket in np.unique(buckets):
+			group = self.get_group(run_key + (self.size_bucket_names[bucket],))
+			in_bucket = buckets == bucket
+			completed_in_bucket = in_bucket & completed
+			group["num_flows"] += int(in_bucket.sum())
+			group["num_incomplete_flows"] += int(in_bucket.sum() - completed_in_bucket.sum())
+			group["fct"].update(durations_ns[completed_in_bucket])
+			group["slowdown"].update(durations_ns[completed_in_bucket] / np.asarray(ideal_durations_ns, dtype=np.float64)[completed_in_bucket])
+		return
+
+	# Adds the flows of a run of a results_store.ResultsStore, chunk_size flows at a time.
+	def add_run(self, store, run_parameters, chunk_size=1 << 20):
+		flows = store.load_flows(run_parameters["key"], columns=("duration", "total_size_bytes", "completed"))
+		run_properties = results_store.read_properties_file(run_parameters["properties_filename"])
+		for chunk_start in range(0, len(flows["duration"]), chunk_size):
+			chunk = slice(chunk_start, chunk_start + chunk_size)
+			self.add_flows(run_parameters, flows["duration"][chunk], flows["total_size_bytes"][chunk], flows["completed"][chunk],
+							compute_ideal_durations_ns(flows["total_size_bytes"][chunk], run_properties))
+		return
+
+	# Merges other into this summary; other is left unchanged.
+	def merge(self, other):
+		assert(self.size_bucket_edges == other.size_bucket_edges and self.k == other.k)
+		for group_key, other_group in other.groups.items():
+			group = self.get_group(group_key)
+			group["num_flows"] += other_group["num_flows"]
+			group["num_incomplete_flows"] += other_group["num_incomplete_flows"]
+			for metric in METRICS:
+				group[metric].merge(other_group[metric])
+		return self
+
+	# Returns the group keys that match the filters, sorted. The filters are names of GROUP_PARAMETERS or "size_bucket",
+	# each with either a value or a list of values.
+	def get_group_keys(self, **filters):
+		parameter_names = GROUP_PARAMETERS + ("size_bucket",)
+		for name in filters:
+			assert(name in parameter_names), "Unknown group parameter {}".format(name)
+		group_keys = []
+		for group_key in self.groups:
+			matches = True
+			for name, value in filters.items():
+				values = value if isinstance(value, (list, tuple, set)) else (value,)
+				if group_key[parameter_names.index(name)] not in values:
+					matches = False
+					break
+			if matches:
+				group_keys.append(group_key)
+		# Sorted by parameters (None last), then by increasing flow size.
+		return sorted(group_keys, key=lambda group_key: tuple((value is None, value) for value in group_key[:-1]) + (self.size_bucket_names.index(group_key[-1]),))
+
+	# Returns a sketch of the given metric over all the groups that match the filters (e.g. all the size buckets of a run).
+	def get_sketch(self, metric, **filters):
+		assert(metric in METRICS)
+		sketch = quantile_sketch.ReqSketch(k=self.k)
+		for group_key in self.get_group_keys(**filters):
+			sketch.merge(self.groups[group_key][metric])
+		return sketch
+
+	# Returns the estimated CDF of the metric over the groups that match the filters, as (values, fractions).
+	def get_cdf(self, metric, num_points=None, **filters):
+		return self.get_sketch(metric, **filters).get_cdf_points(num_points)
+
+	# Returns one row per group, with its parameters, flow counts, and the given quantiles of every metric.
+	def get_summary_rows(self, quantiles=SUMMARY_QUANTILES):
+		rows = []
+		for group_key in self.get_group_keys():
+			group = self.groups[group_key]
+			row = dict(zip(GROUP_PARAMETERS + ("size_bucket",), group_key))
+			row["num_flows"] = group["num_flows"]
+			row["num_incomplete_flows"] = group["num_incomplete_flows"]
+			for metric in METRICS:
+				estimates = group[metric].get_quantiles(quantiles) if group[metric].get_count() > 0 else [float("nan")] * len(quantiles)
+				for quantile, estimate in zip(quantiles, estimates):
+					row["{}_p{}".format(metric, format_quantile(quantile))] = float(estimate)
+			rows.append(row)
+		return rows
+
+	# Writes the summary rows as a CSV file.
+	def write_summary_file(self, summary_filename, quantiles=SUMMARY_QUANTILES):
+		columns = list(GROUP_PARAMETERS) + ["size_bucket", "num_flows", "num_incomplete_flows"]
+		columns += ["{}_p{}".format(metric, format_quantile(quantile)) for metric in METRICS for quantile in quantiles]
+		def write_rows(f):
+			f.write(",".join(columns) + "\n")
+			for row in self.get_summary_rows(quantiles):
+				f.write(",".join(str(row[column]) for column in columns) + "\n")
+		utilities.write_file_atomically(summary_filename, write_rows)
+		return
+
+	## Saving and loading the sketches, e.g. to merge the summaries of sweeps ingested in different stores.
+	def save(self, filename):
+		groups = [{"key": list(group_key),
+				"num_flows": group["num_flows"],
+				"num_incomplete_flows": group["num_incomplete_flows"],
+				"fct": group["fct"].to_dict(),
+				"slowdown": group["slowdown"].to_dict()} for group_key, group in self.groups.items()]
+		utilities.write_file_atomically(filename, lambda f: json.dump({"size_bucket_edges": self.size_bucket_edges, "k": self.k, "groups": groups}, f))
+		return
+
+	@classmethod
+	def load(cls, filename):
+		with open(filename, "r") as f:
+			summary_dict = json.load(f)
+		summary = cls(size_bucket_edges=summary_dict["size_bucket_edges"], k=summary_dict["k"])
+		for group_dict in summary_dict["groups"]:
+			summary.groups[tuple(group_dict["key"])] = {"num_flows": group_dict["num_flows"],
+														"num_incomplete_flows": group_dict["num_incomplete_flows"],
+														"fct": quantile_sketch.ReqSketch.from_dict(group_dict["fct"]),
+														"slowdown": quantile_sketch.ReqSketch.from_dict(group_dict["slowdown"])}
+		return summary
+
+# Formats a quantile as a percentile, e.g. 0.999 as 99.9.
+def format_quantile(quantile):
+	return "{:g}".format(round(quantile * 100, 6))
+
+# Summarizes a single run in a worker process.
+def _summarize_run(task):
+	store_directory, run_parameters, size_bucket_edges, k = task
+	summary = FlowCompletionSummary(size_bucket_edges=size_bucket_edges, k=k)
+	summary.add_run(results_store.ResultsStore(store_directory), run_parameters)
+	return summary
+
+# Summarizes the runs of the store in store_directory that match the filters (see ResultsStore.list_runs), on
+# num_processes worker processes (one per core by default).
+def summarize_store(store_directory, num_processes=None, size_bucket_edges=FLOW_SIZE_BUCKET_EDGES_BYTES, k=quantile_sketch.DEFAULT_K, **filters):
+	summary = FlowCompletionSummary(size_bucket_edges=size_bucket_edges, k=k)
+	tasks = [(store_directory, run_parameters, size_bucket_edges, k) for run_parameters in results_store.ResultsStore(store_directory).list_runs(**filters)]
+	if num_processes is None:
+		num_processes = multiprocessing.cpu_count()
+	if num_processes <= 1 or len(tasks) <= 1:
+		for task in tasks:
+			summary.merge(_summarize_run(task))
+	else:
+		pool = multiprocessing.Pool(processes=min(num_processes, len(tasks)))
+		try:
+			for run_summary in pool.imap_unordered(_summarize_run, tasks):
+				summary.merge(run_summary)
+		finally:
+			pool.close()
+			pool.join()
+	return summary
+
+if __name__ == "__main__":
+	default_store_directory = os.path.join(os.getenv("NETBENCH_HOME", "."), "temp", "multi_eval", "results_store")
+	parser = argparse.ArgumentParser(description="Summarizes the flow completion times of the results store per app, topology, load, period and flow size.")
+	parser.add_argument("--store-directory", default=default_store_directory)
+	parser.add_argument("--workers", type=int, default=None, help="Number of summarizing processes (default: number of cores).")
+	parser.add_argument("--apps", nargs="+", default=None)
+	parser.add_argument("--topologies", nargs="+", default=None)
+	parser.add_argument("--quantiles", type=float, nargs="+", default=SUMMARY_QUANTILES)
+	parser.add_argument("--merge", nargs="+", default=[], help="Saved summaries (see --save) to merge into the summary.")
+	parser.add_argument("--save", default=None, help="Save the sketches of the summary to this file.")
+	parser.add_argument("--output", default=None, help="CSV file of the summary table (default: print it).")
+	args = parser.parse_args()
+	filters = {}
+	if args.apps is not None:
+		filters["app"] = args.apps
+	if args.topologies is not None:
+		filters["topology"] = args.topologies
+	summary = summarize_store(args.store_directory, num_processes=args.workers, **filters)
+	for summary_filename in args.merge:
+		summary.merge(FlowCompletionSummary.load(summary_filename))
+	if args.save is not None:
+		summary.save(args.save)
+	if args.output is not None:
+		summary.write_summary_file(args.output, args.quantiles)
+	else:
+		for row in summary.get_summary_rows(args.quantiles):
+			print(row)
@@ -1,7 +1,11 @@
 import os, sys
-import traffic_events
+import argparse
+import multiprocessing
 from network_topology import *
 import utilities
+import simulation_scheduler
+import artifact_store
+import reconfiguration_schedule
 
 ####################################################################################################
 # Simulation parameters 
@@ -33,6 +37,23 @@ GENERATED_CONFIGS = []
 # Reconfiguration timing related
 RECONFIGURATION_PERIODS_NS = [1000, 10000, 100000]
 
+# Number of epochs of the offline reconfiguration schedules (see reconfiguration_schedule), after which they repeat.
+SCHEDULE_NUM_EPOCHS = 64
+# Topologies that can be run on offline reconfiguration schedules, added to the sweep by --preplanned-schedules.
+PREPLANNED_TOPOLOGY_NAMES = ["prn", "prn_da"]
+
+# Sweep related
+APPS = ["AMG", "AMR", "MiniDFT"]
+TOPOLOGY_NAMES = ["prn", "trn", "fattree", "exp"]
+# PRN with an initial interpod topology optimized for the pod traffic of each app, added to the sweep by --demand-aware.
+DEMAND_AWARE_TOPOLOGY_NAMES = ["prn_da"]
+LOAD_LEVELS = [10, 30, 50, 70, 90]
+
+# Records the input and content digests of every generated .properties file, so that re-runs only regenerate what changed.
+MANIFEST_FILENAME = BASE_DIRECTORY + "/manifest.json"
+# Content-addressed store holding a single copy of every distinct topology, pod id map, WCMP weights and flow arrivals file.
+ARTIFACT_STORE_DIRECTORY = BASE_DIRECTORY + "/artifact_store"
+
 property_dictionary = {"num_vcs": 2,
 						"input_queue_size_bytes": INPUT_QUEUE_BUFFER_SIZE_BYTES,
 						"output_port_queue_size_bytes": OUTPUT_QUEUE_BUFFER_SIZE_BYTES,
@@ -60,155 +81,248 @@ def get_topology_params_based_on_app(app_name):
 	if app_name == "MiniDFT":
 		topology_params["fattree"] = (23, 11)
 		topology_params["prn"] = (23, 11)
+		topology_params["prn_da"] = (23, 11)
 		topology_params["trn"] = 122
 		topology_params["exp"] = 122
 	elif app_name in ("AMG", "AMR"):
 		topology_params["fattree"] = (14, 8)
 		topology_params["prn"] = (14, 8)
+		topology_params["prn_da"] = (14, 8)
 		topology_params["trn"] = 108
 		topology_params["exp"] = 108
 	return topology_params
 
-'''
-Sets up the experiment based on parameters.
-'''
-if __name__ == "__main__":
-	# Step 1: Read in the traffic probability file, using the maximum rank as the number of nodes required.
-	app_traffic_probabilities = {}
-	app_nnodes = {}
-	for app in ["AMG", "AMR", "MiniDFT"]:
-		traffic_probabilities, nnodes = utilities.read_traffic_probability_file("traffic_probabilities/{}.txt".format(app))
-		app_traffic_probabilities[app] = traffic_probabilities
-		app_nnodes[app] = nnodes
-	# Step 2: Create the directories.
-	for app in ["AMG", "AMR", "MiniDFT"]:
-		if not os.path.isdir("{}/{}".format(BASE_DIRECTORY, app)):
-			os.mkdir("{}/{}".format(BASE_DIRECTORY, app))
-		for topology_name in ["fattree", "prn", "trn", "exp"]:
-			if not os.path.isdir("{}/{}/{}".format(BASE_DIRECTORY, app, topology_name)):
-				os.mkdir("{}/{}/{}".format(BASE_DIRECTORY, app, topology_name))
-	# Step 3: Generate the .property files and other requisite files needed for simulations.
-	for app in ["AMG", "AMR", "MiniDFT"]:
-		# Compute the flow arrivals based on each app's number of nodes required.
-		nnodes = app_nnodes[app]
-
-		num_arrivals_per_sec_list = []
-		for load in [10, 30, 50, 70, 90]:
-			load_frac = float(load)/100
-			num_flow_arrivals_per_sec = int((load_frac * nnodes * NETWORK_LINK_BANDWIDTH_GBPS * 1E9 / 8. / 2434900))
-			num_arrivals_per_sec_list.append(num_flow_arrivals_per_sec)
+# Computes the number of flow arrivals per second for each load level, based on the app's number of nodes required.
+def compute_num_arrivals_per_sec(nnodes, load_levels):
+	num_arrivals_per_sec_list = []
+	for load in load_levels:
+		load_frac = float(load)/100
+		num_flow_arrivals_per_sec = int((load_frac * nnodes * NETWORK_LINK_BANDWIDTH_GBPS * 1E9 / 8. / 2434900))
+		num_arrivals_per_sec_list.append(num_flow_arrivals_per_sec)
+	return num_arrivals_per_sec_list
+
+# Instantiates the (unwired) topology of the given name, using the topology parameters of the app. Demand-aware
+# topologies also need the app's traffic probabilities.
+def build_topology(topology_name, topology_params, traffic_probabilities=None):
+	if topology_name == "fattree":
+		return fattree_network_topology.FatTreeNetworkTopology(EPS_RADIX, topology_params[0], topology_params[1])
+	elif topology_name == "exp":
+		return static_expander_network_topology.StaticExpanderNetworkTopology(TOR_EPS_RADIX, topology_params, num_servers_per_tor=EPS_RADIX)
+	elif topology_name == "trn":
+		return sparse_reconfigurable_network_topology.SparseReconfigurableNetworkTopology(TOR_EPS_RADIX, topology_params, num_servers_per_tor=EPS_RADIX)
+	elif topology_name == "prn":
+		return dense_reconfigurable_network_topology.DenseReconfigurableNetworkTopology(EPS_RADIX, topology_params[0], topology_params[0], oversubscription_ratio=OVERSUBSCRIPTION_RATIO)
+	elif topology_name == "prn_da":
+		assert(traffic_probabilities is not None), "Demand-aware topologies need the traffic probabilities"
+		topology = dense_reconfigurable_network_topology.DenseReconfigurableNetworkTopology(EPS_RADIX, topology_params[0], topology_params[0], oversubscription_ratio=OVERSUBSCRIPTION_RATIO)
+		topology.optimize_interpod_link_matrix(traffic_probabilities)
+		return topology
+	raise Exception("Unknown topology: {}".format(topology_name))
 
+## Expands the sweep over apps x topologies x loads x reconfiguration periods into independent job descriptors, one per
+## (app, topology). Each job wires its topology once, and writes the files shared by all of its loads and periods.
+## If preplanned_schedules is set, the jobs of PREPLANNED_TOPOLOGY_NAMES also write an offline reconfiguration schedule per
+## period, and a preplanned run of each load and period on it.
+def expand_sweep_jobs(apps, topology_names, load_levels, reconfiguration_periods_ns, preplanned_schedules=False):
+	jobs = []
+	for app in apps:
+		traffic_probability_filename = "traffic_probabilities/{}.txt".format(app)
+		traffic_probability_digest = utilities.compute_file_digest(traffic_probability_filename)
 		topology_params = get_topology_params_based_on_app(app)
-		fattree_topology = fattree_network_topology.FatTreeNetworkTopology(EPS_RADIX, topology_params["fattree"][0], topology_params["fattree"][1])
-		exp_topology = static_expander_network_topology.StaticExpanderNetworkTopology(TOR_EPS_RADIX, topology_params["exp"], num_servers_per_tor=EPS_RADIX)
-		trn_topology = sparse_reconfigurable_network_topology.SparseReconfigurableNetworkTopology(TOR_EPS_RADIX, topology_params["trn"], num_servers_per_tor=EPS_RADIX)
-		prn_topology = dense_reconfigurable_network_topology.DenseReconfigurableNetworkTopology(EPS_RADIX, topology_params["prn"][0], topology_params["prn"][0], oversubscription_ratio=OVERSUBSCRIPTION_RATIO)
-		# Wire all topology instances.
-		fattree_topology.wire_network()
-		exp_topology.wire_network()
-		trn_topology.wire_network()
-		prn_topology.wire_network()
-		for topology, topology_name in zip([prn_topology, trn_topology, fattree_topology, exp_topology], ["prn", "trn", "fattree", "exp"]):
-			output_base_dir = "{}/{}/{}".format(BASE_DIRECTORY, app, topology_name)
-			# Set the number of reconfigurable uplinks per pod
-			property_dictionary["num_reconfigurable_uplinks_per_pod"] = topology.get_num_reconfigurable_uplinks_per_pod()
-			# For each topology, get its own shifted traffic probability file, initial topology file, pod id file, wcmp routing weights name
-			# Topology file
-			topology_filename = "{}/{}/{}/initial_topology.topology".format(BASE_DIRECTORY, app, topology_name)
-			topology_file_string = topology.generate_topology_file_string()
-			with open(topology_filename, "w+") as f:
-				f.write(topology_file_string)
-			# Pod id map file
-			pod_id_map_filename = "{}/{}/{}/pod_id_map.txt".format(BASE_DIRECTORY, app, topology_name)
-			pod_id_map_string = topology.generate_pod_id_file_string()
-			with open(pod_id_map_filename, "w+") as f:
-				f.write(pod_id_map_string)
-			# WCMP routing weights file
-			routing_path_split_ratio_filename = "{}/{}/{}/initial_wcmp_weights.txt".format(BASE_DIRECTORY, app, topology_name)
-			routing_path_split_ratio_string = topology.generate_initial_interpod_routing_weights_string()	
-			with open(routing_path_split_ratio_filename, "w+") as f:
-				f.write(routing_path_split_ratio_string)
-			# Traffic probability file
-			reshifted_traffic_prob_filename = "{}/{}/{}/flow_arrivals.txt".format(BASE_DIRECTORY, app, topology_name)
-			reshifted_traffic_prob_str = topology.generate_traffic_events_string(app_traffic_probabilities[app])
-			with open(reshifted_traffic_prob_filename, "w+") as f:
-				f.write(reshifted_traffic_prob_str)
-			# Iterate over all the loads
-			for load_level, num_arrivals_per_sec in zip([10, 30, 50, 70, 90], num_arrivals_per_sec_list):
-				load_name = "load{}perc".format(load_level)
-				if topology_name == "prn":
-					property_dictionary["reconfiguration_granularity"] = "pod"
-					property_dictionary["reconfiguration_type"] = "on_demand"
-					for reconfig_period_ns in RECONFIGURATION_PERIODS_NS:
-						reconfig_period_str = utilities.extract_timing_string(reconfig_period_ns)
-						property_dictionary["reconfiguration_period_ns"] = reconfig_period_ns
-						# Write the .properties on demand
-						config_file_strings = utilities.write_simulation_configuration_file(output_base_dir,
-																				"rp" + reconfig_period_str,
-																				topology_filename, 
-																				reshifted_traffic_prob_filename, 
-																				routing_path_split_ratio_filename,  
-																				pod_id_map_filename, 
-																				num_arrivals_per_sec,
-																				property_dictionary)
-						simulation_config_filename = "{}/{}/{}/{}_rp{}.properties".format(BASE_DIRECTORY, app, topology_name, load_name, reconfig_period_str)
-						with open(simulation_config_filename, "w+") as f:
-							f.write(config_file_strings)
-						GENERATED_CONFIGS.append(simulation_config_filename)
-				elif topology_name == "trn":
-					property_dictionary["reconfiguration_granularity"] = "tor"
-					for reconfig_period_ns in RECONFIGURATION_PERIODS_NS:
-						reconfig_period_str = utilities.extract_timing_string(reconfig_period_ns)
-						property_dictionary["reconfiguration_period_ns"] = reconfig_period_ns
-						# Write the .properties for on_demand
-						property_dictionary["reconfiguration_type"] = "on_demand"
-						config_file_strings = utilities.write_simulation_configuration_file(output_base_dir,
-																				"rp" + reconfig_period_str + "_demand",
-																				topology_filename, 
-																				reshifted_traffic_prob_filename, 
-																				routing_path_split_ratio_filename,  
-																				pod_id_map_filename, 
-																				num_arrivals_per_sec,
-																				property_dictionary)
-						simulation_config_filename = "{}/{}/{}/{}_rp{}_demand.properties".format(BASE_DIRECTORY, app, topology_name, load_name, reconfig_period_str)
-						with open(simulation_config_filename, "w+") as f:
-							f.write(config_file_strings)
-						GENERATED_CONFIGS.append(simulation_config_filename)
-						# Write the .properties for rotation
-						property_dictionary["reconfiguration_type"] = "rotation"
-						config_file_strings = utilities.write_simulation_configuration_file(output_base_dir,
-																				"rp" + reconfig_period_str + "_rotation",
-																				topology_filename, 
-																				reshifted_traffic_prob_filename, 
-																				routing_path_split_ratio_filename,  
-																				pod_id_map_filename, 
-																				num_arrivals_per_sec,
-																				property_dictionary)
-						simulation_config_filename = "{}/{}/{}/{}_rp{}_rotate.properties".format(BASE_DIRECTORY, app, topology_name, load_name, reconfig_period_str)
-						with open(simulation_config_filename, "w+") as f:
-							f.write(config_file_strings)
-						GENERATED_CONFIGS.append(simulation_config_filename)
-				else:
-					if topology_name == "exp":
-						property_dictionary["reconfiguration_granularity"] = "tor"
-					else:
-						property_dictionary["reconfiguration_granularity"] = "fattree"
-					property_dictionary["reconfiguration_type"] = "static"
-					# Static topologies
-					# Write the .properties
-					config_file_strings = utilities.write_simulation_configuration_file(output_base_dir,
-																			"results",
-																			topology_filename, 
-																			reshifted_traffic_prob_filename, 
-																			routing_path_split_ratio_filename,  
-																			pod_id_map_filename, 
+		for topology_name in topology_names:
+			jobs.append({"app": app,
+						"topology_name": topology_name,
+						"topology_params": topology_params[topology_name],
+						"eps_radix": EPS_RADIX,
+						"tor_eps_radix": TOR_EPS_RADIX,
+						"oversubscription_ratio": OVERSUBSCRIPTION_RATIO,
+						"traffic_probability_filename": traffic_probability_filename,
+						"traffic_probability_digest": traffic_probability_digest,
+						"load_levels": list(load_levels),
+						"reconfiguration_periods_ns": list(reconfiguration_periods_ns),
+						"preplanned_schedules": preplanned_schedules and topology_name in PREPLANNED_TOPOLOGY_NAMES,
+						"property_dictionary": dict(property_dictionary),
+						"output_base_dir": "{}/{}/{}".format(BASE_DIRECTORY, app, topology_name),
+						})
+	return jobs
+
+# Generates the (filename, contents) of every .properties file of a job, in the order they are run. schedule_filenames maps
+# each reconfiguration period to the schedule file of its preplanned runs, if the job has any.
+def generate_job_properties(job, topology, artifact_filenames, num_arrivals_per_sec_list, schedule_filenames=None):
+	output_base_dir = job["output_base_dir"]
+	topology_name = job["topology_name"]
+	# Each job works on its own copy of the properties, so that jobs never interfere with each other.
+	job_property_dictionary = dict(job["property_dictionary"])
+	job_property_dictionary["num_reconfigurable_uplinks_per_pod"] = topology.get_num_reconfigurable_uplinks_per_pod()
+	properties_files = []
+	# Every run writes its results to the folder named after its .properties file, which is distinct for every load and period.
+	def add_properties_file(simulation_config_filename, num_arrivals_per_sec):
+		run_folder_name = os.path.splitext(os.path.basename(simulation_config_filename))[0]
+		config_file_strings = utilities.write_simulation_configuration_file(output_base_dir,
+																			run_folder_name,
+																			artifact_filenames["topology"],
+																			artifact_filenames["traffic"],
+																			artifact_filenames["wcmp"],
+																			artifact_filenames["pod_id_map"],
 																			num_arrivals_per_sec,
-																			property_dictionary)
-					simulation_config_filename = "{}/{}/{}/{}.properties".format(BASE_DIRECTORY, app, topology_name, load_name)
-					with open(simulation_config_filename, "w+") as f:
-						f.write(config_file_strings)
-					GENERATED_CONFIGS.append(simulation_config_filename)
-	generate_bash_script(GENERATED_CONFIGS)
-	
+																			job_property_dictionary)
+		properties_files.append((simulation_config_filename, config_file_strings))
+	# Iterate over all the loads
+	for load_level, num_arrivals_per_sec in zip(job["load_levels"], num_arrivals_per_sec_list):
+		load_name = "load{}perc".format(load_level)
+		if topology_name in ("prn", "prn_da"):
+			job_property_dictionary["reconfiguration_granularity"] = "pod"
+			for reconfig_period_ns in job["reconfiguration_periods_ns"]:
+				reconfig_period_str = utilities.extract_timing_string(reconfig_period_ns)
+				job_property_dictionary["reconfiguration_period_ns"] = reconfig_period_ns
+				# Write the .properties on demand
+				job_property_dictionary["reconfiguration_type"] = "on_demand"
+				add_properties_file("{}/{}_rp{}.properties".format(output_base_dir, load_name, reconfig_period_str), num_arrivals_per_sec)
+				# Write the .properties for the offline schedule
+				if schedule_filenames:
+					job_property_dictionary["reconfiguration_type"] = "preplanned"
+					job_property_dictionary["reconfiguration_schedule_filename"] = schedule_filenames[reconfig_period_ns]
+					add_properties_file("{}/{}_rp{}_preplanned.properties".format(output_base_dir, load_name, reconfig_period_str), num_arrivals_per_sec)
+		elif topology_name == "trn":
+			job_property_dictionary["reconfiguration_granularity"] = "tor"
+			for reconfig_period_ns in job["reconfiguration_periods_ns"]:
+				reconfig_period_str = utilities.extract_timing_string(reconfig_period_ns)
+				job_property_dictionary["reconfiguration_period_ns"] = reconfig_period_ns
+				# Write the .properties for on_demand
+				job_property_dictionary["reconfiguration_type"] = "on_demand"
+				add_properties_file("{}/{}_rp{}_demand.properties".format(output_base_dir, load_name, reconfig_period_str), num_arrivals_per_sec)
+				# Write the .properties for rotation
+				job_property_dictionary["reconfiguration_type"] = "rotation"
+				add_properties_file("{}/{}_rp{}_rotate.properties".format(output_base_dir, load_name, reconfig_period_str), num_arrivals_per_sec)
+		else:
+			if topology_name == "exp":
+				job_property_dictionary["reconfiguration_granularity"] = "tor"
+			else:
+				job_property_dictionary["reconfiguration_granularity"] = "fattree"
+			job_property_dictionary["reconfiguration_type"] = "static"
+			# Static topologies
+			# Write the .properties
+			add_properties_file("{}/{}.properties".format(output_base_dir, load_name), num_arrivals_per_sec)
+	return properties_files
 
+## Runs a single (app, topology) job: writes its topology, pod id map, WCMP weights and flow arrivals files, then the
+## .properties files of all loads and periods. The shared files are taken from the artifact store, keyed by the inputs they
+## depend on, and hard-linked into the job's directory; identical files of different apps are therefore stored once, and the
+## topology is only wired if its files are not cached. The .properties files are only rewritten if their contents change.
+## Every file is written atomically, so a job interrupted midway is simply redone on the next run.
+## Returns the list of .properties filenames and the manifest entries of the .properties files that were (re)written.
+def run_sweep_job(job_and_manifest_entries):
+	job, manifest_entries = job_and_manifest_entries
+	output_base_dir = job["output_base_dir"]
+	if not os.path.isdir(output_base_dir):
+		os.makedirs(output_base_dir)
+	store = artifact_store.ArtifactStore(ARTIFACT_STORE_DIRECTORY)
+	artifact_filenames = {"topology": "{}/initial_topology.topology".format(output_base_dir),
+							"pod_id_map": "{}/pod_id_map.txt".format(output_base_dir),
+							"wcmp": "{}/initial_wcmp_weights.txt".format(output_base_dir),
+							"traffic": "{}/flow_arrivals.txt".format(output_base_dir)}
+	# The wiring only depends on the topology, unless it is demand-aware, the flow arrivals also depend on the app's traffic.
+	topology_description = dict((key, job[key]) for key in ("topology_name", "topology_params", "eps_radix", "tor_eps_radix", "oversubscription_ratio"))
+	artifact_input_digests = {}
+	for name in artifact_filenames:
+		artifact_inputs = {"artifact": name, "topology": topology_description, "wiring_version": network_topology.WIRING_VERSION}
+		if name == "traffic" or job["topology_name"] in DEMAND_AWARE_TOPOLOGY_NAMES:
+			artifact_inputs["traffic_probability_digest"] = job["traffic_probability_digest"]
+		artifact_input_digests[name] = utilities.compute_input_digest(artifact_inputs)
+	artifact_digests = {}
+	if not job["force"]:
+		for name in artifact_filenames:
+			artifact_digests[name] = store.lookup(artifact_input_digests[name])
+	traffic_probabilities, nnodes = utilities.read_traffic_probability_arrays(job["traffic_probability_filename"])
+	topology = build_topology(job["topology_name"], job["topology_params"], traffic_probabilities)
+	if any(artifact_digests.get(name) is None for name in ("topology", "pod_id_map", "wcmp")):
+		# The wiring files are regenerated together, since they must all describe the same wiring.
+		topology.wire_network()
+		artifact_digests["topology"] = store.put(topology.write_topology_file)
+		artifact_digests["pod_id_map"] = store.put(lambda f: f.write(topology.generate_pod_id_file_string()))
+		artifact_digests["wcmp"] = store.put(topology.write_initial_interpod_routing_weights_file)
+	if artifact_digests.get("traffic") is None:
+		artifact_digests["traffic"] = store.put(lambda f: topology.write_traffic_events_file(f, traffic_probabilities))
+	for name in artifact_filenames:
+		store.record(artifact_input_digests[name], artifact_digests[name])
+		store.link(artifact_digests[name], artifact_filenames[name])
+	# The schedules only differ between periods by their header, so the pod traffic is decomposed at most once per job.
+	schedule_filenames = {}
+	epoch_link_matrices = []
+	for reconfig_period_ns in (job["reconfiguration_periods_ns"] if job["preplanned_schedules"] else []):
+		schedule_filenames[reconfig_period_ns] = "{}/schedule_rp{}.txt".format(output_base_dir, utilities.extract_timing_string(reconfig_period_ns))
+		schedule_input_digest = utilities.compute_input_digest({"artifact": "schedule", "topology": topology_description, "traffic_probability_digest": job["traffic_probability_digest"], "reconfiguration_period_ns": reconfig_period_ns, "num_epochs": SCHEDULE_NUM_EPOCHS, "decomposition_version": reconfiguration_schedule.DECOMPOSITION_VERSION})
+		schedule_digest = None if job["force"] else store.lookup(schedule_input_digest)
+		if schedule_digest is None:
+			if not epoch_link_matrices:
+				epoch_link_matrices.append(reconfiguration_schedule.compute_schedule(topology.compute_pod_traffic_matrix(traffic_probabilities), topology.get_num_reconfigurable_uplinks_per_pod(), num_epochs_per_window=SCHEDULE_NUM_EPOCHS))
+			schedule_digest = store.put(lambda f: reconfiguration_schedule.write_schedule_file(f, epoch_link_matrices[0], reconfig_period_ns))
+			store.record(schedule_input_digest, schedule_digest)
+		store.link(schedule_digest, schedule_filenames[reconfig_period_ns])
+	# The .properties files are cheap to generate, they are only rewritten if their contents change.
+	updated_manifest_entries = {}
+	num_arrivals_per_sec_list = compute_num_arrivals_per_sec(nnodes, job["load_levels"])
+	generated_configs = []
+	for simulation_config_filename, config_file_strings in generate_job_properties(job, topology, artifact_filenames, num_arrivals_per_sec_list, schedule_filenames):
+		properties_input_digest = utilities.compute_input_digest(config_file_strings)
+		if not utilities.is_generated_file_up_to_date(simulation_config_filename, manifest_entries.get(simulation_config_filename), properties_input_digest):
+			utilities.write_file_atomically(simulation_config_filename, lambda f: f.write(config_file_strings))
+			updated_manifest_entries[simulation_config_filename] = utilities.make_manifest_entry(simulation_config_filename, properties_input_digest)
+		generated_configs.append(simulation_config_filename)
+	return generated_configs, updated_manifest_entries
 
+## Generates all the simulation files of the sweep on a pool of num_workers processes, and returns the list of generated
+## .properties files. The manifest and artifact cache are saved after every completed job, so the sweep can be resumed after a crash.
+## If force is set, the manifest and the artifact cache are ignored and every file is regenerated.
+def generate_sweep(apps, topology_names, load_levels, reconfiguration_periods_ns, num_workers=1, force=False, preplanned_schedules=False):
+	manifest = {} if force else utilities.read_manifest(MANIFEST_FILENAME)
+	jobs = expand_sweep_jobs(apps, topology_names, load_levels, reconfiguration_periods_ns, preplanned_schedules=preplanned_schedules)
+	for job in jobs:
+		job["force"] = force
+	# Each job only receives the manifest entries of its own directory.
+	job_inputs = [(job, dict((filename, manifest[filename]) for filename in manifest if os.path.dirname(filename) == job["output_base_dir"])) for job in jobs]
+	generated_configs = []
+	def record_job_result(job_result):
+		job_generated_configs, updated_manifest_entries = job_result
+		generated_configs.extend(job_generated_configs)
+		if updated_manifest_entries:
+			manifest.update(updated_manifest_entries)
+			utilities.write_manifest(MANIFEST_FILENAME, manifest)
+	if num_workers <= 1:
+		for job_input in job_inputs:
+			record_job_result(run_sweep_job(job_input))
+	else:
+		pool = multiprocessing.Pool(processes=num_workers)
+		try:
+			for job_result in pool.imap(run_sweep_job, job_inputs):
+				record_job_result(job_result)
+		finally:
+			pool.close()
+			pool.join()
+	return generated_configs
+
+'''
+Sets up the experiment based on parameters.
+'''
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Generates the Netbench simulation files of the whole sweep.")
+	parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Number of worker processes.")
+	parser.add_argument("--force", action="store_true", help="Regenerate every file, even if its inputs have not changed.")
+	parser.add_argument("--demand-aware", action="store_true", help="Also sweep PRN with demand-aware initial interpod topologies.")
+	parser.add_argument("--preplanned-schedules", action="store_true", help="Also run PRN on offline reconfiguration schedules.")
+	parser.add_argument("--run-simulations", action="store_true", help="Run the generated simulations concurrently on this machine.")
+	parser.add_argument("--max-concurrent-simulations", type=int, default=multiprocessing.cpu_count())
+	parser.add_argument("--memory-limit-mb", type=int, default=None, help="Upper bound on the sum of the simulations' JVM heaps.")
+	parser.add_argument("--heap-mb", type=int, default=4096, help="JVM heap of each simulation.")
+	args = parser.parse_args()
+	topology_names = TOPOLOGY_NAMES + DEMAND_AWARE_TOPOLOGY_NAMES if args.demand_aware else TOPOLOGY_NAMES
+	GENERATED_CONFIGS.extend(generate_sweep(APPS, topology_names, LOAD_LEVELS, RECONFIGURATION_PERIODS_NS, num_workers=args.workers, force=args.force, preplanned_schedules=args.preplanned_schedules))
+	generate_bash_script(GENERATED_CONFIGS)
+	if args.run_simulations:
+		scheduler = simulation_scheduler.SimulationScheduler(GENERATED_CONFIGS,
+															BASE_DIRECTORY + "/simulation_state.json",
+															BASE_DIRECTORY + "/simulation_log.csv",
+															max_concurrent_jobs=args.max_concurrent_simulations,
+															memory_limit_mb=args.memory_limit_mb,
+															heap_mb=args.heap_mb)
+		scheduler.run()
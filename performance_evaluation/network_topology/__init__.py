@@ -3,4 +3,6 @@ __all__ = ["network_topology",
 			"sparse_reconfigurable_network_topology",
 			"fattree_network_topology",
 			"static_expander_network_topology",
+			"csr_adjacency",
+			"interpod_topology_optimizer",
 		   ]
\ No newline at end of file
@@ -0,0 +1,180 @@
+import numbers
+import numpy as np
+
+# Array-backed adjacency of a topology, stored in compressed sparse row (CSR) form with a multiplicity column that
+# counts the parallel links between each pair of devices. Device ids are the row indices 0, ..., num_nodes - 1.
+# The class supports the same queries as the dict-of-dicts adjacency list (iterating over the devices, indexing a
+# device to get its neighbors, and indexing a neighbor to get the link count), so code written against the
+# adjacency list keeps working, while large topologies only ever hold three flat integer arrays.
+class CSRAdjacency(object):
+	def __init__(self, indptr, indices, multiplicity):
+		self.indptr = np.asarray(indptr, dtype=np.int64)
+		self.indices = np.asarray(indices, dtype=np.int64)
+		self.multiplicity = np.asarray(multiplicity, dtype=np.int64)
+		assert(len(self.indices) == len(self.multiplicity) and self.indptr[-1] == len(self.indices))
+		return
+
+	## Constructors.
+	# Builds the adjacency from parallel (src, dst, multiplicity) edge arrays. Entries for the same (src, dst) pair are
+	# added up, and entries with zero multiplicity are dropped. If symmetric is set, every edge is also added in reverse.
+	@classmethod
+	def from_edges(cls, src, dst, multiplicity, num_nodes=None, symmetric=False):
+		src = np.asarray(src, dtype=np.int64)
+		dst = np.asarray(dst, dtype=np.int64)
+		multiplicity = np.broadcast_to(np.asarray(multiplicity, dtype=np.int64), src.shape)
+		if symmetric:
+			src, dst = np.concatenate((src, dst)), np.concatenate((dst, src))
+			multiplicity = np.concatenate((multiplicity, multiplicity))
+		if num_nodes is None:
+			num_nodes = int(max(src.max(), dst.max())) + 1 if len(src) > 0 else 0
+		nonzero = multiplicity != 0
+		src, dst, multiplicity = src[nonzero], dst[nonzero], multiplicity[nonzero]
+		# Sort the edges by (src, dst), then merge the duplicate pairs.
+		order = np.lexsort((dst, src))
+		src, dst, multiplicity = src[order], dst[order], multiplicity[order]
+		if len(src) > 0:
+			is_new_pair = np.empty(len(src), dtype=bool)
+			is_new_pair[0] = True
+			is_new_pair[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+			pair_starts = np.flatnonzero(is_new_pair)
+			multiplicity = np.add.reduceat(multiplicity, pair_starts)
+			src, dst = src[pair_starts], dst[pair_starts]
+		indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+		np.cumsum(np.bincount(src, minlength=num_nodes), out=indptr[1:])
+		return cls(indptr, dst, multiplicity)
+
+	# Builds the adjacency from the dict-of-dicts adjacency list used by the topology classes.
+	@classmethod
+	def from_adjacency_list(cls, adjacency_list):
+		src, dst, multiplicity = [], [], []
+		for switch_id in adjacency_list:
+			for target_switch_id in adjacency_list[switch_id]:
+				src.append(switch_id)
+				dst.append(target_switch_id)
+				multiplicity.append(int(adjacency_list[switch_id][target_switch_id]))
+		num_nodes = max(adjacency_list) + 1 if len(adjacency_list) > 0 else 0
+		return cls.from_edges(src, dst, multiplicity, num_nodes=num_nodes)
+
+	# Builds the adjacency from a square scipy sparse matrix, whose entries are the link multiplicities.
+	@classmethod
+	def from_scipy(cls, matrix):
+		coo_matrix = matrix.tocoo()
+		return cls.from_edges(coo_matrix.row, coo_matrix.col, coo_matrix.data, num_nodes=coo_matrix.shape[0])
+
+	# Builds the adjacency from a networkx graph with integer nodes. The multiplicity of an edge is read from its weight
+	# attribute (1 if missing), and parallel edges of multigraphs are added up. Undirected graphs yield symmetric adjacencies.
+	@classmethod
+	def from_networkx(cls, graph, weight="weight"):
+		src, dst, multiplicity = [], [], []
+		for u, v, data in graph.edges(data=True):
+			src.append(u)
+			dst.append(v)
+			multiplicity.append(int(data.get(weight, 1)))
+		src, dst, multiplicity = np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64), np.array(multiplicity, dtype=np.int64)
+		num_nodes = max(graph.nodes()) + 1 if graph.number_of_nodes() > 0 else 0
+		if not graph.is_directed():
+			# Self loops of undirected graphs must not be counted twice.
+			not_loop = src != dst
+			src, dst, multiplicity = np.concatenate((src, dst[not_loop])), np.concatenate((dst, src[not_loop])), np.concatenate((multiplicity, multiplicity[not_loop]))
+		return cls.from_edges(src, dst, multiplicity, num_nodes=num_nodes)
+
+	## Conversions.
+	# Returns the adjacency as a scipy CSR matrix of link multiplicities. The arrays are shared, not copied.
+	def to_scipy(self):
+		import scipy.sparse
+		num_nodes = self.get_num_nodes()
+		return scipy.sparse.csr_matrix((self.multiplicity, self.indices, self.indptr), shape=(num_nodes, num_nodes))
+
+	# Returns the adjacency as a networkx DiGraph, with the link multiplicities stored in the weight attribute.
+	def to_networkx(self, weight="weight"):
+		import networkx as nx
+		graph = nx.DiGraph()
+		graph.add_nodes_from(range(self.get_num_nodes()))
+		src, dst, multiplicity = self.get_edge_arrays()
+		graph.add_weighted_edges_from(zip(src.tolist(), dst.tolist(), multiplicity.tolist()), weight=weight)
+		return graph
+
+	# Returns the adjacency in the dict-of-dicts form used by the topology classes.
+	def to_adjacency_list(self):
+		adjacency_list = {}
+		for switch_id in range(self.get_num_nodes()):
+			start, end = self.indptr[switch_id], self.indptr[switch_id + 1]
+			adjacency_list[switch_id] = dict(zip(self.indices[start:end].tolist(), self.multiplicity[start:end].tolist()))
+		return adjacency_list
+
+	## Queries.
+	def get_num_nodes(self):
+		return len(self.indptr) - 1
+
+	# Returns the total number of links, counting each parallel link separately.
+	def get_num_links(self):
+		return int(self.multiplicity.sum())
+
+	# Returns the number of links leaving each device.
+	def get_degrees(self):
+		src, _, multiplicity = self.get_edge_arrays()
+		return np.bincount(src, weights=multiplicity, minlength=self.get_num_nodes()).astype(np.int64)
+
+	# Returns the (src, dst, multiplicity) arrays of all adjacent device pairs, sorted by (src, dst).
+	def get_edge_arrays(self):
+		src = np.repeat(np.arange(self.get_num_nodes(), dtype=np.int64), np.diff(self.indptr))
+		return src, self.indices, self.multiplicity
+
+	# Yields the (src, dst, multiplicity) arrays in chunks of at most num_rows_per_chunk source devices.
+	def iter_edge_array_chunks(self, num_rows_per_chunk=4096):
+		for row_start in range(0, self.get_num_nodes(), num_rows_per_chunk):
+			row_end = min(row_start + num_rows_per_chunk, self.get_num_nodes())
+			start, end = self.indptr[row_start], self.indptr[row_end]
+			src = np.repeat(np.arange(row_start, row_end, dtype=np.int64), np.diff(self.indptr[row_start:row_end + 1]))
+			yield src, self.indices[start:end], self.multiplicity[start:end]
+
+	## Mapping protocol, mirroring the dict-of-dicts adjacency list.
+	def __len__(self):
+		return self.get_num_nodes()
+
+	def __iter__(self):
+		return iter(range(self.get_num_nodes()))
+
+	def __contains__(self, switch_id):
+		return isinstance(switch_id, numbers.Integral) and 0 <= switch_id < self.get_num_nodes()
+
+	def __getitem__(self, switch_id):
+		if switch_id not in self:
+			raise KeyError(switch_id)
+		start, end = self.indptr[switch_id], self.indptr[switch_id + 1]
+		return CSRAdjacencyRow(self.indices[start:end], self.multiplicity[start:end])
+
+	def keys(self):
+		return list(range(self.get_num_nodes()))
+
+# Read-only view of the neighbors of a single device in a CSRAdjacency, behaving like the inner dict of an adjacency list.
+class CSRAdjacencyRow(object):
+	def __init__(self, indices, multiplicity):
+		self.indices = indices
+		self.multiplicity = multiplicity
+		return
+
+	def __len__(self):
+		return len(self.indices)
+
+	def __iter__(self):
+		return iter(self.indices.tolist())
+
+	def __contains__(self, target_switch_id):
+		position = np.searchsorted(self.indices, target_switch_id)
+		return position < len(self.indices) and self.indices[position] == target_switch_id
+
+	def __getitem__(self, target_switch_id):
+		position = np.searchsorted(self.indices, target_switch_id)
+		if position >= len(self.indices) or self.indices[position] != target_switch_id:
+			raise KeyError(target_switch_id)
+		return int(self.multiplicity[position])
+
+	def keys(self):
+		return self.indices.tolist()
+
+	def values(self):
+		return self.multiplicity.tolist()
+
+	def items(self):
+		return list(zip(self.indices.tolist(), self.multiplicity.tolist()))
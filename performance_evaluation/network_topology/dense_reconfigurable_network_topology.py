@@ -1,6 +1,7 @@
+import hashlib
 import numpy as np
-import networkx as nx
 from network_topology import *
+import interpod_topology_optimizer
 
 # In this model, the reconfigurable network is pod-reconfigurable. Each pod is built as a
 # full-bisection-bandwidth two layer fabric, with an aggregation layer and a ToR layer. 
@@ -8,16 +9,24 @@ from network_topology import *
 # pod, but we logically collapse all aggregation switches to 1. In other words, each pod must only have 
 # one aggregation switch.
 class DenseReconfigurableNetworkTopology(NetworkTopology):
-	def __init__(self, eps_radix, num_pods, num_tors_per_pod, oversubscription_ratio=(1,1)):
-		NetworkTopology.__init__(self, eps_radix)
+	# Probabilities in the flow arrivals file are written at full precision.
+	traffic_events_line_format = "{},{},{},{}\n"
+
+	def __init__(self, eps_radix, num_pods, num_tors_per_pod, oversubscription_ratio=(1,1), adjacency_backend="dict"):
+		NetworkTopology.__init__(self, eps_radix, adjacency_backend=adjacency_backend)
 		self.num_pods = num_pods
 		self.num_tors_per_pod = num_tors_per_pod
 		self.oversubscription_ratio = (float(oversubscription_ratio[0]), float(oversubscription_ratio[1]))
 		self.num_reconfigurable_uplink_per_pod = int(self.num_tors_per_pod * (self.eps_radix / 2) * (float(self.oversubscription_ratio[1]) / float(self.oversubscription_ratio[0])))
 		assert(self.num_reconfigurable_uplink_per_pod > self.num_pods - 1)
+		# Interpod link matrix of a demand-aware initial topology, or None for the uniform one.
+		self.interpod_link_matrix = None
 	
 	# Wires up the network in its entirety, and sets up the various topological properties.
 	def wire_network(self):
+		if self.adjacency_backend == "csr":
+			self.__wire_network_csr()
+			return
 		# Step 1: Intialize the servers and the switches first if all pods, while also wiring things together
 		for pod_id in range(self.num_pods):
 			# Step 1.1 : Initialize the pod aggregation switch, and there should only be 1 aggregation switch per pod.
@@ -30,80 +39,94 @@ class DenseReconfigurableNetworkTopology(NetworkTopology):
 				# Initialize the ToR's device entry in the adjacency list
 				self.adjacency_list[tor_device_id] = {}
 				# Next, connect the ToR with the aggregation switch
-				self.adjacency_list[tor_device_id][aggregation_device_id] = self.eps_radix / 2
-				self.adjacency_list[aggregation_device_id][tor_device_id] = self.eps_radix / 2
+				self.adjacency_list[tor_device_id][aggregation_device_id] = self.eps_radix // 2
+				self.adjacency_list[aggregation_device_id][tor_device_id] = self.eps_radix // 2
 				# Step 1.3 : Initialize the servers and connect them with the ToRs. Note that each ToR in the topology file connects to only 1 server, though
 				# 			 each server is a logical representation for eps_radix / 2 actual servers. We do this to save space and runtime later in netbench.
 				server_device_id = self.num_pods * (1 + self.num_tors_per_pod) + (pod_id * self.num_tors_per_pod) + tor
 				self.adjacency_list[server_device_id] = {}
-				self.adjacency_list[server_device_id][tor_device_id] = self.eps_radix / 2
-				self.adjacency_list[tor_device_id][server_device_id] = self.eps_radix / 2
+				self.adjacency_list[server_device_id][tor_device_id] = self.eps_radix // 2
+				self.adjacency_list[tor_device_id][server_device_id] = self.eps_radix // 2
 				# Then add the tor server and aggregation switches into the device id to pod id map
 				self.device_id_to_pod_id_map[server_device_id] = pod_id
 				self.device_id_to_pod_id_map[tor_device_id] = pod_id
 		# Step 2: Wire up the initial inter-pod logical topology between aggregation switches, assuming uniform connectivity
+		# unless a demand-aware one has been set
 		# Step 2.1: Derive the logical interpod adjacency matrix
-		uniform_interpod_logical_topology = self.__compute_uniform_interpod_connectivity()
-		# Step 2.2: Modify the adjacency list to realize uniform interpod logical topology
+		interpod_logical_topology = self.__get_interpod_logical_topology()
+		# Step 2.2: Modify the adjacency list to realize the interpod logical topology
 		for src_pod in range(self.num_pods):
 			for dst_pod in range(self.num_pods):
-				link_count = uniform_interpod_logical_topology[src_pod][dst_pod]
+				link_count = interpod_logical_topology[src_pod][dst_pod]
 				self.adjacency_list[src_pod][dst_pod] = link_count
 		return
 
-	# Generates the traffic events in the form of strings.
-	def generate_traffic_events_string(self, traffic_probability):
-		str_builder = ""
-		virtual_servers_offset = self.num_pods * (1 + self.num_tors_per_pod)
-		num_servers_per_tor = self.eps_radix / 2
-		index = 0
-		prob_sum = 0
-		for src, dst in traffic_probability:
-			src_virtual = virtual_servers_offset + src / num_servers_per_tor
-			dst_virtual = virtual_servers_offset + dst / num_servers_per_tor
-			assert(src_virtual in self.adjacency_list and dst_virtual in self.adjacency_list)
-			if src_virtual != dst_virtual:
-				prob_sum += traffic_probability[(src, dst)]
-		for src, dst in traffic_probability:
-			src_virtual = virtual_servers_offset + src / num_servers_per_tor
-			dst_virtual = virtual_servers_offset + dst / num_servers_per_tor
-			assert(src_virtual in self.adjacency_list and dst_virtual in self.adjacency_list)
-			if src_virtual != dst_virtual:
-				str_builder += "{},{},{},{}\n".format(index, src_virtual, dst_virtual, traffic_probability[(src, dst)] / prob_sum)
-				index += 1
-		return str_builder
+	# Wires up the same network as wire_network, building the CSR adjacency directly from link arrays.
+	def __wire_network_csr(self):
+		num_tors = self.num_pods * self.num_tors_per_pod
+		tor_pod_ids = np.repeat(np.arange(self.num_pods), self.num_tors_per_pod)
+		tor_device_ids = self.num_pods + np.arange(num_tors)
+		server_device_ids = self.num_pods * (1 + self.num_tors_per_pod) + np.arange(num_tors)
+		interpod_logical_topology = self.__get_interpod_logical_topology()
+		src_pod, dst_pod = np.nonzero(interpod_logical_topology)
+		# Intra-pod links are added in both directions, the interpod logical topology matrix already holds both directions.
+		src = np.concatenate((tor_device_ids, tor_pod_ids, server_device_ids, tor_device_ids, src_pod))
+		dst = np.concatenate((tor_pod_ids, tor_device_ids, tor_device_ids, server_device_ids, dst_pod))
+		multiplicity = np.concatenate((np.full(4 * num_tors, self.eps_radix // 2), interpod_logical_topology[src_pod, dst_pod]))
+		self.adjacency_list = CSRAdjacency.from_edges(src, dst, multiplicity, num_nodes=self.num_pods * (1 + 2 * self.num_tors_per_pod))
+		device_pod_ids = np.concatenate((np.arange(self.num_pods), tor_pod_ids, tor_pod_ids))
+		self.device_id_to_pod_id_map = dict(enumerate(device_pod_ids.tolist()))
+		return
 
-	# Generates the initial WCMP configuration for a uniform pod-to-pod logical topology.
-	def generate_initial_interpod_routing_weights_string(self):
-		str_builder = ""
-		per_path_ratio = float(1) / (self.num_pods - 1)
-		for src_pod in range(self.num_pods):
-			for dst_pod in range(self.num_pods):
-				if src_pod != dst_pod:
-					str_builder += "{},{},{},{}\n".format(2, per_path_ratio, src_pod, dst_pod)
-					for intermediate_pod in range(self.num_pods):
-						if intermediate_pod != src_pod and intermediate_pod != dst_pod:
-							str_builder += "{},{},{},{},{}\n".format(3, per_path_ratio, src_pod, intermediate_pod, dst_pod)
-		return str_builder
+	# Virtual servers are in the range [num_pods * (1 + num_tors_per_pod), num_pods * (1 + 2 * num_tors_per_pod) - 1], one per ToR.
+	def get_virtual_server_range(self):
+		return self.num_pods * (1 + self.num_tors_per_pod), self.num_pods * self.num_tors_per_pod
+
+	# Each virtual server represents the eps_radix / 2 physical servers below a ToR.
+	def get_num_physical_servers_per_virtual_server(self):
+		return self.eps_radix // 2
 
-	# Generates the topology string used for netbench.
-	def generate_topology_file_string(self):
-		prefix = ""
-		topol_str = ""
-		num_edges = 0
-		for switch_id in self.adjacency_list:
-			for target_switch_id in self.adjacency_list[switch_id]:
-				link_count = self.adjacency_list[switch_id][target_switch_id]
-				num_edges += link_count
-				for _ in range(link_count):
-					topol_str += "{} {}\n".format(switch_id, target_switch_id)
-		num_switches = len(self.adjacency_list)
-		prefix += ("|V|={}".format(num_switches) + "\n")
-		prefix += ("|E|={}".format(num_edges) + "\n")
-		prefix += "ToRs=incl_range({},{})\n".format(self.num_pods, self.num_pods * (1 + self.num_tors_per_pod) - 1)
-		prefix += "Servers=incl_range({},{})\n".format(self.num_pods * (1 + self.num_tors_per_pod), self.num_pods * (1 + (2 * self.num_tors_per_pod)) - 1)
-		prefix += "Switches=incl_range({},{})\n\n".format(0, self.num_pods - 1) # For the aggregation switches only
-		return prefix + topol_str
+	# Routes uniformly over the direct path and all two-hop paths of a uniform pod-to-pod logical topology, or in proportion
+	# to the capacity of the paths of a demand-aware one.
+	def get_interpod_path_weights(self, src_pod):
+		if self.interpod_link_matrix is not None:
+			return interpod_topology_optimizer.compute_interpod_path_weights(self.interpod_link_matrix, src_pod)
+		return self.get_uniform_interpod_path_weights(src_pod)
+
+	## Demand-aware initial topologies. Both must be called before wire_network.
+	# Sets the interpod logical topology to the given (num_pods, num_pods) integer link matrix, which must use exactly the
+	# reconfigurable uplinks of every pod in both directions. None restores the uniform topology.
+	def set_interpod_link_matrix(self, interpod_link_matrix):
+		if interpod_link_matrix is not None:
+			interpod_link_matrix = np.asarray(interpod_link_matrix, dtype=np.int64)
+			assert(interpod_link_matrix.shape == (self.num_pods, self.num_pods) and np.all(np.diag(interpod_link_matrix) == 0))
+			assert(np.all(interpod_link_matrix.sum(axis=1) == self.num_reconfigurable_uplink_per_pod))
+			assert(np.all(interpod_link_matrix.sum(axis=0) == self.num_reconfigurable_uplink_per_pod))
+		self.interpod_link_matrix = interpod_link_matrix
+		return
+
+	# Returns the pod traffic matrix of the traffic probabilities remapped onto this topology (see
+	# interpod_topology_optimizer.compute_pod_traffic_matrix).
+	def compute_pod_traffic_matrix(self, traffic_probability):
+		src_virtual, dst_virtual, prob = self.remap_traffic_probability(traffic_probability, aggregate_duplicates=True)
+		virtual_servers_offset, _ = self.get_virtual_server_range()
+		src_pods = (src_virtual - virtual_servers_offset) // self.num_tors_per_pod
+		dst_pods = (dst_virtual - virtual_servers_offset) // self.num_tors_per_pod
+		return interpod_topology_optimizer.compute_pod_traffic_matrix(src_pods, dst_pods, prob, self.num_pods)
+
+	# Sets the interpod logical topology to the one optimized for the pod traffic of the traffic probabilities, with the
+	# given backend of interpod_topology_optimizer, and returns its link matrix.
+	def optimize_interpod_link_matrix(self, traffic_probability, backend="sinkhorn", **kwargs):
+		traffic_matrix = self.compute_pod_traffic_matrix(traffic_probability)
+		self.set_interpod_link_matrix(interpod_topology_optimizer.optimize_interpod_topology(traffic_matrix, self.num_reconfigurable_uplink_per_pod, backend=backend, **kwargs))
+		return self.interpod_link_matrix
+
+	# Declares the ToRs and servers, and the aggregation switches as the remaining switches.
+	def get_topology_file_device_declarations(self):
+		declarations = "ToRs=incl_range({},{})\n".format(self.num_pods, self.num_pods * (1 + self.num_tors_per_pod) - 1)
+		declarations += "Servers=incl_range({},{})\n".format(self.num_pods * (1 + self.num_tors_per_pod), self.num_pods * (1 + (2 * self.num_tors_per_pod)) - 1)
+		declarations += "Switches=incl_range({},{})\n".format(0, self.num_pods - 1) # For the aggregation switches only
+		return declarations
 
 	# Retrieves the name of this topology, summarizing some of the essential parameters. Used to create topology directory and filename.
 	def get_name(self):
@@ -112,6 +135,9 @@ class DenseReconfigurableNetworkTopology(NetworkTopology):
 		num_pods_str = "np{}".format(self.num_pods)
 		num_tors_per_pod_str = "ntpp{}".format(self.num_tors_per_pod)
 		network_name = "{}_{}_{}".format(num_pods_str, num_tors_per_pod_str, oversubscription_ratio_str)
+		if self.interpod_link_matrix is not None:
+			# Demand-aware topologies are told apart by their link matrix.
+			network_name += "_da{}".format(hashlib.sha1(self.interpod_link_matrix.astype(np.int64).tobytes()).hexdigest()[:8])
 		return network_name_prefix + network_name
 
 	def get_num_reconfigurable_uplinks_per_pod(self):
@@ -124,38 +150,36 @@ class DenseReconfigurableNetworkTopology(NetworkTopology):
 	###########################################################################################################################
 	###########################################################################################################################
 	'''
+	# Returns the demand-aware interpod link matrix if one has been set, and the uniform one otherwise.
+	def __get_interpod_logical_topology(self):
+		if self.interpod_link_matrix is not None:
+			return self.interpod_link_matrix
+		return self.__compute_uniform_interpod_connectivity()
+
 	## Internal function used to compute the uniform interpod logical topology.
+	# Every pod pair gets num_reconfigurable_uplink_per_pod // (num_pods - 1) links, and the leftover links of each pod are
+	# spread with a circulant assignment, where pod i gets one extra link to pods i + offset (mod num_pods) for leftover_links
+	# distinct offsets. Offsets are taken in +/- pairs, plus num_pods / 2 if the number of leftover links is odd, so the extra
+	# links are symmetric whenever a symmetric assignment exists (i.e. unless both num_pods and the leftover links are odd).
 	def __compute_uniform_interpod_connectivity(self):
 		uniform_interpod_logical_topology = np.zeros((self.num_pods, self.num_pods), dtype=int)
-		per_pod_pair_num_links = self.num_reconfigurable_uplink_per_pod / (self.num_pods - 1)
-		for i in range(self.num_pods):
-			for j in range(self.num_pods):
-				if i != j:
-					uniform_interpod_logical_topology[i][j] = per_pod_pair_num_links
+		per_pod_pair_num_links = self.num_reconfigurable_uplink_per_pod // (self.num_pods - 1)
+		uniform_interpod_logical_topology += per_pod_pair_num_links
+		np.fill_diagonal(uniform_interpod_logical_topology, 0)
 		leftover_links = self.num_reconfigurable_uplink_per_pod - (per_pod_pair_num_links * (self.num_pods - 1))
 		assert(leftover_links >= 0 and leftover_links < self.num_pods - 1)
 		if leftover_links > 0:
-			# Run the random bipartite matching to fill in the remaining links
-			dummy_src = 0
-			dummy_sink = 2 * self.num_pods + 1
-			G = nx.DiGraph()
-			edges = []
-			# Add edges from src to first layer nodes and from second layer nodes to the dst
-			for i in range(self.num_pods):
-				edges.append((dummy_src, i + 1, {'capacity': leftover_links, 'weight': 0}))
-				edges.append((self.num_pods + i + 1, dummy_sink, {'capacity': leftover_links, 'weight': 0}))
-			# Next, add edges between first layer nodes and second layer nodes
-			for i in range(self.num_pods):
-				for j in range(self.num_pods):
-					if i != j:						
-						edges.append((i + 1, self.num_pods + j + 1, {'capacity': 1, 'weight': 1}))
-			# Add the edges set into the graph.
-			G.add_edges_from(edges)
-			# Trigger the min cost flow algorithm.
-			min_cost_flow = nx.max_flow_min_cost(G, dummy_src, dummy_sink)
-			for i in range(self.num_pods):
-				for j in range(self.num_pods):
-					if i != j:
-						#if min_cost_flow[i + 1][self.num_pods + j + 1] > 0:
-						uniform_interpod_logical_topology[i][j] += 1
+			if leftover_links % 2 == 0 or self.num_pods % 2 == 0:
+				offsets = np.arange(1, leftover_links // 2 + 1)
+				offsets = np.concatenate((offsets, self.num_pods - offsets))
+				if leftover_links % 2 == 1:
+					offsets = np.append(offsets, self.num_pods // 2)
+			else:
+				offsets = np.arange(1, leftover_links + 1)
+			pod_ids = np.arange(self.num_pods)
+			uniform_interpod_logical_topology[pod_ids[:, np.newaxis], (pod_ids[:, np.newaxis] + offsets) % self.num_pods] += 1
+		# Every pod uses up all of its uplinks, in both directions.
+		assert(np.all(uniform_interpod_logical_topology.sum(axis=1) == self.num_reconfigurable_uplink_per_pod))
+		assert(np.all(uniform_interpod_logical_topology.sum(axis=0) == self.num_reconfigurable_uplink_per_pod))
+		assert(np.all(np.diag(uniform_interpod_logical_topology) == 0))
 		return uniform_interpod_logical_topology
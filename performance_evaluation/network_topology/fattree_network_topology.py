@@ -8,8 +8,8 @@ from network_topology import *
 # pod, but we logically collapse all aggregation switches to 1. In other words, each pod must only have 
 # one aggregation switch.
 class FatTreeNetworkTopology(NetworkTopology):
-	def __init__(self, eps_radix, num_pods, num_tors_per_pod, oversubscription_ratio=(1,1)):
-		NetworkTopology.__init__(self, eps_radix)
+	def __init__(self, eps_radix, num_pods, num_tors_per_pod, oversubscription_ratio=(1,1), adjacency_backend="dict"):
+		NetworkTopology.__init__(self, eps_radix, adjacency_backend=adjacency_backend)
 		self.num_pods = num_pods
 		self.num_tors_per_pod = num_tors_per_pod
 		self.oversubscription_ratio = (float(oversubscription_ratio[0]), float(oversubscription_ratio[0]))
@@ -18,6 +18,9 @@ class FatTreeNetworkTopology(NetworkTopology):
 	
 	# Wires up the network in its entirety, and sets up the various topological properties.
 	def wire_network(self):
+		if self.adjacency_backend == "csr":
+			self.__wire_network_csr()
+			return
 		# First initialize the core switch.
 		core_switch_id = self.num_pods + 2 * self.num_pods * self.num_tors_per_pod
 		self.device_id_to_pod_id_map[core_switch_id] = 0
@@ -50,54 +53,39 @@ class FatTreeNetworkTopology(NetworkTopology):
 				self.device_id_to_pod_id_map[tor_device_id] = 0
 		return
 
-	# Generates the traffic events in the form of strings.
-	def generate_traffic_events_string(self, traffic_probability):
-		str_builder = ""
-		virtual_servers_offset = self.num_pods * (1 + self.num_tors_per_pod)
-		num_servers_per_tor = self.eps_radix / 2
-		index = 0
-		prob_sum = 0
-		for src, dst in traffic_probability:
-			src_virtual = virtual_servers_offset + src / num_servers_per_tor
-			dst_virtual = virtual_servers_offset + dst / num_servers_per_tor
-			assert(src_virtual in self.adjacency_list and dst_virtual in self.adjacency_list)
-			if src_virtual != dst_virtual:
-				prob_sum += traffic_probability[(src, dst)]
-		for src, dst in traffic_probability:
-			src_virtual = virtual_servers_offset + src / num_servers_per_tor
-			dst_virtual = virtual_servers_offset + dst / num_servers_per_tor
-			assert(src_virtual in self.adjacency_list and dst_virtual in self.adjacency_list)
-			if src_virtual != dst_virtual:
-				str_builder += "{},{},{},{:.4e}\n".format(index, src_virtual, dst_virtual, traffic_probability[(src, dst)] / prob_sum)
-				index += 1
-		return str_builder
+	# Wires up the same network as wire_network, building the CSR adjacency directly from link arrays. Every link
+	# is listed once, and added in both directions.
+	def __wire_network_csr(self):
+		core_switch_id = self.num_pods + 2 * self.num_pods * self.num_tors_per_pod
+		aggregation_device_ids = np.arange(self.num_pods)
+		tor_device_ids = self.num_pods + np.arange(self.num_pods * self.num_tors_per_pod)
+		server_device_ids = self.num_pods * (1 + self.num_tors_per_pod) + np.arange(self.num_pods * self.num_tors_per_pod)
+		tor_aggregation_device_ids = np.repeat(aggregation_device_ids, self.num_tors_per_pod)
+		src = np.concatenate((aggregation_device_ids, tor_device_ids, server_device_ids))
+		dst = np.concatenate((np.full(self.num_pods, core_switch_id), tor_aggregation_device_ids, tor_device_ids))
+		multiplicity = np.concatenate((np.full(self.num_pods, self.num_reconfigurable_uplink_per_pod), np.full(2 * len(tor_device_ids), self.eps_radix // 2)))
+		self.adjacency_list = CSRAdjacency.from_edges(src, dst, multiplicity, num_nodes=core_switch_id + 1, symmetric=True)
+		self.device_id_to_pod_id_map = dict.fromkeys(range(core_switch_id + 1), 0)
+		return
+
+	# Virtual servers are in the range [num_pods * (1 + num_tors_per_pod), num_pods * (1 + 2 * num_tors_per_pod) - 1], one per ToR.
+	def get_virtual_server_range(self):
+		return self.num_pods * (1 + self.num_tors_per_pod), self.num_pods * self.num_tors_per_pod
 
-	# Generates the initial WCMP configuration for a uniform pod-to-pod logical topology.
-	def generate_initial_interpod_routing_weights_string(self):
-		return ""
+	# Each virtual server represents the eps_radix / 2 physical servers below a ToR.
+	def get_num_physical_servers_per_virtual_server(self):
+		return self.eps_radix // 2
 
-	# Generates the topology string used for netbench.
-	def generate_topology_file_string(self):
-		prefix = ""
-		topol_str = ""
-		num_edges = 0
-		for switch_id in self.adjacency_list:
-			for target_switch_id in self.adjacency_list[switch_id]:
-				link_count = self.adjacency_list[switch_id][target_switch_id]
-				num_edges += link_count
-				for _ in range(link_count):
-					topol_str += "{} {}\n".format(switch_id, target_switch_id)
-		num_switches = len(self.adjacency_list)
-		prefix += ("|V|={}".format(num_switches) + "\n")
-		prefix += ("|E|={}".format(num_edges) + "\n")
-		prefix += "ToRs=incl_range({},{})\n".format(self.num_pods, self.num_pods * (1 + self.num_tors_per_pod) - 1)
-		prefix += "Servers=incl_range({},{})\n".format(self.num_pods * (1 + self.num_tors_per_pod), self.num_pods * (1 + (2 * self.num_tors_per_pod)) - 1)
-		prefix += "Switches=set(" # For the aggregation switches and core switch
+	# Declares the ToRs and servers, and the aggregation switches and core switch as the remaining switches.
+	def get_topology_file_device_declarations(self):
+		declarations = "ToRs=incl_range({},{})\n".format(self.num_pods, self.num_pods * (1 + self.num_tors_per_pod) - 1)
+		declarations += "Servers=incl_range({},{})\n".format(self.num_pods * (1 + self.num_tors_per_pod), self.num_pods * (1 + (2 * self.num_tors_per_pod)) - 1)
+		declarations += "Switches=set(" # For the aggregation switches and core switch
 		for pod_id in range(self.num_pods):
-			prefix += (str(int(pod_id)) + ", ")
+			declarations += (str(int(pod_id)) + ", ")
 		core_switch_id = self.num_pods + 2 * self.num_pods * self.num_tors_per_pod
-		prefix += (str(int(core_switch_id)) + ")\n\n")
-		return prefix + topol_str
+		declarations += (str(int(core_switch_id)) + ")\n")
+		return declarations
 
 	# Retrieves the name of this topology, summarizing some of the essential parameters. Used to create topology directory and filename.
 	def get_name(self):
@@ -0,0 +1,230 @@
+import numpy as np
+import networkx as nx
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.optimize
+
+## Demand-aware interpod logical topologies. Given a pod-level traffic matrix, these find an integer interpod link matrix
+## links[src_pod, dst_pod] where every pod uses exactly its uplink budget in both directions (row and column sums equal to
+## the budgets), the diagonal is zero, and every pod pair gets at least min_links_per_pod_pair links, so that the direct
+## path between any two pods exists. The links are then shared out in proportion to the traffic.
+
+# Aggregates the traffic between virtual servers into a (num_pods, num_pods) pod traffic matrix, given the pod of the
+# source and destination of every pair. Intra-pod traffic is dropped, and the matrix is normalized to sum to 1 (it is all
+# zeros if there is no interpod traffic).
+def compute_pod_traffic_matrix(src_pods, dst_pods, prob, num_pods):
+	src_pods, dst_pods = np.asarray(src_pods, dtype=np.int64), np.asarray(dst_pods, dtype=np.int64)
+	traffic_matrix = np.bincount(src_pods * num_pods + dst_pods, weights=prob, minlength=num_pods * num_pods).reshape(num_pods, num_pods)
+	np.fill_diagonal(traffic_matrix, 0.)
+	total_traffic = traffic_matrix.sum()
+	if total_traffic > 0:
+		traffic_matrix /= total_traffic
+	return traffic_matrix
+
+## Fast path: matrix scaling, then rounding.
+# Scales the traffic matrix with Sinkhorn iterations into a fractional link matrix whose row and column sums are the
+# uplink budgets. The traffic is first mixed with a uniform matrix (with weight uniform_mixing), which keeps every pod pair
+# in the support so that the scaling converges, and spreads the links of pods without traffic evenly. The
+# min_links_per_pod_pair links of every pod pair are set aside before scaling, and added back afterwards.
+def scale_to_uplink_budgets(traffic_matrix, uplink_budgets, min_links_per_pod_pair=1, uniform_mixing=0.05, max_iterations=10000, tolerance=1e-9):
+	traffic_matrix = np.asarray(traffic_matrix, dtype=np.float64)
+	num_pods = traffic_matrix.shape[0]
+	assert(0 <= uniform_mixing <= 1)
+	is_interpod = ~np.eye(num_pods, dtype=bool)
+	residual_budgets = np.asarray(uplink_budgets, dtype=np.float64) - min_links_per_pod_pair * (num_pods - 1)
+	assert(np.all(residual_budgets >= 0)), "The uplink budgets cannot fit {} links per pod pair".format(min_links_per_pod_pair)
+	traffic_matrix = np.where(is_interpod, traffic_matrix, 0.)
+	total_traffic = traffic_matrix.sum()
+	kernel = is_interpod / float(num_pods * (num_pods - 1))
+	if total_traffic > 0:
+		kernel = (1. - uniform_mixing) * traffic_matrix / total_traffic + uniform_mixing * kernel
+	row_scaling = np.ones(num_pods)
+	column_scaling = np.ones(num_pods)
+	for _ in range(max_iterations):
+		row_scaling = residual_budgets / kernel.dot(column_scaling)
+		column_scaling = residual_budgets / kernel.T.dot(row_scaling)
+		# The columns are exact after their update, so only the rows are checked.
+		row_sums = row_scaling * kernel.dot(column_scaling)
+		if np.max(np.abs(row_sums - residual_budgets)) <= tolerance * max(residual_budgets.max(), 1.):
+			break
+	return row_scaling[:, None] * kernel * column_scaling[None, :] + min_links_per_pod_pair * is_interpod
+
+# Rounds a fractional link matrix, whose row and column sums are the (integer) uplink budgets, to an integer link matrix
+# with the same row and column sums, where every entry is the floor or the ceiling of the fractional one. The floors are
+# taken first, and the links left in every row and column are then placed with a degree-constrained bipartite matching
+# over the entries with a fractional part, solved as a maximum flow (with SciPy from version 1.4 on, networkx before).
+def round_link_matrix(fractional_links, uplink_budgets):
+	fractional_links = np.asarray(fractional_links, dtype=np.float64)
+	num_pods = fractional_links.shape[0]
+	uplink_budgets = np.asarray(uplink_budgets, dtype=np.int64)
+	# Entries within rounding error of an integer are taken as that integer.
+	links = np.floor(fractional_links + 1e-9).astype(np.int64)
+	residual = fractional_links - links
+	row_deficits = uplink_budgets - links.sum(axis=1)
+	column_deficits = uplink_budgets - links.sum(axis=0)
+	assert(np.all(row_deficits >= 0) and np.all(column_deficits >= 0) and row_deficits.sum() == column_deficits.sum())
+	if row_deficits.sum() == 0:
+		return links
+	# Every row and column is a node, a row with a deficit is fed by the source, and a column with a deficit feeds the sink.
+	candidate_rows, candidate_columns = np.nonzero((residual > 1e-9) & ~np.eye(num_pods, dtype=bool))
+	if hasattr(scipy.sparse.csgraph, "maximum_flow"):
+		links += _round_with_csgraph(candidate_rows, candidate_columns, row_deficits, column_deficits)
+	else:
+		links += _round_with_networkx(candidate_rows, candidate_columns, row_deficits, column_deficits)
+	return links
+
+# Sinkhorn scaling of the traffic to the uplink budgets, then rounding to integers (see scale_to_uplink_budgets and
+# round_link_matrix).
+def optimize_with_sinkhorn(traffic_matrix, uplink_budgets, min_links_per_pod_pair=1, **kwargs):
+	fractional_links = scale_to_uplink_budgets(traffic_matrix, uplink_budgets, min_links_per_pod_pair=min_links_per_pod_pair, **kwargs)
+	return round_link_matrix(fractional_links, uplink_budgets)
+
+## Exact backends. Both solve the integer program that maximizes theta, the largest factor by which the pod traffic
+## (normalized to the total number of links) fits on the direct links: links[i, j] >= theta * traffic[i, j] for every
+## pod pair, under the budget and minimum link constraints. They have num_pods^2 integer variables, so they are only meant
+## for small numbers of pods, or for checking the fast path.
+# Solves the integer program with the HiGHS solver of scipy, which requires SciPy 1.9 or later.
+def optimize_with_milp(traffic_matrix, uplink_budgets, min_links_per_pod_pair=1, time_limit=None):
+	if not hasattr(scipy.optimize, "milp"):
+		raise ImportError("The milp backend requires SciPy 1.9 or later (SciPy {} is installed), use the sinkhorn or gurobi backend instead".format(scipy.__version__))
+	num_pods, link_columns, objective, constraints, lower_bounds, integrality = _build_integer_program(traffic_matrix, uplink_budgets, min_links_per_pod_pair)
+	options = {} if time_limit is None else {"time_limit": time_limit}
+	result = scipy.optimize.milp(objective, constraints=constraints, integrality=integrality, bounds=scipy.optimize.Bounds(lower_bounds, np.inf), options=options)
+	assert(result.x is not None), "The interpod topology program failed: {}".format(result.message)
+	links = np.zeros((num_pods, num_pods), dtype=np.int64)
+	links[link_columns] = np.round(result.x[:-1]).astype(np.int64)
+	return links
+
+# Solves the integer program with Gurobi. Requires gurobipy and a Gurobi license.
+def optimize_with_gurobi(traffic_matrix, uplink_budgets, min_links_per_pod_pair=1, time_limit=None):
+	import gurobipy
+	traffic_matrix = np.asarray(traffic_matrix, dtype=np.float64)
+	num_pods = traffic_matrix.shape[0]
+	uplink_budgets = np.asarray(uplink_budgets, dtype=np.int64)
+	demand = _normalize_to_total_links(traffic_matrix, uplink_budgets)
+	model = gurobipy.Model("Demand-aware interpod topology of {} pods".format(num_pods))
+	model.setParam('OutputFlag', False)
+	if time_limit is not None:
+		model.setParam('TimeLimit', time_limit)
+	theta = model.addVar(lb=0., vtype=gurobipy.GRB.CONTINUOUS, name="theta")
+	link_vars = {}
+	for i in range(num_pods):
+		for j in range(num_pods):
+			if i != j:
+				link_vars[i, j] = model.addVar(lb=min_links_per_pod_pair, vtype=gurobipy.GRB.INTEGER, name="links_{}_{}".format(i, j))
+	for pod in range(num_pods):
+		model.addConstr(gurobipy.quicksum(link_vars[pod, j] for j in range(num_pods) if j != pod) == int(uplink_budgets[pod]))
+		model.addConstr(gurobipy.quicksum(link_vars[i, pod] for i in range(num_pods) if i != pod) == int(uplink_budgets[pod]))
+	for (i, j), link_var in link_vars.items():
+		if demand[i, j] > 0:
+			model.addConstr(link_var >= demand[i, j] * theta)
+	model.setObjective(theta, gurobipy.GRB.MAXIMIZE)
+	model.optimize()
+	links = np.zeros((num_pods, num_pods), dtype=np.int64)
+	for (i, j), link_var in link_vars.items():
+		links[i, j] = int(round(link_var.x))
+	return links
+
+# Returns the links placed by the maximum flow that matches the row deficits to the column deficits over the candidate
+# entries, with scipy.sparse.csgraph: node 0 is the source, nodes 1 to num_pods the rows, the next num_pods nodes the
+# columns, and the last node the sink.
+def _round_with_csgraph(candidate_rows, candidate_columns, row_deficits, column_deficits):
+	num_pods = len(row_deficits)
+	pods = np.arange(num_pods)
+	sink = 2 * num_pods + 1
+	graph_src = np.concatenate((np.zeros(num_pods, dtype=np.int64), 1 + candidate_rows, 1 + num_pods + pods))
+	graph_dst = np.concatenate((1 + pods, 1 + num_pods + candidate_columns, np.full(num_pods, sink, dtype=np.int64)))
+	graph_capacity = np.concatenate((row_deficits, np.ones(len(candidate_rows), dtype=np.int64), column_deficits))
+	flow_graph = scipy.sparse.csr_matrix((graph_capacity.astype(np.int32), (graph_src, graph_dst)), shape=(sink + 1, sink + 1))
+	result = scipy.sparse.csgraph.maximum_flow(flow_graph, 0, sink)
+	assert(result.flow_value == row_deficits.sum()), "No rounding meets the uplink budgets, the fractional link matrix is not balanced"
+	# The flow was called residual before SciPy 1.8.
+	flow = result.flow if hasattr(result, "flow") else result.residual
+	return np.maximum(flow.tocsr()[1:num_pods + 1, num_pods + 1:sink].toarray(), 0).astype(np.int64)
+
+# Same as _round_with_csgraph, with networkx.maximum_flow, for SciPy versions without scipy.sparse.csgraph.maximum_flow.
+def _round_with_networkx(candidate_rows, candidate_columns, row_deficits, column_deficits):
+	num_pods = len(row_deficits)
+	flow_graph = nx.DiGraph()
+	for pod in range(num_pods):
+		flow_graph.add_edge("source", ("row", pod), capacity=int(row_deficits[pod]))
+		flow_graph.add_edge(("column", pod), "sink", capacity=int(column_deficits[pod]))
+	for row, column in zip(candidate_rows.tolist(), candidate_columns.tolist()):
+		flow_graph.add_edge(("row", row), ("column", column), capacity=1)
+	flow_value, flows = nx.maximum_flow(flow_graph, "source", "sink")
+	assert(flow_value == row_deficits.sum()), "No rounding meets the uplink budgets, the fractional link matrix is not balanced"
+	links = np.zeros((num_pods, num_pods), dtype=np.int64)
+	for row, column in zip(candidate_rows.tolist(), candidate_columns.tolist()):
+		links[row, column] = flows[("row", row)][("column", column)]
+	return links
+
+# Returns the traffic matrix scaled to sum to the total number of uplinks.
+def _normalize_to_total_links(traffic_matrix, uplink_budgets):
+	traffic_matrix = np.where(np.eye(traffic_matrix.shape[0], dtype=bool), 0., traffic_matrix)
+	total_traffic = traffic_matrix.sum()
+	if total_traffic == 0:
+		return traffic_matrix
+	return traffic_matrix * (float(uplink_budgets.sum()) / total_traffic)
+
+# Builds the integer program of the exact backends for scipy.optimize.milp, over the off-diagonal links (in the order of
+# link_columns) followed by theta.
+def _build_integer_program(traffic_matrix, uplink_budgets, min_links_per_pod_pair):
+	traffic_matrix = np.asarray(traffic_matrix, dtype=np.float64)
+	num_pods = traffic_matrix.shape[0]
+	uplink_budgets = np.asarray(uplink_budgets, dtype=np.int64)
+	demand = _normalize_to_total_links(traffic_matrix, uplink_budgets)
+	link_columns = np.nonzero(~np.eye(num_pods, dtype=bool))
+	num_link_columns = len(link_columns[0])
+	link_ids = np.arange(num_link_columns)
+	# Every pod uses its budget in both directions.
+	budget_matrix = scipy.sparse.csr_matrix((np.ones(2 * num_link_columns), (np.concatenate((link_columns[0], num_pods + link_columns[1])), np.concatenate((link_ids, link_ids)))), shape=(2 * num_pods, num_link_columns + 1))
+	budgets = np.concatenate((uplink_budgets, uplink_budgets))
+	# links - theta * demand >= 0 for the pod pairs with traffic.
+	has_demand = np.nonzero(demand[link_columns] > 0)[0]
+	demand_matrix = scipy.sparse.csr_matrix((np.concatenate((np.ones(len(has_demand)), -demand[link_columns][has_demand])), (np.concatenate((np.arange(len(has_demand)), np.arange(len(has_demand)))), np.concatenate((has_demand, np.full(len(has_demand), num_link_columns))))), shape=(len(has_demand), num_link_columns + 1))
+	constraints = [scipy.optimize.LinearConstraint(budget_matrix, budgets, budgets)]
+	if len(has_demand):
+		constraints.append(scipy.optimize.LinearConstraint(demand_matrix, 0, np.inf))
+	objective = np.zeros(num_link_columns + 1)
+	objective[-1] = -1.
+	lower_bounds = np.append(np.full(num_link_columns, float(min_links_per_pod_pair)), 0.)
+	integrality = np.append(np.ones(num_link_columns), 0)
+	return num_pods, link_columns, objective, constraints, lower_bounds, integrality
+
+BACKENDS = {
+	"sinkhorn" : optimize_with_sinkhorn,
+	"milp" : optimize_with_milp,
+	"gurobi" : optimize_with_gurobi,
+}
+
+# Returns the demand-aware integer interpod link matrix of the given pod traffic matrix and per pod uplink budgets (a
+# scalar or one budget per pod), computed with the given backend.
+def optimize_interpod_topology(traffic_matrix, uplink_budgets, backend="sinkhorn", min_links_per_pod_pair=1, **kwargs):
+	assert(backend in BACKENDS)
+	traffic_matrix = np.asarray(traffic_matrix, dtype=np.float64)
+	num_pods = traffic_matrix.shape[0]
+	assert(traffic_matrix.shape == (num_pods, num_pods) and np.all(traffic_matrix >= 0))
+	uplink_budgets = np.broadcast_to(np.asarray(uplink_budgets, dtype=np.int64), (num_pods,)).copy()
+	links = BACKENDS[backend](traffic_matrix, uplink_budgets, min_links_per_pod_pair=min_links_per_pod_pair, **kwargs)
+	assert(np.all(links.sum(axis=1) == uplink_budgets) and np.all(links.sum(axis=0) == uplink_budgets))
+	assert(np.all(np.diag(links) == 0) and np.all(links[~np.eye(num_pods, dtype=bool)] >= min_links_per_pod_pair))
+	return links
+
+## WCMP weights.
+# Returns the interpod path weights of src_pod on the given link matrix, in the layout of
+# NetworkTopology.get_interpod_path_weights. The traffic to each destination pod is split over the direct path and the
+# two-hop paths in proportion to their capacity, i.e. links[src_pod, dst_pod] for the direct path, and the smaller of
+# links[src_pod, intermediate_pod] and links[intermediate_pod, dst_pod] for a two-hop path. On a uniform link matrix these
+# are the uniform weights.
+def compute_interpod_path_weights(link_matrix, src_pod):
+	link_matrix = np.asarray(link_matrix, dtype=np.float64)
+	num_pods = link_matrix.shape[0]
+	path_capacities = np.minimum(link_matrix[src_pod][:, None], link_matrix)
+	path_capacities[src_pod, :] = link_matrix[src_pod, :]
+	np.fill_diagonal(path_capacities, 0.)
+	path_capacities[:, src_pod] = 0.
+	total_capacities = path_capacities.sum(axis=0)
+	other_pods = np.arange(num_pods) != src_pod
+	assert(np.all(total_capacities[other_pods] > 0)), "Some pods cannot be reached from pod {} in at most two hops".format(src_pod)
+	total_capacities[src_pod] = 1.
+	return path_capacities / total_capacities
@@ -1,12 +1,40 @@
 import sys
+import numpy as np
+from csr_adjacency import CSRAdjacency
+
+# Version of the wiring and of the file formats of the topologies, part of the inputs of the cached topology, pod id map,
+# WCMP and flow arrivals files. It must be bumped whenever a change alters the contents of any of these files.
+# 2: the expander lifts are built sparsely.
+# 3: the leftover PRN uplinks are spread with a circulant assignment.
+WIRING_VERSION = 3
+
+# Converts traffic probabilities into parallel (src, dst, prob) numpy arrays. Accepts either the dict form keyed
+# by (src, dst) tuples, or the columnar form returned by utilities.read_traffic_probability_arrays.
+def traffic_probability_to_arrays(traffic_probability):
+	if isinstance(traffic_probability, dict):
+		num_entries = len(traffic_probability)
+		src = np.fromiter((pair[0] for pair in traffic_probability), dtype=np.int64, count=num_entries)
+		dst = np.fromiter((pair[1] for pair in traffic_probability), dtype=np.int64, count=num_entries)
+		prob = np.fromiter(traffic_probability.values(), dtype=np.float64, count=num_entries)
+		return src, dst, prob
+	src, dst, prob = traffic_probability
+	return np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64), np.asarray(prob, dtype=np.float64)
 
 class NetworkTopology(object):
 
+	# Format of each line in the flow arrivals file: index, source virtual server, destination virtual server, probability.
+	traffic_events_line_format = "{},{},{},{:.4e}\n"
+	# Whether remapped virtual servers must lie within the virtual servers wired into the topology.
+	validate_traffic_endpoints = True
+
 	# The model assumes that all Electrical Packet Switches (EPS) are built with
-	# identical radix devices.
-	def __init__(self, eps_radix):
+	# identical radix devices. The adjacency_backend is either "dict", where the adjacency list is a dict-of-dicts, or
+	# "csr", where wire_network builds an array-backed CSRAdjacency directly, for topologies too large for the dict form.
+	def __init__(self, eps_radix, adjacency_backend="dict"):
 		# The topology only needs: eps_radix, num_pods, device id to pod id map, and adjacency list
+		assert(adjacency_backend in ("dict", "csr"))
 		self.eps_radix = eps_radix
+		self.adjacency_backend = adjacency_backend
 		self.device_id_to_pod_id_map = {}
 		self.adjacency_list = {}
 		return
@@ -39,6 +67,20 @@ class NetworkTopology(object):
 	def get_adjacency_list(self):
 		return self.adjacency_list
 
+	# Returns the network logical topology as a CSRAdjacency, converting the dict form if needed.
+	def get_csr_adjacency(self):
+		if isinstance(self.adjacency_list, CSRAdjacency):
+			return self.adjacency_list
+		return CSRAdjacency.from_adjacency_list(self.adjacency_list)
+
+	# Returns the network logical topology as a scipy sparse matrix of link multiplicities.
+	def get_adjacency_matrix(self):
+		return self.get_csr_adjacency().to_scipy()
+
+	# Returns the network logical topology as a networkx DiGraph, with the link multiplicities as edge weights.
+	def get_networkx_graph(self):
+		return self.get_csr_adjacency().to_networkx()
+
 	# Generates the strings used to write to the filename, which states 
 	# the pod id each of the switch/server belongs to.
 	def generate_pod_id_file_string(self):
@@ -48,6 +90,256 @@ class NetworkTopology(object):
 			str_builder += "{},{}\n".format(device_id, pod_id)
 		return str_builder
 
+	## Traffic remapping shared by all topologies.
+	# Returns the device id of the first virtual server, and the number of virtual servers in the topology.
+	def get_virtual_server_range(self):
+		raise Exception("Child classes must override this method.")
+
+	# Returns the number of physical servers that are represented by each virtual server.
+	def get_num_physical_servers_per_virtual_server(self):
+		raise Exception("Child classes must override this method.")
+
+	# Maps the traffic probabilities between physical servers onto the virtual servers of this topology, drops the pairs
+	# whose endpoints share a virtual server (i.e. intra-ToR traffic), and normalizes the remaining probabilities.
+	# If aggregate_duplicates is set, pairs that land on the same virtual server pair are merged into a single entry,
+	# ordered by their first appearance. Returns parallel (src_virtual, dst_virtual, prob) numpy arrays.
+	def remap_traffic_probability(self, traffic_probability, aggregate_duplicates=False):
+		src, dst, prob = traffic_probability_to_arrays(traffic_probability)
+		virtual_servers_offset, num_virtual_servers = self.get_virtual_server_range()
+		num_physical_servers_per_virtual_server = int(self.get_num_physical_servers_per_virtual_server())
+		src_virtual = virtual_servers_offset + src // num_physical_servers_per_virtual_server
+		dst_virtual = virtual_servers_offset + dst // num_physical_servers_per_virtual_server
+		if self.validate_traffic_endpoints and len(src_virtual) > 0:
+			assert(min(src_virtual.min(), dst_virtual.min()) >= virtual_servers_offset)
+			assert(max(src_virtual.max(), dst_virtual.max()) < virtual_servers_offset + num_virtual_servers)
+		inter_tor_pairs = src_virtual != dst_virtual
+		src_virtual, dst_virtual, prob = src_virtual[inter_tor_pairs], dst_virtual[inter_tor_pairs], prob[inter_tor_pairs]
+		if aggregate_duplicates and len(src_virtual) > 0:
+			pair_keys = (src_virtual - virtual_servers_offset) * (int(dst_virtual.max()) + 1) + dst_virtual
+			_, first_index, inverse = np.unique(pair_keys, return_index=True, return_inverse=True)
+			merged_prob = np.bincount(inverse.ravel(), weights=prob)
+			order = np.argsort(first_index, kind="mergesort")
+			src_virtual, dst_virtual, prob = src_virtual[first_index[order]], dst_virtual[first_index[order]], merged_prob[order]
+		# The normalization sum is accumulated in order, so the probabilities match the ones written by the per-pair loops.
+		prob_sum = np.cumsum(prob)[-1] if len(prob) > 0 else 0.
+		prob = prob / prob_sum
+		return src_virtual, dst_virtual, prob
+
+	# Generates the traffic events in the form of strings. The traffic probabilities can be given either as a dict
+	# keyed by (src, dst), or as parallel (src, dst, prob) arrays.
+	def generate_traffic_events_string(self, traffic_probability, aggregate_duplicates=False):
+		src_virtual, dst_virtual, prob = self.remap_traffic_probability(traffic_probability, aggregate_duplicates=aggregate_duplicates)
+		return "".join(map(self.traffic_events_line_format.format, range(len(prob)), src_virtual.tolist(), dst_virtual.tolist(), prob.tolist()))
+
+	# Writes the traffic events (i.e. the flow arrivals file) to path_or_fileobj, which is either a filename or an open
+	# file object, with a single bulk write.
+	def write_traffic_events_file(self, path_or_fileobj, traffic_probability, aggregate_duplicates=False):
+		traffic_events_string = self.generate_traffic_events_string(traffic_probability, aggregate_duplicates=aggregate_duplicates)
+		if hasattr(path_or_fileobj, "write"):
+			path_or_fileobj.write(traffic_events_string)
+		else:
+			with open(path_or_fileobj, "w+") as f:
+				f.write(traffic_events_string)
+		return
+
+	## Topology file generation shared by all topologies.
+	# Returns the lines of the topology file header that declare the ToR, server and switch device ids.
+	def get_topology_file_device_declarations(self):
+		raise Exception("Child classes must override this method.")
+
+	# Returns the total number of links in the topology, counting each parallel link separately.
+	def get_num_links(self):
+		if isinstance(self.adjacency_list, CSRAdjacency):
+			return self.adjacency_list.get_num_links()
+		num_links = 0
+		for switch_id in self.adjacency_list:
+			for target_switch_id in self.adjacency_list[switch_id]:
+				num_links += int(self.adjacency_list[switch_id][target_switch_id])
+		return num_links
+
+	# Generates the header of the netbench topology file.
+	def generate_topology_file_header(self):
+		header = "|V|={}\n".format(len(self.adjacency_list))
+		header += "|E|={}\n".format(self.get_num_links())
+		header += self.get_topology_file_device_declarations()
+		return header + "\n"
+
+	# Generates the edges of the netbench topology file in blocks, one block per adjacent device pair. By default each
+	# parallel link is written as its own "u v" line. If weighted is set, each pair is written once as "u v multiplicity",
+	# which is only understood by netbench builds that support weighted edges.
+	def generate_topology_file_edge_blocks(self, weighted=False):
+		if isinstance(self.adjacency_list, CSRAdjacency):
+			# Array-backed adjacencies are written out one chunk of source devices at a time, sorted by device id.
+			for src, dst, multiplicity in self.adjacency_list.iter_edge_array_chunks():
+				if weighted:
+					yield "".join(map("{} {} {}\n".format, src.tolist(), dst.tolist(), multiplicity.tolist()))
+				else:
+					yield "".join(map("{} {}\n".format, np.repeat(src, multiplicity).tolist(), np.repeat(dst, multiplicity).tolist()))
+			return
+		for switch_id in self.adjacency_list:
+			for target_switch_id in self.adjacency_list[switch_id]:
+				link_count = int(self.adjacency_list[switch_id][target_switch_id])
+				if weighted:
+					yield "{} {} {}\n".format(switch_id, target_switch_id, link_count)
+				else:
+					yield "{} {}\n".format(switch_id, target_switch_id) * link_count
+
+	# Writes the netbench topology file to path_or_fileobj, which is either a filename or an open file object. The edges
+	# are streamed out in chunks of roughly chunk_size characters, so the memory footprint does not grow with the number of links.
+	def write_topology_file(self, path_or_fileobj, weighted=False, chunk_size=1 << 20):
+		if hasattr(path_or_fileobj, "write"):
+			self.__write_topology_file_chunks(path_or_fileobj, weighted, chunk_size)
+		else:
+			with open(path_or_fileobj, "w+") as f:
+				self.__write_topology_file_chunks(f, weighted, chunk_size)
+		return
+
+	# Generates the topology string used for netbench.
+	def generate_topology_file_string(self, weighted=False):
+		return self.generate_topology_file_header() + "".join(self.generate_topology_file_edge_blocks(weighted=weighted))
+
+	def __write_topology_file_chunks(self, f, weighted, chunk_size):
+		f.write(self.generate_topology_file_header())
+		buffered_blocks = []
+		buffered_size = 0
+		for edge_block in self.generate_topology_file_edge_blocks(weighted=weighted):
+			buffered_blocks.append(edge_block)
+			buffered_size += len(edge_block)
+			if buffered_size >= chunk_size:
+				f.write("".join(buffered_blocks))
+				buffered_blocks = []
+				buffered_size = 0
+		if buffered_blocks:
+			f.write("".join(buffered_blocks))
+		return
+
+	## Interpod routing (WCMP) weights.
+	# Returns the ratio of the traffic from src_pod sent over each interpod path, as a (num_pods, num_pods) matrix where
+	# entry [src_pod, dst_pod] is the ratio of the direct path to dst_pod, entry [intermediate_pod, dst_pod] is the ratio
+	# of the two-hop path through intermediate_pod, and entries [dst_pod, dst_pod] and [:, src_pod] are unused.
+	# Returns None for topologies without interpod routing weights.
+	def get_interpod_path_weights(self, src_pod):
+		return None
+
+	# Returns the path weights of a uniform pod-to-pod logical topology, where each of the num_pods - 1 paths between
+	# two pods carries the same share of their traffic.
+	def get_uniform_interpod_path_weights(self, src_pod):
+		path_weights = np.full((self.num_pods, self.num_pods), float(1) / (self.num_pods - 1))
+		np.fill_diagonal(path_weights, 0.)
+		path_weights[:, src_pod] = 0.
+		path_weights[src_pod, :] = float(1) / (self.num_pods - 1)
+		path_weights[src_pod, src_pod] = 0.
+		return path_weights
+
+	# Generates the initial WCMP weights file in blocks, one block per source pod. Each block lists, for every destination
+	# pod, the direct path "2,ratio,src,dst" followed by the two-hop paths "3,ratio,src,intermediate,dst".
+	def generate_initial_interpod_routing_weights_blocks(self):
+		if self.get_interpod_path_weights(0) is None:
+			return
+		pod_strings = [str(pod_id) for pod_id in range(self.num_pods)]
+		for src_pod in range(self.num_pods):
+			path_weights = self.get_interpod_path_weights(src_pod)
+			valid_paths = self.__get_valid_interpod_paths(src_pod)
+			# Pods other than src_pod, in increasing order, are the candidate intermediate pods.
+			other_pod_strings = pod_strings[:src_pod] + pod_strings[src_pod + 1:]
+			uniform_ratio = path_weights[src_pod, 1 if src_pod == 0 else 0]
+			is_uniform = np.all(path_weights[valid_paths] == uniform_ratio)
+			str_builder = []
+			for dst_pod in range(self.num_pods):
+				if dst_pod == src_pod:
+					continue
+				dst_index = dst_pod if dst_pod < src_pod else dst_pod - 1
+				intermediate_pod_strings = other_pod_strings[:dst_index] + other_pod_strings[dst_index + 1:]
+				if is_uniform:
+					# All paths share the same ratio, so the two-hop lines are assembled with a single join.
+					ratio_string = "{}".format(float(uniform_ratio))
+					str_builder.append("2,{},{},{}\n".format(ratio_string, src_pod, dst_pod))
+					if intermediate_pod_strings:
+						two_hop_prefix = "3,{},{},".format(ratio_string, src_pod)
+						two_hop_suffix = ",{}\n".format(dst_pod)
+						str_builder.append(two_hop_prefix + (two_hop_suffix + two_hop_prefix).join(intermediate_pod_strings) + two_hop_suffix)
+				else:
+					str_builder.append("2,{},{},{}\n".format(float(path_weights[src_pod, dst_pod]), src_pod, dst_pod))
+					intermediate_pods = [pod_id for pod_id in range(self.num_pods) if pod_id != src_pod and pod_id != dst_pod]
+					str_builder.extend(map("3,{},{},{},{}\n".format, path_weights[intermediate_pods, dst_pod].tolist(), [src_pod] * len(intermediate_pods), intermediate_pods, [dst_pod] * len(intermediate_pods)))
+			yield "".join(str_builder)
+
+	# Generates the initial WCMP weights in the compact format: a "default,ratio" line giving the ratio of every path, followed
+	# by the paths whose ratio differs from it, in the same "2,ratio,src,dst" and "3,ratio,src,intermediate,dst" lines as the full format.
+	# The default is the ratio of a uniform pod-to-pod logical topology, so uniform topologies are described by a single line.
+	def generate_compact_interpod_routing_weights_blocks(self):
+		if self.get_interpod_path_weights(0) is None:
+			return
+		default_ratio = float(1) / (self.num_pods - 1)
+		yield "default,{}\n".format(default_ratio)
+		for src_pod in range(self.num_pods):
+			path_weights = self.get_interpod_path_weights(src_pod)
+			exceptions = self.__get_valid_interpod_paths(src_pod) & (path_weights != default_ratio)
+			dst_pods, intermediate_pods = np.nonzero(exceptions.T)
+			if len(dst_pods) == 0:
+				continue
+			# List the paths in the order of the full format, the direct path to each destination before its two-hop paths.
+			order = np.lexsort((intermediate_pods, intermediate_pods != src_pod, dst_pods))
+			dst_pods, intermediate_pods = dst_pods[order], intermediate_pods[order]
+			str_builder = []
+			for intermediate_pod, dst_pod, ratio in zip(intermediate_pods.tolist(), dst_pods.tolist(), path_weights[intermediate_pods, dst_pods].tolist()):
+				if intermediate_pod == src_pod:
+					str_builder.append("2,{},{},{}\n".format(ratio, src_pod, dst_pod))
+				else:
+					str_builder.append("3,{},{},{},{}\n".format(ratio, src_pod, intermediate_pod, dst_pod))
+			yield "".join(str_builder)
+
+	# Writes the initial WCMP weights to path_or_fileobj, which is either a filename or an open file object, one source pod
+	# at a time so the memory footprint stays at O(num_pods^2). The weights_format is one of:
+	#	"full" - the netbench WCMP weights file, one line per path.
+	#	"compact" - a default ratio followed by the paths that differ from it (see generate_compact_interpod_routing_weights_blocks).
+	#	"binary" - a .npy float64 array of shape (num_pods, num_pods, num_pods), where entry [src_pod] holds the matrix
+	#			   returned by get_interpod_path_weights(src_pod). File objects must be opened in binary mode.
+	# The compact and binary formats are only understood by simulator builds that support them.
+	def write_initial_interpod_routing_weights_file(self, path_or_fileobj, weights_format="full", chunk_size=1 << 20):
+		assert(weights_format in ("full", "compact", "binary"))
+		if hasattr(path_or_fileobj, "write"):
+			self.__write_interpod_routing_weights(path_or_fileobj, weights_format, chunk_size)
+		else:
+			with open(path_or_fileobj, "wb" if weights_format == "binary" else "w+") as f:
+				self.__write_interpod_routing_weights(f, weights_format, chunk_size)
+		return
+
+	# Generates the initial WCMP weights string used for netbench.
+	def generate_initial_interpod_routing_weights_string(self):
+		return "".join(self.generate_initial_interpod_routing_weights_blocks())
+
+	# Returns the mask of the entries of get_interpod_path_weights(src_pod) that correspond to an actual path.
+	def __get_valid_interpod_paths(self, src_pod):
+		valid_paths = ~np.eye(self.num_pods, dtype=bool)
+		valid_paths[:, src_pod] = False
+		valid_paths[src_pod, :] = True
+		valid_paths[src_pod, src_pod] = False
+		return valid_paths
+
+	def __write_interpod_routing_weights(self, f, weights_format, chunk_size):
+		if weights_format == "binary":
+			if self.get_interpod_path_weights(0) is None:
+				return
+			np.lib.format.write_array_header_1_0(f, {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float64)), "fortran_order": False, "shape": (self.num_pods, self.num_pods, self.num_pods)})
+			for src_pod in range(self.num_pods):
+				path_weights = np.where(self.__get_valid_interpod_paths(src_pod), self.get_interpod_path_weights(src_pod), 0.)
+				f.write(path_weights.astype(np.float64).tobytes())
+			return
+		blocks = self.generate_initial_interpod_routing_weights_blocks() if weights_format == "full" else self.generate_compact_interpod_routing_weights_blocks()
+		buffered_blocks = []
+		buffered_size = 0
+		for block in blocks:
+			buffered_blocks.append(block)
+			buffered_size += len(block)
+			if buffered_size >= chunk_size:
+				f.write("".join(buffered_blocks))
+				buffered_blocks = []
+				buffered_size = 0
+		if buffered_blocks:
+			f.write("".join(buffered_blocks))
+		return
+
 	def get_name(self):
 		raise Exception("Child classes must override this method.")
 		return ""
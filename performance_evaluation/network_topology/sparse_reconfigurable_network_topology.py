@@ -8,14 +8,20 @@ from network_topology import *
 # pod, but we logically collapse all aggregation switches to 1. In other words, each pod must only have 
 # one aggregation switch.
 class SparseReconfigurableNetworkTopology(NetworkTopology):
-	def __init__(self, eps_radix, num_tors, num_servers_per_tor=-1):
-		NetworkTopology.__init__(self, eps_radix)
+	# Server ids are remapped onto ToRs without checking that the ToR has been wired.
+	validate_traffic_endpoints = False
+
+	def __init__(self, eps_radix, num_tors, num_servers_per_tor=-1, adjacency_backend="dict"):
+		NetworkTopology.__init__(self, eps_radix, adjacency_backend=adjacency_backend)
 		self.num_pods = num_tors
 		self.num_servers_per_tor = num_servers_per_tor
 		assert((self.eps_radix / 2) < num_tors - 1)
 	
 	# Wires up the network in its entirety, and sets up the various topological properties.
 	def wire_network(self):
+		if self.adjacency_backend == "csr":
+			self.__wire_network_csr()
+			return
 		# Step 1: Intialize the servers and the switches first if all pods, while also wiring things together
 		for pod_id in range(self.num_pods):
 			# Step 1.1 : Initialize the ToR switch, which serves as the aggregation switch in the sparse model. Still just 1 aggregation/ToR per pod.
@@ -48,61 +54,40 @@ class SparseReconfigurableNetworkTopology(NetworkTopology):
 		#	offset_switch = max((offset_switch + 1) % self.num_pods, 1)
 		return
 
-	# Generates the traffic probability in the form of strings.
-	def generate_traffic_events_string(self, traffic_probability):
-		str_builder = ""
-		virtual_servers_offset = self.num_pods # Server indices are in the range [num_pods, 2 * num_pods - 1]
-		num_physical_servers_per_tor = -1
+	# Wires up the same network as wire_network, building the CSR adjacency directly from link arrays.
+	def __wire_network_csr(self):
+		tor_ids = np.arange(self.num_pods)
+		server_ids = self.num_pods + tor_ids
+		# Uniform mesh between the ToRs, one link per ordered ToR pair.
+		src_tor, dst_tor = np.divmod(np.arange(self.num_pods * self.num_pods), self.num_pods)
+		is_interpod = src_tor != dst_tor
+		src = np.concatenate((server_ids, tor_ids, src_tor[is_interpod]))
+		dst = np.concatenate((tor_ids, server_ids, dst_tor[is_interpod]))
+		multiplicity = np.concatenate((np.full(2 * self.num_pods, self.eps_radix // 2), np.ones(self.num_pods * (self.num_pods - 1), dtype=np.int64)))
+		self.adjacency_list = CSRAdjacency.from_edges(src, dst, multiplicity, num_nodes=2 * self.num_pods)
+		self.device_id_to_pod_id_map = dict(enumerate(np.concatenate((tor_ids, tor_ids)).tolist()))
+		return
+
+	# Server indices are in the range [num_pods, 2 * num_pods - 1], one per ToR.
+	def get_virtual_server_range(self):
+		return self.num_pods, self.num_pods
+
+	# Each virtual server represents all the physical servers below a ToR.
+	def get_num_physical_servers_per_virtual_server(self):
 		if self.num_servers_per_tor < 0:
-			num_physical_servers_per_tor = self.eps_radix / 2
-		else:
-			num_physical_servers_per_tor = self.num_servers_per_tor / 2
-		index = 0
-		prob_sum = 0
-		for src, dst in traffic_probability:
-			src_virtual = virtual_servers_offset + src / num_physical_servers_per_tor
-			dst_virtual = virtual_servers_offset + dst / num_physical_servers_per_tor
-			if src_virtual != dst_virtual:
-				prob_sum += traffic_probability[(src, dst)]
-		for src, dst in traffic_probability:
-			src_virtual = virtual_servers_offset + src / num_physical_servers_per_tor
-			dst_virtual = virtual_servers_offset + dst / num_physical_servers_per_tor
-			if src_virtual != dst_virtual:
-				str_builder += "{},{},{},{:.4e}\n".format(index, src_virtual, dst_virtual, traffic_probability[(src, dst)] / prob_sum)
-				index += 1
-		return str_builder
+			return self.eps_radix // 2
+		return self.num_servers_per_tor // 2
 
-	# Generates the initial WCMP configuration for a uniform pod-to-pod logical topology.
-	def generate_initial_interpod_routing_weights_string(self):
-		str_builder = ""
-		per_path_ratio = float(1) / (self.num_pods - 1)
-		for src_pod in range(self.num_pods):
-			for dst_pod in range(self.num_pods):
-				if src_pod != dst_pod:
-					str_builder += "{},{},{},{}\n".format(2, per_path_ratio, src_pod, dst_pod)
-					for intermediate_pod in range(self.num_pods):
-						if intermediate_pod != src_pod and intermediate_pod != dst_pod:
-							str_builder += "{},{},{},{},{}\n".format(3, per_path_ratio, src_pod, intermediate_pod, dst_pod)
-		return str_builder
+	# Routes uniformly over the direct path and all two-hop paths of a uniform pod-to-pod logical topology.
+	def get_interpod_path_weights(self, src_pod):
+		return self.get_uniform_interpod_path_weights(src_pod)
 
-	# Generates the topology string used for netbench
-	def generate_topology_file_string(self):
-		prefix = ""
-		topol_str = ""
-		num_edges = 0
-		for switch_id in self.adjacency_list:
-			for target_switch_id in self.adjacency_list[switch_id]:
-				link_count = self.adjacency_list[switch_id][target_switch_id]
-				num_edges += link_count
-				for _ in range(link_count):
-					topol_str += "{} {}\n".format(switch_id, target_switch_id)
-		num_switches = len(self.adjacency_list)
-		prefix += ("|V|={}".format(num_switches) + "\n")
-		prefix += ("|E|={}".format(num_edges) + "\n")
-		prefix += "ToRs=incl_range({},{})\n".format(0, self.num_pods - 1)
-		prefix += "Servers=incl_range({},{})\n".format(self.num_pods, 2 * self.num_pods - 1)
-		prefix += "Switches=set()\n\n"
-		return prefix + topol_str
+	# Declares the ToRs and servers, there are no other switches.
+	def get_topology_file_device_declarations(self):
+		declarations = "ToRs=incl_range({},{})\n".format(0, self.num_pods - 1)
+		declarations += "Servers=incl_range({},{})\n".format(self.num_pods, 2 * self.num_pods - 1)
+		declarations += "Switches=set()\n"
+		return declarations
 
 	# Retrieves the name of this topology, summarizing some of the essential parameters. Used to create topology directory and filename.
 	def get_name(self):
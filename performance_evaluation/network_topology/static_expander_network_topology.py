@@ -1,21 +1,45 @@
 import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
 import networkx as nx
 from network_topology import *
-from numpy import linalg as LA
 import math
 
 # In this model, the network is a static expander that directly connects ToRs.
-class StaticExpanderNetworkTopology:
-	def __init__(self, eps_radix, target_num_tors, num_servers_per_tor=-1):
-		self.eps_radix = eps_radix
-		self.adjacency_list = {}
+class StaticExpanderNetworkTopology(NetworkTopology):
+	# Server ids are remapped onto ToRs without checking that the ToR has been wired.
+	validate_traffic_endpoints = False
+	# Lifts with at most this many ToRs are checked with a dense eigensolver, which is faster than Lanczos at this size.
+	DENSE_EIGENSOLVER_MAX_NODES = 256
+
+	# The expander is the first random lift that passes the Ramanujan check, out of at most max_lift_attempts. The lifts
+	# are drawn from a numpy RandomState seeded with seed, so a given seed always yields the same wiring.
+	def __init__(self, eps_radix, target_num_tors, num_servers_per_tor=-1, adjacency_backend="dict", seed=None, max_lift_attempts=100):
+		NetworkTopology.__init__(self, eps_radix, adjacency_backend=adjacency_backend)
 		self.num_pods = target_num_tors
 		self.num_servers_per_tor = num_servers_per_tor
-		assert((self.eps_radix / 2) < self.num_pods - 1)
-	
+		assert((self.eps_radix // 2) < self.num_pods - 1)
+		assert(max_lift_attempts > 0)
+		# The k-lift yields a whole number of (eps_radix / 2 + 1)-ToR groups, so the number of ToRs is rounded up to
+		# that size here, and the virtual server ids are known before the network is wired.
+		lift_group_size = self.eps_radix // 2 + 1
+		self.num_pods = lift_group_size * int(math.ceil(float(target_num_tors) / lift_group_size))
+		self.random_state = np.random.RandomState(seed)
+		self.max_lift_attempts = max_lift_attempts
+		# Filled in by random_k_lift: the number of lifts drawn, and the lambda2 of the lift that was kept.
+		self.num_lift_attempts = 0
+		self.lambda2 = None
+		return
+
+	# Returns the second largest eigenvalue magnitude of a symmetric adjacency matrix, either dense or scipy sparse.
+	# Large matrices use the sparse Lanczos solver for the top 2 eigenvalues only, small ones a dense symmetric solver.
 	def get_lambda2(self, mat):
-		eig,vecs = LA.eig(mat)	
-		eig = np.abs(eig)
+		if mat.shape[0] <= self.DENSE_EIGENSOLVER_MAX_NODES:
+			dense_mat = mat.toarray() if scipy.sparse.issparse(mat) else np.asarray(mat)
+			eig = np.abs(np.linalg.eigvalsh(dense_mat.astype(float)))
+		else:
+			v0 = self.random_state.uniform(-1., 1., mat.shape[0])
+			eig = np.abs(scipy.sparse.linalg.eigsh(scipy.sparse.csr_matrix(mat, dtype=float), k=2, which="LM", v0=v0, return_eigenvectors=False))
 		eig.sort()
 		return eig[-2]
 
@@ -28,39 +52,35 @@ class StaticExpanderNetworkTopology:
 	# d= the degree of the graph
 	# k= number of lifts to perform
 	# e.g.,: random_k_lift(4,6) will create a 4 regualr graph with 30 nodes
+	# Returns the adjacency matrix of the lift as a scipy CSR matrix. Lifts are redrawn until one is Ramanujan, and the
+	# number of draws and the lambda2 of the result are kept in num_lift_attempts and lambda2.
 	def random_k_lift(self, d, k):
 		num_nodes = (d+1) * k
-		mat = np.zeros( (num_nodes, num_nodes), dtype=int)
-		# go over all meta nodes
-		for meta1 in range(d + 1):
-			# connect to any other meta node
-			for meta2 in range(meta1 + 1, d + 1):
-
-				# connect the ToRs between the meta-nodes randomally
-				perm = np.random.permutation(k)
-				for src_ind in range(k):
-					src = meta1 * k + src_ind
-					dst = meta2 * k + perm[src_ind]
-
-					# connect the link
-					mat[src,dst] = 1
-					mat[dst,src] = 1
-
-		if not self.is_ramanujan(mat,d):
+		# Every pair of meta nodes is connected by a random perfect matching between their k ToRs.
+		meta1, meta2 = np.triu_indices(d + 1, 1)
+		src = (meta1[:, np.newaxis] * k + np.arange(k)).ravel()
+		self.num_lift_attempts = 0
+		while self.num_lift_attempts < self.max_lift_attempts:
+			self.num_lift_attempts += 1
+			perms = np.argsort(self.random_state.rand(len(meta1), k), axis=1)
+			dst = (meta2[:, np.newaxis] * k + perms).ravel()
+			mat = scipy.sparse.coo_matrix((np.ones(2 * len(src), dtype=int), (np.concatenate((src, dst)), np.concatenate((dst, src)))), shape=(num_nodes, num_nodes)).tocsr()
+			self.lambda2 = self.get_lambda2(mat)
+			if self.lambda2 < self.get_spectral_gap(d):
+				return mat
 			# try again if we got a bad Xpander
-			return self.random_k_lift(d, k)
-		return mat
+		raise RuntimeError("No Ramanujan {}-lift of degree {} found in {} attempts, the last lambda2 was {}".format(k, d, self.max_lift_attempts, self.lambda2))
 
 	# Wires up the network in its entirety, and sets up the various topological properties.
 	def wire_network(self):
 		# Step 0: Run the k-lifting algorithm to generate the ToR level connectivity
-
-		tor_level_topology_adj_matrix = self.random_k_lift(self.eps_radix / 2, int(math.ceil(float(self.num_pods) / ((self.eps_radix / 2) + 1))))
-		self.num_pods = len(tor_level_topology_adj_matrix)
+		tor_level_topology_adj_matrix = self.random_k_lift(self.eps_radix // 2, self.num_pods // ((self.eps_radix // 2) + 1))
+		self.num_pods = tor_level_topology_adj_matrix.shape[0]
 		# Check for k-lifting symmetry
-		for i in range(len(tor_level_topology_adj_matrix)):
-			for j in range(i+1, len(tor_level_topology_adj_matrix), 1):
-				assert(tor_level_topology_adj_matrix[i][j] == tor_level_topology_adj_matrix[j][i])
+		assert((tor_level_topology_adj_matrix != tor_level_topology_adj_matrix.T).nnz == 0)
+		if self.adjacency_backend == "csr":
+			self.__wire_network_csr(tor_level_topology_adj_matrix)
+			return
 		# Step 1: Intialize the servers and the switches first if all pods, while also wiring things together
 		for tor_id in range(self.num_pods):
 			# Step 1.1 : Initialize the ToR switch, which serves as the aggregation switch in the sparse model. Still just 1 aggregation/ToR per pod.
@@ -71,63 +91,47 @@ class StaticExpanderNetworkTopology:
 			self.adjacency_list[server_id] = {}
 
 			# Step 1.3 : Connect the servers to the ToRs
-			self.adjacency_list[server_id][tor_id] = self.eps_radix / 2
-			self.adjacency_list[tor_id][server_id] = self.eps_radix / 2
+			self.adjacency_list[server_id][tor_id] = self.eps_radix // 2
+			self.adjacency_list[tor_id][server_id] = self.eps_radix // 2
 
 		# Step 2: Wire up the initial inter-pod logical topology between aggregation switches, with rotation matching like Rotornet
 		# Step 2.1: Derive the logical interpod adjacency matrix, for setup just form a uniform mesh
+		indptr, indices, data = tor_level_topology_adj_matrix.indptr, tor_level_topology_adj_matrix.indices, tor_level_topology_adj_matrix.data
 		for i in range(self.num_pods):
-			for j in range(self.num_pods):
-				if i != j and tor_level_topology_adj_matrix[i][j] > 0:
-					self.adjacency_list[i][j] = tor_level_topology_adj_matrix[i][j]
+			for j, link_count in zip(indices[indptr[i]:indptr[i + 1]].tolist(), data[indptr[i]:indptr[i + 1]].tolist()):
+				if i != j and link_count > 0:
+					self.adjacency_list[i][j] = link_count
 		return
 
-	# Generates the traffic events in the form of strings.
-	def generate_traffic_events_string(self, traffic_probability):
-		str_builder = ""
-		virtual_servers_offset = self.num_pods # Server indices are in the range [num_pods, 2 * num_pods - 1]
-		num_physical_servers_per_tor = -1
+	# Builds the CSR adjacency directly from link arrays, given the ToR level adjacency matrix of the expander.
+	def __wire_network_csr(self, tor_level_topology_adj_matrix):
+		tor_ids = np.arange(self.num_pods)
+		server_ids = self.num_pods + tor_ids
+		tor_level_topology_coo_matrix = tor_level_topology_adj_matrix.tocoo()
+		is_interpod = tor_level_topology_coo_matrix.row != tor_level_topology_coo_matrix.col
+		src_tor, dst_tor = tor_level_topology_coo_matrix.row[is_interpod], tor_level_topology_coo_matrix.col[is_interpod]
+		src = np.concatenate((server_ids, tor_ids, src_tor))
+		dst = np.concatenate((tor_ids, server_ids, dst_tor))
+		multiplicity = np.concatenate((np.full(2 * self.num_pods, self.eps_radix // 2), tor_level_topology_coo_matrix.data[is_interpod]))
+		self.adjacency_list = CSRAdjacency.from_edges(src, dst, multiplicity, num_nodes=2 * self.num_pods)
+		return
+
+	# Server indices are in the range [num_pods, 2 * num_pods - 1], one per ToR.
+	def get_virtual_server_range(self):
+		return self.num_pods, self.num_pods
+
+	# Each virtual server represents all the physical servers below a ToR.
+	def get_num_physical_servers_per_virtual_server(self):
 		if self.num_servers_per_tor < 0:
-			num_physical_servers_per_tor = self.eps_radix / 2
-		else:
-			num_physical_servers_per_tor = self.num_servers_per_tor / 2
-		index = 0
-		prob_sum = 0
-		for src, dst in traffic_probability:
-			src_virtual = virtual_servers_offset + src / num_physical_servers_per_tor
-			dst_virtual = virtual_servers_offset + dst / num_physical_servers_per_tor
-			if src_virtual != dst_virtual:
-				prob_sum += traffic_probability[(src, dst)]
-		for src, dst in traffic_probability:
-			src_virtual = virtual_servers_offset + src / num_physical_servers_per_tor
-			dst_virtual = virtual_servers_offset + dst / num_physical_servers_per_tor
-			if src_virtual != dst_virtual:
-				str_builder += "{},{},{},{:.4e}\n".format(index, src_virtual, dst_virtual, traffic_probability[(src, dst)] / prob_sum)
-				index += 1
-		return str_builder
-
-	# Generates the topology string used for netbench
-	def generate_topology_file_string(self):
-		prefix = ""
-		topol_str = ""
-		num_edges = 0
-		for switch_id in self.adjacency_list:
-			for target_switch_id in self.adjacency_list[switch_id]:
-				link_count = self.adjacency_list[switch_id][target_switch_id]
-				num_edges += link_count
-				for _ in range(link_count):
-					topol_str += "{} {}\n".format(switch_id, target_switch_id)
-		num_switches = len(self.adjacency_list)
-		prefix += ("|V|={}".format(num_switches) + "\n")
-		prefix += ("|E|={}".format(num_edges) + "\n")
-		prefix += "ToRs=incl_range({},{})\n".format(0, self.num_pods - 1)
-		prefix += "Servers=incl_range({},{})\n".format(self.num_pods, 2 * self.num_pods - 1)
-		prefix += "Switches=set()\n\n"
-		return prefix + topol_str
-
-	# Generates the initial WCMP configuration for a uniform pod-to-pod logical topology.
-	def generate_initial_interpod_routing_weights_string(self):
-		return ""
+			return self.eps_radix // 2
+		return self.num_servers_per_tor // 2
+
+	# Declares the ToRs and servers, there are no other switches.
+	def get_topology_file_device_declarations(self):
+		declarations = "ToRs=incl_range({},{})\n".format(0, self.num_pods - 1)
+		declarations += "Servers=incl_range({},{})\n".format(self.num_pods, 2 * self.num_pods - 1)
+		declarations += "Switches=set()\n"
+		return declarations
 
 	# Generates the strings used to write to the filename, which states 
 	# the pod id each of the switch/server belongs to.
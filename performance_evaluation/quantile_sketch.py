@@ -0,0 +1,257 @@
+import os, sys
+import argparse
+import numpy as np
+
+## Mergeable streaming quantile sketch with relative error (REQ sketch, Cormode et al., "Relative Error Streaming
+## Quantiles"), in its high rank accuracy mode, for summarizing large streams of values in bounded memory.
+## The sketch keeps a hierarchy of compactors: level h holds items that each stand for 2^h values of the stream. The
+## buffer of a compactor is split into num_sections sections of section_size items, and holds at most
+## 2 * num_sections * section_size items before it is compacted. A compaction sorts the buffer and promotes every other
+## one (from a random offset) of its smallest items to the next level: the largest half of the buffer is never compacted,
+## and of the rest, the number of sections compacted follows the trailing ones of a counter of compactions, so the
+## largest sections are compacted exponentially less often than the smallest. The number of sections doubles (and their
+## size shrinks by sqrt(2)) as the compactions go on, so the rank error of a quantile q is a small fraction of
+## (1 - q) * count: the upper quantiles of the stream, e.g. the tail of the flow completion times, are kept the most
+## accurately. Values are inserted in batches no larger than the space left in the sketch, so the memory footprint
+## only depends on k and (logarithmically) on the number of values.
+
+DEFAULT_K = 32
+INITIAL_NUM_SECTIONS = 3
+MIN_SECTION_SIZE = 4
+
+# Returns the number of trailing one bits of n.
+def count_trailing_ones(n):
+	count = 0
+	while n & 1:
+		n >>= 1
+		count += 1
+	return count
+
+# Returns the even integer closest to value.
+def round_to_even(value):
+	return 2 * int(round(value / 2.))
+
+## Compactor of a single level of the sketch.
+class ReqCompactor(object):
+	def __init__(self, level, section_size):
+		self.level = level
+		self.section_size_float = float(section_size)
+		self.section_size = section_size
+		self.num_sections = INITIAL_NUM_SECTIONS
+		# Counts the compactions, its trailing ones decide how many sections are compacted.
+		self.state = 0
+		self.coin = False
+		self.items = np.zeros(0)
+		return
+
+	def get_nominal_capacity(self):
+		return 2 * self.num_sections * self.section_size
+
+	# Halves the section size (down to MIN_SECTION_SIZE) by sqrt(2) and doubles the number of sections once every section
+	# has been compacted. Returns whether the sections changed.
+	def ensure_enough_sections(self):
+		section_size_float = self.section_size_float / np.sqrt(2)
+		section_size = round_to_even(section_size_float)
+		if self.state >= 1 << (self.num_sections - 1) and self.section_size > MIN_SECTION_SIZE and section_size >= MIN_SECTION_SIZE:
+			self.section_size_float = section_size_float
+			self.section_size = section_size
+			self.num_sections *= 2
+			return True
+		return False
+
+	# Compacts the buffer and returns the items promoted to the next level.
+	def compact(self, random):
+		items = np.sort(self.items)
+		num_compacted_sections = min(count_trailing_ones(self.state) + 1, self.num_sections)
+		num_kept = self.get_nominal_capacity() // 2 + (self.num_sections - num_compacted_sections) * self.section_size
+		# The number of compacted items is even, so that the compaction preserves the total weight.
+		if (len(items) - num_kept) % 2 == 1:
+			num_kept += 1
+		num_compacted = max(len(items) - num_kept, 0)
+		# Every other compaction uses the opposite offset of the previous one, which halves the variance of the error.
+		if self.state % 2 == 1:
+			self.coin = not self.coin
+		else:
+			self.coin = bool(random.randint(2))
+		promoted_items = items[int(self.coin):num_compacted:2]
+		self.items = items[num_compacted:]
+		self.state += 1
+		self.ensure_enough_sections()
+		return promoted_items
+
+	# Merges the compactor of the same level of another sketch into this one.
+	def merge(self, other):
+		assert(self.level == other.level)
+		self.state |= other.state
+		while self.ensure_enough_sections():
+			pass
+		self.items = np.concatenate((self.items, other.items))
+		return
+
+class ReqSketch(object):
+	def __init__(self, k=DEFAULT_K, seed=None):
+		assert(k >= MIN_SECTION_SIZE and k % 2 == 0), "k must be an even number of at least {}".format(MIN_SECTION_SIZE)
+		self.k = k
+		self.random = np.random.RandomState(seed)
+		self.compactors = [ReqCompactor(0, k)]
+		self.count = 0
+		self.min = float("inf")
+		self.max = float("-inf")
+		return
+
+	def get_count(self):
+		return self.count
+
+	def get_num_retained(self):
+		return sum(len(compactor.items) for compactor in self.compactors)
+
+	# Number of items the sketch holds before it compresses, the sum of the nominal capacities of its compactors.
+	def get_max_nominal_size(self):
+		return sum(compactor.get_nominal_capacity() for compactor in self.compactors)
+
+	# Adds a batch of values (any array-like of numbers) to the sketch. The values are added in pieces that fit in the
+	# space left in the sketch, which is compressed in between.
+	def update(self, values):
+		values = np.asarray(values, dtype=np.float64).ravel()
+		if len(values) == 0:
+			return
+		assert(not np.isnan(values).any())
+		self.count += len(values)
+		self.min = min(self.min, float(values.min()))
+		self.max = max(self.max, float(values.max()))
+		start = 0
+		while start < len(values):
+			end = start + max(self.get_max_nominal_size() - self.get_num_retained(), 1)
+			self.compactors[0].items = np.concatenate((self.compactors[0].items, values[start:end]))
+			start = end
+			if self.get_num_retained() >= self.get_max_nominal_size():
+				self.__compress()
+		return
+
+	# Merges other into this sketch; other is left unchanged. Both sketches must have the same k.
+	def merge(self, other):
+		assert(self.k == other.k)
+		if other.count == 0:
+			return self
+		while len(self.compactors) < len(other.compactors):
+			self.compactors.append(ReqCompactor(len(self.compactors), self.k))
+		for compactor, other_compactor in zip(self.compactors, other.compactors):
+			compactor.merge(other_compactor)
+		self.count += other.count
+		self.min = min(self.min, other.min)
+		self.max = max(self.max, other.max)
+		if self.get_num_retained() >= self.get_max_nominal_size():
+			self.__compress()
+		return self
+
+	# Compacts every compactor at or above its nominal capacity, from the bottom up, adding a level at the top if needed.
+	def __compress(self):
+		level = 0
+		while level < len(self.compactors):
+			compactor = self.compactors[level]
+			if len(compactor.items) >= compactor.get_nominal_capacity():
+				if level + 1 == len(self.compactors):
+					self.compactors.append(ReqCompactor(level + 1, self.k))
+				promoted_items = compactor.compact(self.random)
+				self.compactors[level + 1].items = np.concatenate((self.compactors[level + 1].items, promoted_items))
+			level += 1
+		return
+
+	# Returns the retained items in increasing order, with the cumulative weight of the stream up to every item.
+	def get_sorted_items(self):
+		items = np.concatenate([compactor.items for compactor in self.compactors])
+		weights = np.concatenate([np.full(len(compactor.items), float(1 << compactor.level)) for compactor in self.compactors])
+		order = np.argsort(items, kind="mergesort")
+		return items[order], np.cumsum(weights[order])
+
+	# Estimates the values at the given quantiles (each in [0, 1]). Quantiles 0 and 1 are the exact minimum and maximum.
+	def get_quantiles(self, quantiles):
+		assert(self.count > 0)
+		quantiles = np.asarray(quantiles, dtype=np.float64)
+		items, cumulative_weights = self.get_sorted_items()
+		indices = np.minimum(np.searchsorted(cumulative_weights, quantiles * cumulative_weights[-1], side="left"), len(items) - 1)
+		estimates = items[indices]
+		estimates[quantiles <= 0] = self.min
+		estimates[quantiles >= 1] = self.max
+		return estimates
+
+	def get_quantile(self, quantile):
+		return float(self.get_quantiles([quantile])[0])
+
+	# Estimates the fraction of the values that are at most each of the given values.
+	def get_cdf(self, values):
+		assert(self.count > 0)
+		items, cumulative_weights = self.get_sorted_items()
+		indices = np.searchsorted(items, np.asarray(values, dtype=np.float64), side="right")
+		return np.concatenate(([0.], cumulative_weights))[indices] / cumulative_weights[-1]
+
+	# Returns the estimated CDF of the stream as (values, fractions), a step function with at most num_points steps.
+	def get_cdf_points(self, num_points=None):
+		items, cumulative_weights = self.get_sorted_items()
+		fractions = cumulative_weights / cumulative_weights[-1]
+		if num_points is not None and len(items) > num_points:
+			indices = np.minimum(np.searchsorted(fractions, np.linspace(0, 1, num_points + 1)[1:], side="left"), len(items) - 1)
+			return items[indices], fractions[indices]
+		return items, fractions
+
+	## Serialization to JSON-compatible dictionaries, to merge sketches across processes and runs.
+	def to_dict(self):
+		compactor_dicts = [{"section_size_float": compactor.section_size_float,
+							"section_size": compactor.section_size,
+							"num_sections": compactor.num_sections,
+							"state": compactor.state,
+							"coin": compactor.coin,
+							"items": compactor.items.tolist()} for compactor in self.compactors]
+		return {"k": self.k, "count": self.count, "min": self.min, "max": self.max, "compactors": compactor_dicts}
+
+	@classmethod
+	def from_dict(cls, sketch_dict, seed=None):
+		sketch = cls(k=sketch_dict["k"], seed=seed)
+		sketch.compactors = []
+		for level, compactor_dict in enumerate(sketch_dict["compactors"]):
+			compactor = ReqCompactor(level, sketch_dict["k"])
+			compactor.section_size_float = compactor_dict["section_size_float"]
+			compactor.section_size = compactor_dict["section_size"]
+			compactor.num_sections = compactor_dict["num_sections"]
+			compactor.state = compactor_dict["state"]
+			compactor.coin = compactor_dict["coin"]
+			compactor.items = np.array(compactor_dict["items"], dtype=np.float64)
+			sketch.compactors.append(compactor)
+		sketch.count = sketch_dict["count"]
+		sketch.min = sketch_dict["min"]
+		sketch.max = sketch_dict["max"]
+		return sketch
+
+## Accuracy check.
+# Streams num_values heavy-tailed (Pareto, like flow completion times) values through sketches, once into a single
+# sketch in num_parts updates, and once into num_parts sketches that are then merged, and returns the largest relative
+# error of the estimated values at the given quantiles over num_trials trials, for each of the two ways.
+def check_accuracy(num_values=2000000, num_parts=200, quantiles=(0.99, 0.999), k=DEFAULT_K, num_trials=3, pareto_shape=1.5):
+	max_errors = {"streamed": 0., "merged": 0.}
+	for trial in range(num_trials):
+		values = np.random.RandomState(trial).pareto(pareto_shape, num_values) + 1.
+		exact_quantiles = np.sort(values)[np.ceil(np.asarray(quantiles) * num_values).astype(np.int64) - 1]
+		streamed_sketch = ReqSketch(k=k, seed=trial)
+		merged_sketch = ReqSketch(k=k, seed=trial)
+		for part, part_values in enumerate(np.array_split(values, num_parts)):
+			streamed_sketch.update(part_values)
+			part_sketch = ReqSketch(k=k, seed=num_parts * (trial + 1) + part)
+			part_sketch.update(part_values)
+			merged_sketch.merge(part_sketch)
+		for way, sketch in (("streamed", streamed_sketch), ("merged", merged_sketch)):
+			assert(sketch.get_count() == num_values)
+			errors = np.abs(sketch.get_quantiles(quantiles) / exact_quantiles - 1.)
+			max_errors[way] = max(max_errors[way], float(errors.max()))
+	return max_errors
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Checks the accuracy of the upper quantiles of the sketch on heavy-tailed values.")
+	parser.add_argument("--num-values", type=int, default=2000000)
+	parser.add_argument("--num-parts", type=int, default=200, help="Number of updates, and of merged sketches.")
+	parser.add_argument("--k", type=int, default=DEFAULT_K)
+	parser.add_argument("--trials", type=int, default=3)
+	parser.add_argument("--max-error", type=float, default=0.05, help="Largest relative error allowed at p99 and p99.9.")
+	args = parser.parse_args()
+	max_errors = check_accuracy(num_values=args.num_values, num_parts=args.num_parts, k=args.k, num_trials=args.trials)
+	print("Largest relative error of p99 and p99.9: {:.4f} streamed, {:.4f} merged".format(max_errors["streamed"], max_errors["merged"]))
+	assert(max(max_errors.values()) <= args.max_error), "The sketch is less accurate than {}".format(args.max_error)
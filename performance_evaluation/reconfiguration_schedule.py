@@ -0,0 +1,171 @@
+import os, sys
+import numpy as np
+from network_topology import *
+
+## Offline reconfiguration schedules for pod-reconfigurable networks. The pod traffic of every time window is decomposed
+## into a weighted sequence of OCS matchings (permutations between pods), with a Birkhoff-von Neumann decomposition that
+## takes a greedy heavy matching at every step. The matchings are then laid out over the epochs of the window, one
+## matching per reconfigurable uplink (i.e. per OCS) of every pod in each epoch, so that every epoch uses each uplink of
+## every pod exactly once. Epoch e runs from e * reconfiguration_period_ns to (e + 1) * reconfiguration_period_ns, and the
+## schedule repeats after its last epoch.
+
+# Version of the decomposition, part of the inputs of the cached schedule files.
+DECOMPOSITION_VERSION = 3
+
+# Returns a matching of the rows to the columns over the entries of in_support, as the column of every row (-1 for the
+# unmatched rows), taken greedily: every round, each row and column whose heaviest entry is the heaviest entry of the
+# other are matched, until no entry of the support is left between unmatched rows and columns.
+def _match_greedily(remaining, in_support):
+	num_pods = remaining.shape[0]
+	pods = np.arange(num_pods)
+	permutation = np.full(num_pods, -1, dtype=np.int64)
+	candidates = np.where(in_support, remaining, -1.)
+	while True:
+		best_columns = candidates.argmax(axis=1)
+		rows = np.nonzero(candidates[pods, best_columns] > 0)[0]
+		if len(rows) == 0:
+			break
+		best_rows = candidates.argmax(axis=0)
+		rows = rows[best_rows[best_columns[rows]] == rows]
+		permutation[rows] = best_columns[rows]
+		candidates[rows, :] = -1.
+		candidates[:, best_columns[rows]] = -1.
+	return permutation
+
+# Completes a matching over the entries of in_support (see _match_greedily) into a perfect matching, with an augmenting
+# path from every unmatched row, found by a breadth first search over the support. Returns None if the support has no
+# perfect matching.
+def _complete_matching(in_support, permutation):
+	num_pods = len(permutation)
+	column_rows = np.full(num_pods, -1, dtype=np.int64)
+	matched_rows = np.nonzero(permutation >= 0)[0]
+	column_rows[permutation[matched_rows]] = matched_rows
+	for row in np.nonzero(permutation < 0)[0]:
+		# parent_rows[column] is the row the search reached the column from.
+		parent_rows = np.full(num_pods, -1, dtype=np.int64)
+		is_visited = np.zeros(num_pods, dtype=bool)
+		frontier = np.array([row])
+		free_column = -1
+		while len(frontier) > 0:
+			reachable = in_support[frontier] & ~is_visited
+			columns = np.nonzero(reachable.any(axis=0))[0]
+			if len(columns) == 0:
+				break
+			parent_rows[columns] = frontier[reachable[:, columns].argmax(axis=0)]
+			is_visited[columns] = True
+			free_columns = columns[column_rows[columns] < 0]
+			if len(free_columns) > 0:
+				free_column = free_columns[0]
+				break
+			frontier = column_rows[columns]
+		if free_column < 0:
+			return None
+		# Flips the path: every row on it takes the column it reached, and hands its previous column up the path.
+		column = free_column
+		while column >= 0:
+			parent_row = parent_rows[column]
+			column, permutation[parent_row] = permutation[parent_row], column
+			column_rows[permutation[parent_row]] = parent_row
+	return permutation
+
+# Decomposes the pod traffic matrix into weighted matchings. The traffic is first scaled to a doubly stochastic matrix with
+# a zero diagonal (see interpod_topology_optimizer.scale_to_uplink_budgets, whose uniform mixing keeps every pod pair in
+# the support), then every step takes a perfect matching over the entries of what remains that are above tolerance,
+# with the weight of its lightest entry, and subtracts it. The matching is taken greedily from the heaviest entries and
+# completed with augmenting paths, which is much cheaper than a maximum weight matching per step for a few more
+# matchings. Stops after max_matchings matchings, or once the remaining weight is at most tolerance times the number of
+# pods. Returns (weights, permutations), where permutations[k][src_pod] is the destination pod of src_pod in the k-th
+# matching, and the weights sum to 1 (up to the tolerance) unless max_matchings cuts the decomposition short.
+def decompose_into_matchings(traffic_matrix, max_matchings=None, tolerance=1e-9, uniform_mixing=0.05):
+	traffic_matrix = np.asarray(traffic_matrix, dtype=np.float64)
+	num_pods = traffic_matrix.shape[0]
+	assert(num_pods >= 2 and traffic_matrix.shape == (num_pods, num_pods))
+	if max_matchings is None:
+		# A BvN decomposition needs at most (num_pods - 1)^2 + 1 matchings.
+		max_matchings = (num_pods - 1) ** 2 + 1
+	remaining = interpod_topology_optimizer.scale_to_uplink_budgets(traffic_matrix, np.ones(num_pods), min_links_per_pod_pair=0, uniform_mixing=uniform_mixing)
+	pods = np.arange(num_pods)
+	is_diagonal = np.eye(num_pods, dtype=bool)
+	weights = []
+	permutations = []
+	while len(weights) < max_matchings and remaining.sum() > tolerance * num_pods:
+		# Only the entries left in the support can be matched.
+		in_support = (remaining > tolerance) & ~is_diagonal
+		permutation = _match_greedily(remaining, in_support)
+		if np.any(permutation < 0):
+			permutation = _complete_matching(in_support, permutation)
+			if permutation is None:
+				break
+		weight = remaining[pods, permutation].min()
+		remaining[pods, permutation] -= weight
+		weights.append(weight)
+		permutations.append(permutation)
+	weights = np.array(weights)
+	assert(len(weights) == max_matchings or abs(weights.sum() - 1.) <= 1e-6), "The decomposition only covers {} of the traffic".format(weights.sum())
+	return weights, np.array(permutations, dtype=np.int64).reshape(len(permutations), num_pods)
+
+# Splits num_slots slots between the matchings in proportion to their weights, with the largest remainder method.
+def apportion_slots(weights, num_slots):
+	weights = np.asarray(weights, dtype=np.float64)
+	quotas = weights / weights.sum() * num_slots
+	num_matching_slots = np.floor(quotas).astype(np.int64)
+	leftover_slots = num_slots - num_matching_slots.sum()
+	# Ties go to the earlier (heavier) matchings.
+	num_matching_slots[np.argsort(-(quotas - num_matching_slots), kind="stable")[:leftover_slots]] += 1
+	return num_matching_slots
+
+# Lays the weighted matchings out over num_epochs epochs, with num_uplinks_per_pod matchings per epoch, and returns the
+# (num_epochs, num_pods, num_pods) interpod link matrices of the epochs. Every matching gets a share of the
+# num_epochs * num_uplinks_per_pod slots proportional to its weight. The slots are listed matching after matching, and
+# uplink u takes the u-th stretch of num_epochs slots, one per epoch, so each OCS steps through the matchings over time.
+def build_epoch_link_matrices(weights, permutations, num_epochs, num_uplinks_per_pod):
+	num_pods = permutations.shape[1]
+	slot_matchings = np.repeat(np.arange(len(weights)), apportion_slots(weights, num_epochs * num_uplinks_per_pod))
+	# slot_matchings[u * num_epochs + e] is the matching of uplink u in epoch e.
+	epoch_matchings = slot_matchings.reshape(num_uplinks_per_pod, num_epochs).T
+	epoch_ids = np.repeat(np.arange(num_epochs), num_uplinks_per_pod * num_pods)
+	src_pods = np.tile(np.arange(num_pods), num_epochs * num_uplinks_per_pod)
+	dst_pods = permutations[epoch_matchings.ravel().repeat(num_pods), src_pods]
+	link_counts = np.bincount((epoch_ids * num_pods + src_pods) * num_pods + dst_pods, minlength=num_epochs * num_pods * num_pods)
+	return link_counts.reshape(num_epochs, num_pods, num_pods)
+
+## Schedules of time-windowed traffic.
+# Computes the schedule of a sequence of pod traffic matrices, one per time window of num_epochs_per_window epochs (a
+# single matrix is a single window), and returns the interpod link matrices of all the epochs in order.
+def compute_schedule(traffic_matrices, num_uplinks_per_pod, num_epochs_per_window=64, **kwargs):
+	traffic_matrices = np.asarray(traffic_matrices, dtype=np.float64)
+	if traffic_matrices.ndim == 2:
+		traffic_matrices = traffic_matrices[np.newaxis]
+	epoch_link_matrices = []
+	for traffic_matrix in traffic_matrices:
+		weights, permutations = decompose_into_matchings(traffic_matrix, **kwargs)
+		epoch_link_matrices.append(build_epoch_link_matrices(weights, permutations, num_epochs_per_window, num_uplinks_per_pod))
+	return np.concatenate(epoch_link_matrices)
+
+# Generates the schedule file in blocks: a "reconfiguration_period_ns,period" and a "num_epochs,count" line, then one
+# block per epoch with an "epoch,src_pod,dst_pod,num_links" line for every connected pod pair of the epoch.
+def generate_schedule_file_blocks(epoch_link_matrices, reconfiguration_period_ns):
+	yield "reconfiguration_period_ns,{}\nnum_epochs,{}\n".format(reconfiguration_period_ns, len(epoch_link_matrices))
+	for epoch, link_matrix in enumerate(epoch_link_matrices):
+		src_pods, dst_pods = np.nonzero(link_matrix)
+		yield "".join(map("{},{},{},{}\n".format, [epoch] * len(src_pods), src_pods.tolist(), dst_pods.tolist(), link_matrix[src_pods, dst_pods].tolist()))
+
+# Writes the schedule file to path_or_fileobj, which is either a filename or an open file object.
+def write_schedule_file(path_or_fileobj, epoch_link_matrices, reconfiguration_period_ns):
+	if hasattr(path_or_fileobj, "write"):
+		for block in generate_schedule_file_blocks(epoch_link_matrices, reconfiguration_period_ns):
+			path_or_fileobj.write(block)
+	else:
+		with open(path_or_fileobj, "w+") as f:
+			write_schedule_file(f, epoch_link_matrices, reconfiguration_period_ns)
+	return
+
+# Reads a schedule file, returning (reconfiguration_period_ns, epoch_link_matrices) for num_pods pods.
+def read_schedule_file(filename, num_pods):
+	with open(filename, "r") as f:
+		reconfiguration_period_ns = int(f.readline().split(",")[1])
+		num_epochs = int(f.readline().split(",")[1])
+		entries = np.loadtxt(f, delimiter=",", dtype=np.int64, ndmin=2).reshape(-1, 4)
+	epoch_link_matrices = np.zeros((num_epochs, num_pods, num_pods), dtype=np.int64)
+	epoch_link_matrices[entries[:, 0], entries[:, 1], entries[:, 2]] = entries[:, 3]
+	return reconfiguration_period_ns, epoch_link_matrices
@@ -0,0 +1,236 @@
+import os, sys
+import argparse
+import glob
+import hashlib
+import itertools
+import multiprocessing
+import re
+import numpy as np
+import utilities
+
+## Columnar store of the Netbench results of the sweep.
+## generate_netbench_configs.py lays the runs out as <base_dir>/<app>/<topology>/<run>.properties, and Netbench writes the
+## logs of each run to the <base_dir>/<app>/<topology>/<run>/ folder. Ingestion walks this tree, parses the flow completion
+## and port utilization logs of every run on a pool of worker processes, and stores their columns in one .npz file per run.
+## The index of the store maps every run to the sweep parameters read from its .properties file and to the size and
+## modification time of the files it was parsed from, so re-ingesting only parses the runs that are new or have changed.
+
+# Columns of flow_completion.csv.log; completed is TRUE or FALSE in the log.
+FLOW_RECORD_DTYPE = np.dtype([("flow_id", np.int64), ("source_id", np.int64), ("target_id", np.int64),
+							("sent_bytes", np.int64), ("total_size_bytes", np.int64),
+							("start_time", np.int64), ("end_time", np.int64), ("duration", np.int64),
+							("completed", np.int8)])
+# Columns of port_utilization.csv.log; attached_to_server is Y or N in the log.
+PORT_RECORD_DTYPE = np.dtype([("own_id", np.int64), ("target_id", np.int64), ("attached_to_server", np.int8),
+							("utilization_ns", np.float64), ("utilization_percent", np.float64)])
+
+FLOW_COMPLETION_LOG_FILENAME = "flow_completion.csv.log"
+PORT_UTILIZATION_LOG_FILENAME = "port_utilization.csv.log"
+INDEX_FILENAME = "index.json"
+RUNS_SUBDIRECTORY = "runs"
+
+## Parsing of the run tree.
+# Reads the key=value lines of a .properties file.
+def read_properties_file(properties_filename):
+	properties = {}
+	with open(properties_filename, "r") as f:
+		for line in f:
+			line = line.strip()
+			if not line or line.startswith("#") or "=" not in line:
+				continue
+			key, value = line.split("=", 1)
+			properties[key.strip()] = value.strip()
+	return properties
+
+# Returns the sweep parameters of the run described by a .properties file of the sweep. The run is keyed by
+# "<app>/<topology>/<run>", and its load level (in percent) is read from the filename.
+def get_run_parameters(properties_filename):
+	properties = read_properties_file(properties_filename)
+	topology_directory = os.path.dirname(os.path.abspath(properties_filename))
+	run_name = os.path.splitext(os.path.basename(properties_filename))[0]
+	load_match = re.match(r"load(\d+)perc", run_name)
+	reconfiguration_period_ns = properties.get("reconfiguration_period_ns")
+	parameters = {"app": os.path.basename(os.path.dirname(topology_directory)),
+				"topology": os.path.basename(topology_directory),
+				"run": run_name,
+				"load": int(load_match.group(1)) if load_match else None,
+				"reconfiguration_type": properties.get("reconfiguration_type", "static"),
+				"reconfiguration_period_ns": int(reconfiguration_period_ns) if reconfiguration_period_ns is not None else None,
+				"flow_arrivals_per_s": float(properties["traffic_lambda_flow_starts_per_s"]) if "traffic_lambda_flow_starts_per_s" in properties else None}
+	parameters["key"] = "{}/{}/{}".format(parameters["app"], parameters["topology"], run_name)
+	# The logs are next to the .properties file, which still holds if the tree was moved since it was generated.
+	parameters["run_directory"] = os.path.join(topology_directory, properties.get("run_folder_name", run_name))
+	return parameters
+
+# Finds the runs of the sweep under base_directory that have a flow completion log, and returns their parameters.
+def find_runs(base_directory):
+	runs = []
+	for properties_filename in sorted(glob.glob(os.path.join(base_directory, "*", "*", "*.properties"))):
+		parameters = get_run_parameters(properties_filename)
+		if os.path.isfile(os.path.join(parameters["run_directory"], FLOW_COMPLETION_LOG_FILENAME)):
+			parameters["properties_filename"] = os.path.abspath(properties_filename)
+			runs.append(parameters)
+	return runs
+
+# Returns the [size, modification time] of every input file of a run, missing files being left out.
+def get_run_signature(run):
+	signature = {}
+	for filename in (run["properties_filename"],
+					os.path.join(run["run_directory"], FLOW_COMPLETION_LOG_FILENAME),
+					os.path.join(run["run_directory"], PORT_UTILIZATION_LOG_FILENAME)):
+		if os.path.isfile(filename):
+			file_status = os.stat(filename)
+			signature[os.path.basename(filename)] = [file_status.st_size, file_status.st_mtime]
+	return signature
+
+# Reads the comma separated records of a log into a record array of the given dtype, chunk_num_lines lines at a time.
+# Every (old, new) pair of replacements is substituted in the text before it is parsed.
+def read_log_records(log_filename, dtype, replacements=(), chunk_num_lines=1 << 20):
+	chunks = []
+	with open(log_filename, "r") as f:
+		while True:
+			lines = list(itertools.islice(f, chunk_num_lines))
+			if not lines:
+				break
+			text = "".join(lines)
+			for old, new in replacements:
+				text = text.replace(old, new)
+			chunks.append(np.loadtxt(text.splitlines(), delimiter=",", dtype=dtype, ndmin=1))
+	if not chunks:
+		return np.zeros(0, dtype=dtype)
+	return np.concatenate(chunks)
+
+def read_flow_completion_log(log_filename, chunk_num_lines=1 << 20):
+	return read_log_records(log_filename, FLOW_RECORD_DTYPE, replacements=(("TRUE", "1"), ("FALSE", "0")), chunk_num_lines=chunk_num_lines)
+
+def read_port_utilization_log(log_filename, chunk_num_lines=1 << 20):
+	return read_log_records(log_filename, PORT_RECORD_DTYPE, replacements=((",Y,", ",1,"), (",N,", ",0,")), chunk_num_lines=chunk_num_lines)
+
+## Ingestion.
+# Returns the filename of the columns of a run in the store.
+def get_run_filename(store_directory, run_key):
+	return os.path.join(store_directory, RUNS_SUBDIRECTORY, hashlib.sha1(run_key.encode("utf-8")).hexdigest() + ".npz")
+
+# Parses the logs of a single run and writes their columns, as "flows_<column>" and "ports_<column>" arrays, to the .npz
+# file of the run. Runs in the worker processes; returns (run, signature, num_flows).
+def _ingest_run(task):
+	run, signature, run_filename = task
+	columns = {}
+	flows = read_flow_completion_log(os.path.join(run["run_directory"], FLOW_COMPLETION_LOG_FILENAME))
+	port_log_filename = os.path.join(run["run_directory"], PORT_UTILIZATION_LOG_FILENAME)
+	ports = read_port_utilization_log(port_log_filename) if os.path.isfile(port_log_filename) else np.zeros(0, dtype=PORT_RECORD_DTYPE)
+	for prefix, records in (("flows", flows), ("ports", ports)):
+		for name in records.dtype.names:
+			column = records[name]
+			if name in ("completed", "attached_to_server"):
+				column = column.astype(bool)
+			columns["{}_{}".format(prefix, name)] = column
+	# Written to a temporary file first, so that an interrupted ingestion never leaves a partial run behind.
+	temporary_filename = "{}.tmp{}".format(run_filename, os.getpid())
+	with open(temporary_filename, "wb") as f:
+		np.savez(f, **columns)
+	os.rename(temporary_filename, run_filename)
+	return run, signature, len(flows)
+
+# Ingests the runs under base_directory into the store in store_directory, on num_processes worker processes (one per
+# core by default). Only the runs whose inputs changed since they were last ingested are parsed, unless force is set, and
+# the runs that no longer exist are dropped from the store. Returns the list of the keys of the runs that were parsed.
+def ingest_results(base_directory, store_directory, num_processes=None, force=False):
+	if not os.path.isdir(os.path.join(store_directory, RUNS_SUBDIRECTORY)):
+		os.makedirs(os.path.join(store_directory, RUNS_SUBDIRECTORY))
+	index_filename = os.path.join(store_directory, INDEX_FILENAME)
+	index = utilities.read_manifest(index_filename)
+	runs = find_runs(base_directory)
+	# Drop the runs that disappeared from the tree.
+	run_keys = set(run["key"] for run in runs)
+	for run_key in [run_key for run_key in index if run_key not in run_keys]:
+		del index[run_key]
+		if os.path.isfile(get_run_filename(store_directory, run_key)):
+			os.remove(get_run_filename(store_directory, run_key))
+	tasks = []
+	for run in runs:
+		signature = get_run_signature(run)
+		run_filename = get_run_filename(store_directory, run["key"])
+		entry = index.get(run["key"])
+		if force or entry is None or entry["signature"] != signature or not os.path.isfile(run_filename):
+			tasks.append((run, signature, run_filename))
+	ingested_run_keys = []
+	# The index is rewritten after every run, so that an interrupted ingestion resumes where it stopped.
+	def record_run(result):
+		run, signature, num_flows = result
+		index[run["key"]] = {"parameters": run, "signature": signature, "num_flows": num_flows}
+		utilities.write_manifest(index_filename, index)
+		ingested_run_keys.append(run["key"])
+	if num_processes is None:
+		num_processes = multiprocessing.cpu_count()
+	if num_processes <= 1 or len(tasks) <= 1:
+		for task in tasks:
+			record_run(_ingest_run(task))
+	else:
+		pool = multiprocessing.Pool(processes=min(num_processes, len(tasks)))
+		try:
+			for result in pool.imap_unordered(_ingest_run, tasks):
+				record_run(result)
+		finally:
+			pool.close()
+			pool.join()
+	utilities.write_manifest(index_filename, index)
+	return ingested_run_keys
+
+## Reads the store written by ingest_results.
+class ResultsStore(object):
+	def __init__(self, store_directory):
+		self.store_directory = store_directory
+		self.index = utilities.read_manifest(os.path.join(store_directory, INDEX_FILENAME))
+		return
+
+	# Returns the parameters of the runs that match the filters, sorted by key. Every filter is a parameter name (e.g.
+	# app, topology, load, reconfiguration_type, reconfiguration_period_ns) with either a value or a list of values.
+	def list_runs(self, **filters):
+		runs = []
+		for run_key in sorted(self.index):
+			parameters = self.index[run_key]["parameters"]
+			matches = True
+			for name, value in filters.items():
+				values = value if isinstance(value, (list, tuple, set)) else (value,)
+				if parameters.get(name) not in values:
+					matches = False
+					break
+			if matches:
+				runs.append(parameters)
+		return runs
+
+	def get_num_flows(self, run_key):
+		return self.index[run_key]["num_flows"]
+
+	# Loads the given columns (all of them by default) of a table ("flows" or "ports") of a run, as a dictionary.
+	def load_columns(self, run_key, table, columns=None):
+		assert(table in ("flows", "ports"))
+		if columns is None:
+			columns = (FLOW_RECORD_DTYPE if table == "flows" else PORT_RECORD_DTYPE).names
+		with np.load(get_run_filename(self.store_directory, run_key)) as run_file:
+			return dict((name, run_file["{}_{}".format(table, name)]) for name in columns)
+
+	def load_flows(self, run_key, columns=None):
+		return self.load_columns(run_key, "flows", columns)
+
+	def load_ports(self, run_key, columns=None):
+		return self.load_columns(run_key, "ports", columns)
+
+	# Yields (parameters, flow columns) for every run that matches the filters, one run at a time.
+	def iter_flows(self, columns=None, **filters):
+		for parameters in self.list_runs(**filters):
+			yield parameters, self.load_flows(parameters["key"], columns)
+
+if __name__ == "__main__":
+	default_base_directory = os.path.join(os.getenv("NETBENCH_HOME", "."), "temp", "multi_eval")
+	parser = argparse.ArgumentParser(description="Ingests the Netbench results of the sweep into a columnar store.")
+	parser.add_argument("--base-directory", default=default_base_directory, help="Root of the sweep, laid out as <app>/<topology>/<run>.")
+	parser.add_argument("--store-directory", default=None, help="Defaults to <base-directory>/results_store.")
+	parser.add_argument("--workers", type=int, default=None, help="Number of parsing processes (default: number of cores).")
+	parser.add_argument("--force", action="store_true", help="Re-parse every run, even if unchanged.")
+	args = parser.parse_args()
+	store_directory = args.store_directory if args.store_directory is not None else os.path.join(args.base_directory, "results_store")
+	ingested_run_keys = ingest_results(args.base_directory, store_directory, num_processes=args.workers, force=args.force)
+	store = ResultsStore(store_directory)
+	print("Parsed {} runs, {} runs in the store".format(len(ingested_run_keys), len(store.index)))
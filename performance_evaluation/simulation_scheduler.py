@@ -0,0 +1,165 @@
+import os, sys
+import argparse
+import json
+import multiprocessing
+import subprocess
+import time
+import utilities
+
+# Command used to run a single simulation, {heap_mb} and {config_filename} are filled in per job.
+NETBENCH_COMMAND_TEMPLATE = ["java", "-Xmx{heap_mb}m", "-jar", "-ea", "NetBench.jar", "{config_filename}"]
+
+# Smaller applications run first, so that their results come in early.
+APP_PRIORITIES = {"MiniDFT": 0, "AMR": 1, "AMG": 2}
+
+# Default priority of a job, lower values run first. The app is read from the config path, which is laid out as
+# <base_dir>/<app>/<topology>/<config>.properties by generate_netbench_configs.py.
+def app_based_priority(config_filename):
+	app = os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(config_filename))))
+	return APP_PRIORITIES.get(app, len(APP_PRIORITIES))
+
+## Runs Netbench simulations concurrently on the local machine.
+## At most max_concurrent_jobs simulations run at once, and the sum of their JVM heaps never exceeds memory_limit_mb
+## (a job larger than the limit still runs, but on its own). heap_mb is either a fixed heap size in MB or a function
+## of the config filename. Pending jobs are started in order of priority(config_filename), failed runs are retried up
+## to max_retries times, and the exit status and wall time of every attempt is appended to log_filename.
+## The status of every job is kept in state_filename, so an interrupted run resumes with the jobs that did not complete.
+class SimulationScheduler(object):
+	def __init__(self, config_filenames, state_filename, log_filename,
+				max_concurrent_jobs=None,
+				memory_limit_mb=None,
+				heap_mb=4096,
+				priority=app_based_priority,
+				max_retries=2,
+				command_template=NETBENCH_COMMAND_TEMPLATE,
+				working_directory=None,
+				poll_interval_s=1.):
+		self.config_filenames = list(config_filenames)
+		self.state_filename = state_filename
+		self.log_filename = log_filename
+		self.max_concurrent_jobs = max_concurrent_jobs if max_concurrent_jobs is not None else multiprocessing.cpu_count()
+		self.memory_limit_mb = memory_limit_mb
+		self.heap_mb = heap_mb
+		self.priority = priority
+		self.max_retries = max_retries
+		self.command_template = list(command_template)
+		self.working_directory = working_directory if working_directory is not None else os.getenv("NETBENCH_HOME")
+		self.poll_interval_s = poll_interval_s
+		self.state = {}
+		return
+
+	# Retrieves the JVM heap size in MB of a job.
+	def get_heap_mb(self, config_filename):
+		if callable(self.heap_mb):
+			return int(self.heap_mb(config_filename))
+		return int(self.heap_mb)
+
+	# Runs all the jobs that have not completed yet, and returns the state of every job.
+	def run(self):
+		self.state = utilities.read_manifest(self.state_filename)
+		pending = [config_filename for config_filename in self.config_filenames if self.__is_runnable(config_filename)]
+		pending.sort(key=self.priority)
+		running = {}
+		try:
+			while pending or running:
+				# Start as many pending jobs as the CPU and memory limits allow.
+				while pending and len(running) < self.max_concurrent_jobs and self.__fits_in_memory(pending[0], running):
+					config_filename = pending.pop(0)
+					job = self.__start_job(config_filename)
+					if job is not None:
+						running[config_filename] = job
+					elif self.__is_runnable(config_filename):
+						pending.append(config_filename)
+						pending.sort(key=self.priority)
+				# Collect the jobs that have finished.
+				for config_filename in list(running):
+					process, output_file, start_time = running[config_filename]
+					exit_status = process.poll()
+					if exit_status is None:
+						continue
+					output_file.close()
+					del running[config_filename]
+					self.__record_attempt(config_filename, exit_status, time.time() - start_time)
+					if self.__is_runnable(config_filename):
+						# Failed runs are retried ahead of the jobs with a lower priority.
+						pending.append(config_filename)
+						pending.sort(key=self.priority)
+				if running:
+					time.sleep(self.poll_interval_s)
+		finally:
+			# On interruption, the jobs still running are stopped, and rerun when the scheduler is resumed.
+			for config_filename in running:
+				process, output_file, _ = running[config_filename]
+				if process.poll() is None:
+					process.terminate()
+					process.wait()
+				output_file.close()
+		return self.state
+
+	'''
+	###########################################################################################################################
+	###########################################################################################################################
+	Internal Methods used by the class.
+	###########################################################################################################################
+	###########################################################################################################################
+	'''
+	# A job is runnable if it has not completed, and has attempts left.
+	def __is_runnable(self, config_filename):
+		job_state = self.state.get(config_filename)
+		if job_state is None:
+			return True
+		return job_state["status"] != "completed" and job_state["attempts"] <= self.max_retries
+
+	def __fits_in_memory(self, config_filename, running):
+		if self.memory_limit_mb is None or not running:
+			return True
+		used_memory_mb = sum(self.get_heap_mb(running_config_filename) for running_config_filename in running)
+		return used_memory_mb + self.get_heap_mb(config_filename) <= self.memory_limit_mb
+
+	# Starts a job, redirecting its output to a .out file next to its config. If the command cannot be started at all (e.g.
+	# java is not on the PATH), the error goes to the .out file, the attempt is recorded as failed with no exit status, and
+	# None is returned, so that the other jobs still run.
+	def __start_job(self, config_filename):
+		command = [argument.format(heap_mb=self.get_heap_mb(config_filename), config_filename=config_filename) for argument in self.command_template]
+		output_file = open(config_filename + ".out", "w+")
+		try:
+			process = subprocess.Popen(command, cwd=self.working_directory, stdout=output_file, stderr=subprocess.STDOUT)
+		except OSError as error:
+			output_file.write("Could not start {}: {}\n".format(" ".join(command), error))
+			output_file.close()
+			self.__record_attempt(config_filename, None, 0.)
+			return None
+		return process, output_file, time.time()
+
+	# Records the outcome of an attempt in the state file and in the log.
+	def __record_attempt(self, config_filename, exit_status, wall_time_s):
+		job_state = self.state.get(config_filename, {"attempts": 0})
+		job_state["attempts"] += 1
+		job_state["status"] = "completed" if exit_status == 0 else "failed"
+		job_state["exit_status"] = exit_status
+		job_state["wall_time_s"] = wall_time_s
+		self.state[config_filename] = job_state
+		utilities.write_manifest(self.state_filename, self.state)
+		with open(self.log_filename, "a") as f:
+			f.write("{},{},{},{},{:.3f}\n".format(config_filename, job_state["attempts"], job_state["status"], exit_status, wall_time_s))
+		print("{} {} (attempt {}, exit status {}, {:.1f}s)".format(job_state["status"], config_filename, job_state["attempts"], exit_status, wall_time_s))
+		return
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Runs Netbench simulations concurrently.")
+	parser.add_argument("config_filenames", nargs="+", help="The .properties files to simulate.")
+	parser.add_argument("--state", default="simulation_state.json", help="State file used to resume interrupted runs.")
+	parser.add_argument("--log", default="simulation_log.csv", help="Log of the exit status and wall time of every attempt.")
+	parser.add_argument("--max-concurrent-simulations", type=int, default=multiprocessing.cpu_count())
+	parser.add_argument("--memory-limit-mb", type=int, default=None, help="Upper bound on the sum of the JVM heaps.")
+	parser.add_argument("--heap-mb", type=int, default=4096, help="JVM heap of each simulation.")
+	parser.add_argument("--max-retries", type=int, default=2)
+	args = parser.parse_args()
+	scheduler = SimulationScheduler([os.path.abspath(config_filename) for config_filename in args.config_filenames],
+									os.path.abspath(args.state),
+									os.path.abspath(args.log),
+									max_concurrent_jobs=args.max_concurrent_simulations,
+									memory_limit_mb=args.memory_limit_mb,
+									heap_mb=args.heap_mb,
+									max_retries=args.max_retries)
+	scheduler.run()
@@ -0,0 +1,237 @@
+import os, sys
+import argparse
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.optimize
+
+## Flow-level throughput estimation, used to pre-screen the (app, topology, load) points of a sweep before simulating them.
+## The wired topology is taken as a capacitated directed graph, where every link carries one unit of capacity (the network
+## link bandwidth), and the remapped traffic probabilities as a set of commodities between virtual servers. At 100% load
+## every physical server injects one link's worth of traffic, so the demand of each commodity is its probability times
+## the number of physical servers. The maximum concurrent flow lambda is the largest factor by which all the demands can
+## be scaled and still be routed together within the link capacities; the network saturates at a load of 100 * lambda %.
+## Routing is unconstrained (any split over any paths), so lambda is an upper bound on what the simulated routing achieves
+## on the given wiring. For reconfigurable topologies, the wiring is the initial one.
+
+# Returns the link capacities of the topology as a scipy CSR matrix of link multiplicities, with sorted indices.
+def build_capacity_matrix(topology):
+	capacity = scipy.sparse.csr_matrix(topology.get_adjacency_matrix(), dtype=np.float64)
+	capacity.sort_indices()
+	return capacity
+
+# Returns the commodities of the traffic probabilities remapped onto the topology, as parallel (src, dst, demand) arrays
+# with one entry per virtual server pair, where demand is in units of the link bandwidth at 100% load.
+def build_demands(topology, traffic_probability, num_physical_servers):
+	src, dst, prob = topology.remap_traffic_probability(traffic_probability, aggregate_duplicates=True)
+	return src, dst, prob * num_physical_servers
+
+# Checks that the commodities are between nodes of the capacity matrix. The sparse topologies do not validate the
+# endpoints of the remapped traffic, which can refer to more virtual servers than the wiring has.
+def check_commodity_endpoints(capacity, src, dst):
+	num_nodes = capacity.shape[0]
+	for name, endpoints in (("source", src), ("destination", dst)):
+		if len(endpoints) and (endpoints.min() < 0 or endpoints.max() >= num_nodes):
+			raise ValueError("The commodity {} ids span {} to {}, outside of the {} nodes of the topology".format(name, endpoints.min(), endpoints.max(), num_nodes))
+	return
+
+## Approximate maximum concurrent flow, with the multiplicative weights method of Garg and Konemann, as refined by Fleischer:
+## every link has a length, initially the inverse of its capacity. Each phase routes every demand in full, in steps: a step
+## routes the remaining demands along the shortest paths from their sources under the current lengths, each commodity
+## scaled down by the smallest capacity / flow ratio along its path so that no link carries more than its capacity in the
+## step, then multiplies the length of every link by 1 + epsilon * flow / capacity. Commodities whose paths avoid the
+## saturated links are routed in full. All sources are routed together, with multi-source Dijkstra, and the paths are
+## kept across steps until the lengths have drifted by more than a factor of max_path_drift relative to each other since
+## they were found, so that they stay within that factor of the shortest paths. The flow routed so far, divided by its
+## largest link congestion, is a feasible concurrent flow, and gives the lower bound on lambda; the lengths whenever the
+## shortest paths are found give the upper bound sum(length * capacity) / sum(demand * distance) by duality. The phases
+## stop once the upper bound is within a factor of 1 + tolerance of the lower bound, or after max_phases phases. Sources
+## are routed in blocks of max_sources_per_block, which bounds the memory to that many shortest path trees. Returns a dict
+## with the lower_bound and upper_bound on lambda, and the num_phases run.
+def estimate_max_concurrent_flow(capacity, src, dst, demand, epsilon=0.1, tolerance=0.1, max_phases=1000, max_sources_per_block=256, max_path_drift=1.5):
+	assert(0 < epsilon < 1 and tolerance >= 0 and max_path_drift >= 1)
+	capacity = scipy.sparse.csr_matrix(capacity, dtype=np.float64)
+	capacity.sort_indices()
+	src, dst, demand = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64), np.asarray(demand, dtype=np.float64)
+	check_commodity_endpoints(capacity, src, dst)
+	has_demand = demand > 0
+	src, dst, demand = src[has_demand], dst[has_demand], demand[has_demand]
+	if len(demand) == 0:
+		return dict(lower_bound=np.inf, upper_bound=np.inf, num_phases=0)
+	num_nodes = capacity.shape[0]
+	link_capacity = capacity.data
+	link_keys = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(capacity.indptr)) * num_nodes + capacity.indices
+	sources, commodity_source_index = np.unique(src, return_inverse=True)
+	commodity_source_index = commodity_source_index.ravel()
+	blocks = [(block_start, min(block_start + max_sources_per_block, len(sources))) for block_start in range(0, len(sources), max_sources_per_block)]
+	block_commodities = [np.nonzero((commodity_source_index >= block[0]) & (commodity_source_index < block[1]))[0] for block in blocks]
+	# Every commodity must be reachable at all, or nothing can be routed concurrently.
+	hop_distances = scipy.sparse.csgraph.shortest_path(capacity, directed=True, unweighted=True, indices=sources)
+	if np.any(np.isinf(hop_distances[commodity_source_index, dst])):
+		return dict(lower_bound=0., upper_bound=0., num_phases=0)
+	lengths = 1. / link_capacity
+	paths, distances = _find_shortest_paths(capacity, lengths, link_keys, sources, blocks, block_commodities, commodity_source_index, dst)
+	path_lengths = lengths.copy()
+	# The demands are scaled by the upper bound of the initial lengths, so that lambda is at most 1 for the scaled demands,
+	# which keeps the number of phases independent of the magnitude of the demands.
+	demand_scale = np.dot(lengths, link_capacity) / np.dot(demand, distances)
+	demand = demand * demand_scale
+	link_flow = np.zeros(len(link_capacity))
+	routed = np.zeros(len(demand))
+	lower_bound, upper_bound = 0., 1.
+	num_phases = 0
+	while num_phases < max_phases:
+		remaining = demand.copy()
+		# A phase ends when its demands are routed, up to rounding.
+		while remaining.sum() > 1e-9 * demand.sum():
+			length_growth = lengths / path_lengths
+			if length_growth.max() > max_path_drift * length_growth.min():
+				paths, distances = _find_shortest_paths(capacity, lengths, link_keys, sources, blocks, block_commodities, commodity_source_index, dst)
+				path_lengths = lengths.copy()
+				upper_bound = min(upper_bound, np.dot(lengths, link_capacity) / np.dot(demand, distances))
+			# The remaining demands are routed in full to find the load of every link, then every commodity is scaled down
+			# by the bottleneck of its path, and routed.
+			step_link_flow = paths.dot(remaining)
+			link_ratio = np.full(len(link_capacity), np.inf)
+			loaded = step_link_flow > 0
+			link_ratio[loaded] = link_capacity[loaded] / step_link_flow[loaded]
+			scale = np.minimum(1., _compute_path_minimum(paths, link_ratio))
+			step_link_flow = paths.dot(scale * remaining)
+			link_flow += step_link_flow
+			routed += scale * remaining
+			remaining *= (1. - scale)
+			lengths *= 1. + epsilon * step_link_flow / link_capacity
+			# Only the ratios of the lengths matter, so they are rescaled to stay within the floating point range.
+			path_lengths /= lengths.max()
+			lengths /= lengths.max()
+		num_phases += 1
+		lower_bound = np.min(routed / demand) / np.max(link_flow / link_capacity)
+		if upper_bound <= (1. + tolerance) * lower_bound:
+			break
+	return dict(lower_bound=lower_bound * demand_scale, upper_bound=upper_bound * demand_scale, num_phases=num_phases)
+
+# Finds the shortest path of every commodity under the given link lengths, with multi-source Dijkstra over the sources of
+# every block. Returns (paths, distances): paths is a sparse (num_links, num_commodities) CSC matrix, with a one for every
+# link on the path of every commodity, and distances the length of every path.
+def _find_shortest_paths(capacity, lengths, link_keys, sources, blocks, block_commodities, commodity_source_index, dst):
+	num_nodes = capacity.shape[0]
+	length_matrix = scipy.sparse.csr_matrix((lengths, capacity.indices, capacity.indptr), shape=capacity.shape)
+	distances = np.zeros(len(dst))
+	path_links = [np.zeros(0, dtype=np.int64)]
+	path_commodities = [np.zeros(0, dtype=np.int64)]
+	for block, in_block in zip(blocks, block_commodities):
+		block_distances, predecessors = scipy.sparse.csgraph.dijkstra(length_matrix, directed=True, indices=sources[block[0]:block[1]], return_predecessors=True)
+		block_rows = commodity_source_index[in_block] - block[0]
+		distances[in_block] = block_distances[block_rows, dst[in_block]]
+		# Walks up from the destinations to the sources, one hop of every path at a time.
+		commodities, rows, nodes = in_block, block_rows, dst[in_block]
+		while len(commodities) > 0:
+			parents = predecessors[rows, nodes].astype(np.int64)
+			has_parent = parents >= 0
+			commodities, rows, nodes, parents = commodities[has_parent], rows[has_parent], nodes[has_parent], parents[has_parent]
+			path_links.append(np.searchsorted(link_keys, parents * num_nodes + nodes))
+			path_commodities.append(commodities)
+			nodes = parents
+	path_links = np.concatenate(path_links)
+	paths = scipy.sparse.csc_matrix((np.ones(len(path_links)), (path_links, np.concatenate(path_commodities))), shape=(len(link_keys), len(dst)))
+	return paths, distances
+
+# Returns the smallest value of link_values along the path of every commodity, with inf for the empty paths.
+def _compute_path_minimum(paths, link_values):
+	path_minimum = np.full(paths.shape[1], np.inf)
+	has_links = np.diff(paths.indptr) > 0
+	if np.any(has_links):
+		path_minimum[has_links] = np.minimum.reduceat(link_values[paths.indices], paths.indptr[:-1][has_links])
+	return path_minimum
+
+# The HiGHS solvers are only in SciPy 1.6 and later, older versions use the sparse interior point solver instead, which is
+# much slower, so "auto" only picks the exact program for smaller instances with it.
+if tuple(int(part) for part in scipy.__version__.split(".")[:2]) >= (1, 6):
+	LP_METHOD, LP_OPTIONS, MAX_AUTO_LP_VARIABLES = "highs", {}, 200000
+else:
+	LP_METHOD, LP_OPTIONS, MAX_AUTO_LP_VARIABLES = "interior-point", {"sparse": True}, 20000
+
+## Exact maximum concurrent flow, as a linear program over the flow of each source on each link (the commodities of a
+## source share its flow), solved with the HiGHS solver of scipy (see LP_METHOD). The program has num_sources * num_links + 1 variables,
+## so it is only meant for small instances. Returns lambda.
+def solve_max_concurrent_flow_lp(capacity, src, dst, demand):
+	capacity = scipy.sparse.csr_matrix(capacity, dtype=np.float64)
+	capacity.sort_indices()
+	src, dst, demand = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64), np.asarray(demand, dtype=np.float64)
+	check_commodity_endpoints(capacity, src, dst)
+	num_nodes = capacity.shape[0]
+	num_links = capacity.nnz
+	link_src = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(capacity.indptr))
+	link_dst = capacity.indices.astype(np.int64)
+	sources, commodity_source_index = np.unique(src, return_inverse=True)
+	commodity_source_index = commodity_source_index.ravel()
+	num_sources = len(sources)
+	lambda_column = num_sources * num_links
+	# Conservation of the flow of each source i at each node v: inflow - outflow - lambda * net demand(i, v) = 0, where the
+	# net demand is the demand from the source ending at v, minus the total demand of the source at v = source.
+	source_ids = np.repeat(np.arange(num_sources, dtype=np.int64), num_links)
+	link_ids = np.tile(np.arange(num_links, dtype=np.int64), num_sources)
+	net_demand = np.bincount(commodity_source_index * num_nodes + dst, weights=demand, minlength=num_sources * num_nodes)
+	net_demand -= np.bincount(np.arange(num_sources) * num_nodes + sources, weights=np.bincount(commodity_source_index, weights=demand, minlength=num_sources), minlength=num_sources * num_nodes)
+	rows = np.concatenate((source_ids * num_nodes + link_dst[link_ids], source_ids * num_nodes + link_src[link_ids], np.arange(num_sources * num_nodes)))
+	columns = np.concatenate((np.arange(lambda_column), np.arange(lambda_column), np.full(num_sources * num_nodes, lambda_column)))
+	values = np.concatenate((np.ones(lambda_column), -np.ones(lambda_column), -net_demand))
+	equality_matrix = scipy.sparse.csr_matrix((values, (rows, columns)), shape=(num_sources * num_nodes, lambda_column + 1))
+	# The links are shared by the flows of all sources.
+	capacity_matrix = scipy.sparse.csr_matrix((np.ones(lambda_column), (link_ids, np.arange(lambda_column))), shape=(num_links, lambda_column + 1))
+	objective = np.zeros(lambda_column + 1)
+	objective[lambda_column] = -1.
+	result = scipy.optimize.linprog(objective, A_ub=capacity_matrix, b_ub=capacity.data, A_eq=equality_matrix, b_eq=np.zeros(num_sources * num_nodes), bounds=(0, None), method=LP_METHOD, options=LP_OPTIONS)
+	assert(result.status == 0), "The max concurrent flow LP failed: {}".format(result.message)
+	return float(result.x[lambda_column])
+
+## Saturation load of a wired topology under the traffic of an app. The method is "lp" for the exact program, "approximate"
+## for the multiplicative weights bounds, or "auto" to use the program when it has at most max_lp_variables variables
+## (MAX_AUTO_LP_VARIABLES by default).
+## Returns a dict with the lower and upper bounds on the saturation load in percent of the full load
+## (saturation_load_percent_lower and saturation_load_percent_upper, equal for the exact program), and the method used.
+def estimate_saturation_load(topology, traffic_probability, num_physical_servers, method="auto", max_lp_variables=None, **kwargs):
+	assert(method in ("auto", "lp", "approximate"))
+	if max_lp_variables is None:
+		max_lp_variables = MAX_AUTO_LP_VARIABLES
+	capacity = build_capacity_matrix(topology)
+	src, dst, demand = build_demands(topology, traffic_probability, num_physical_servers)
+	if method == "auto":
+		method = "lp" if len(np.unique(src)) * capacity.nnz + 1 <= max_lp_variables else "approximate"
+	if method == "lp":
+		max_concurrent_flow = solve_max_concurrent_flow_lp(capacity, src, dst, demand)
+		return dict(saturation_load_percent_lower=100. * max_concurrent_flow, saturation_load_percent_upper=100. * max_concurrent_flow, method=method)
+	estimate = estimate_max_concurrent_flow(capacity, src, dst, demand, **kwargs)
+	return dict(saturation_load_percent_lower=100. * estimate["lower_bound"], saturation_load_percent_upper=100. * estimate["upper_bound"], method=method, num_phases=estimate["num_phases"])
+
+# Returns the load levels (in percent) that are not clearly past saturation, i.e. at most (1 + margin) times the upper
+# bound on the saturation load of the estimate.
+def screen_load_levels(load_levels, saturation_estimate, margin=0.):
+	return [load_level for load_level in load_levels if load_level <= (1. + margin) * saturation_estimate["saturation_load_percent_upper"]]
+
+if __name__ == "__main__":
+	import generate_netbench_configs
+	parser = argparse.ArgumentParser(description="Estimates the saturation load of every (app, topology) of the sweep.")
+	parser.add_argument("--apps", nargs="+", default=generate_netbench_configs.APPS)
+	parser.add_argument("--topologies", nargs="+", default=generate_netbench_configs.TOPOLOGY_NAMES)
+	parser.add_argument("--method", choices=("auto", "lp", "approximate"), default="auto")
+	parser.add_argument("--epsilon", type=float, default=0.1)
+	parser.add_argument("--tolerance", type=float, default=0.1)
+	parser.add_argument("--margin", type=float, default=0., help="Keep the loads up to (1 + margin) times the saturation load.")
+	args = parser.parse_args()
+	approximation_arguments = {} if args.method == "lp" else dict(epsilon=args.epsilon, tolerance=args.tolerance)
+	print("app,topology,method,saturation_load_percent_lower,saturation_load_percent_upper,load_levels_kept")
+	for app in args.apps:
+		traffic_probabilities, nnodes = generate_netbench_configs.utilities.read_traffic_probability_arrays("traffic_probabilities/{}.txt".format(app))
+		topology_params = generate_netbench_configs.get_topology_params_based_on_app(app)
+		for topology_name in args.topologies:
+			topology = generate_netbench_configs.build_topology(topology_name, topology_params[topology_name], traffic_probabilities)
+			topology.wire_network()
+			try:
+				estimate = estimate_saturation_load(topology, traffic_probabilities, nnodes, method=args.method, **approximation_arguments)
+			except ValueError as error:
+				# A mismatch between the traffic and the topology is reported, and the rest of the sweep still screened.
+				sys.stderr.write("Skipping {} on {}: {}\n".format(app, topology_name, error))
+				continue
+			kept_load_levels = screen_load_levels(generate_netbench_configs.LOAD_LEVELS, estimate, margin=args.margin)
+			print("{},{},{},{:.2f},{:.2f},{}".format(app, topology_name, estimate["method"], estimate["saturation_load_percent_lower"], estimate["saturation_load_percent_upper"], " ".join(str(load_level) for load_level in kept_load_levels)))
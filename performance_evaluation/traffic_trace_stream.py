@@ -0,0 +1,276 @@
+import os, sys
+import argparse
+import itertools
+import json
+import shutil
+import numpy as np
+import scipy.sparse
+
+## Streaming ingestion of per-message traffic traces into time-windowed traffic matrices.
+## A trace is a sequence of (time, src, dst, num_bytes) messages between physical servers, read in chunks so that the
+## memory footprint only depends on the chunk size and on the number of server pairs active in a window. Messages are
+## binned into windows of window_length (in the time unit of the trace), and every window is stored as a sparse traffic
+## matrix at the server, ToR and pod levels, where server s sits below ToR s // num_servers_per_tor, and ToR t in pod
+## t // num_tors_per_pod. With a decay in (0, 1), window w stores the exponentially decayed matrix
+## decay * stored(w - 1) + traffic(w) instead, with the entries below min_num_bytes pruned.
+## Summing the windows of an undecayed series over all time gives the static PDF of the traffic_probabilities files.
+
+# Record layout of binary traces (raw .bin files, or .npy files), and of the chunks read from any trace.
+TRACE_RECORD_DTYPE = np.dtype([("time", np.float64), ("src", np.int64), ("dst", np.int64), ("num_bytes", np.float64)])
+# Record layout of the stored matrix entries.
+SERIES_ENTRY_DTYPE = np.dtype([("src", np.int64), ("dst", np.int64), ("num_bytes", np.float64)])
+LEVELS = ("server", "tor", "pod")
+
+METADATA_FILENAME = "metadata.json"
+
+## Trace reading.
+# Yields the messages of a trace in chunks of at most chunk_size TRACE_RECORD_DTYPE records. The trace_format is "csv",
+# "bin" (raw records), "npy", or "auto" to pick it from the file extension. CSV traces have one message per line, with the
+# time, src, dst and num_bytes in the given columns; lines starting with "#" and the first num_header_lines lines are
+# skipped.
+def iter_trace_chunks(trace_filename, trace_format="auto", chunk_size=1 << 20, columns=(0, 1, 2, 3), delimiter=",", num_header_lines=0):
+	if trace_format == "auto":
+		extension = os.path.splitext(trace_filename)[1]
+		trace_format = {".bin": "bin", ".npy": "npy"}.get(extension, "csv")
+	assert(trace_format in ("csv", "bin", "npy"))
+	if trace_format == "npy":
+		records = np.load(trace_filename, mmap_mode="r")
+		assert(records.dtype == TRACE_RECORD_DTYPE)
+		for chunk_start in range(0, len(records), chunk_size):
+			yield np.array(records[chunk_start:chunk_start + chunk_size])
+	elif trace_format == "bin":
+		with open(trace_filename, "rb") as f:
+			while True:
+				chunk = np.fromfile(f, dtype=TRACE_RECORD_DTYPE, count=chunk_size)
+				if len(chunk) == 0:
+					break
+				yield chunk
+	else:
+		with open(trace_filename, "r") as f:
+			lines = (line for line in itertools.islice(f, num_header_lines, None) if line[0] != "#" and line.strip())
+			while True:
+				chunk_lines = list(itertools.islice(lines, chunk_size))
+				if not chunk_lines:
+					break
+				columns_read = np.loadtxt(chunk_lines, delimiter=delimiter, usecols=columns, ndmin=2)
+				chunk = np.empty(len(columns_read), dtype=TRACE_RECORD_DTYPE)
+				for field_index, field in enumerate(TRACE_RECORD_DTYPE.names):
+					chunk[field] = columns_read[:, field_index]
+				yield chunk
+
+## Writing.
+## Builds a series in output_directory from chunks of messages passed to add(), and finalizes it on close(). Messages may
+## arrive out of order by less than max_open_windows windows; windows further back are written out and closed, and
+## messages that still fall in them are an error. The series is written to a temporary directory, which only replaces
+## output_directory on close, so an interrupted ingestion never leaves a partial series behind.
+class TrafficMatrixSeriesWriter(object):
+	def __init__(self, output_directory, window_length, num_servers_per_tor, num_tors_per_pod, start_time=0., decay=0., min_num_bytes=0., max_open_windows=2):
+		assert(window_length > 0 and 0 <= decay < 1 and max_open_windows >= 1)
+		self.output_directory = output_directory
+		self.window_length = float(window_length)
+		self.num_servers_per_tor = int(num_servers_per_tor)
+		self.num_tors_per_pod = int(num_tors_per_pod)
+		self.start_time = float(start_time)
+		self.decay = float(decay)
+		self.min_num_bytes = float(min_num_bytes)
+		self.max_open_windows = max_open_windows
+		self.temporary_directory = "{}.tmp{}".format(output_directory.rstrip("/"), os.getpid())
+		if os.path.isdir(self.temporary_directory):
+			shutil.rmtree(self.temporary_directory)
+		os.makedirs(self.temporary_directory)
+		self.entry_files = dict((level, open(os.path.join(self.temporary_directory, "{}_entries.bin".format(level)), "wb")) for level in LEVELS)
+		self.indptrs = dict((level, [0]) for level in LEVELS)
+		# Decayed matrix of the last written window of every level, as (keys, num_bytes) arrays.
+		self.decayed = dict((level, (np.zeros(0, dtype=np.int64), np.zeros(0))) for level in LEVELS)
+		# Server-level (keys, num_bytes) chunks of the windows that are still open.
+		self.open_windows = {}
+		self.num_written_windows = 0
+		self.max_server_id = -1
+		self.num_messages = 0
+		self.total_num_bytes = 0.
+		return
+
+	# Adds a chunk of TRACE_RECORD_DTYPE messages, and writes out the windows that can no longer receive messages.
+	def add(self, messages):
+		if len(messages) == 0:
+			return
+		windows = np.floor((messages["time"] - self.start_time) / self.window_length).astype(np.int64)
+		assert(windows.min() >= self.num_written_windows), "Message at time {} falls in a window that was already written".format(messages["time"][np.argmin(windows)])
+		self.max_server_id = max(self.max_server_id, int(messages["src"].max()), int(messages["dst"].max()))
+		self.num_messages += len(messages)
+		self.total_num_bytes += float(messages["num_bytes"].sum())
+		# Every window of the chunk gets its server pairs merged, which keeps the open windows as small as their support.
+		keys = _encode_pairs(messages["src"], messages["dst"])
+		order = np.argsort(windows, kind="stable")
+		window_starts = np.flatnonzero(np.diff(np.concatenate(([-1], windows[order]))))
+		for start, end in zip(window_starts, np.append(window_starts[1:], len(order))):
+			window = int(windows[order[start]])
+			chunk_keys, chunk_num_bytes = _merge_entries(keys[order[start:end]], messages["num_bytes"][order[start:end]])
+			self.open_windows.setdefault(window, []).append((chunk_keys, chunk_num_bytes))
+			if len(self.open_windows[window]) > 8:
+				self.open_windows[window] = [_merge_entries(*map(np.concatenate, zip(*self.open_windows[window])))]
+		self.__write_windows_before(int(windows.max()) - self.max_open_windows + 1)
+		return
+
+	# Writes out all the windows, and moves the series to output_directory. Returns the TrafficMatrixSeries.
+	def close(self):
+		if self.open_windows:
+			self.__write_windows_before(max(self.open_windows) + 1)
+		for entry_file in self.entry_files.values():
+			entry_file.close()
+		num_servers = self.max_server_id + 1
+		num_tors = (num_servers + self.num_servers_per_tor - 1) // self.num_servers_per_tor
+		metadata = {"window_length": self.window_length,
+					"start_time": self.start_time,
+					"num_windows": self.num_written_windows,
+					"num_servers_per_tor": self.num_servers_per_tor,
+					"num_tors_per_pod": self.num_tors_per_pod,
+					"num_nodes": {"server": num_servers, "tor": num_tors, "pod": (num_tors + self.num_tors_per_pod - 1) // self.num_tors_per_pod},
+					"decay": self.decay,
+					"min_num_bytes": self.min_num_bytes,
+					"num_messages": self.num_messages,
+					"total_num_bytes": self.total_num_bytes,
+					}
+		for level in LEVELS:
+			np.save(os.path.join(self.temporary_directory, "{}_indptr.npy".format(level)), np.array(self.indptrs[level], dtype=np.int64))
+		with open(os.path.join(self.temporary_directory, METADATA_FILENAME), "w+") as f:
+			json.dump(metadata, f, sort_keys=True, indent=1)
+		if os.path.isdir(self.output_directory):
+			shutil.rmtree(self.output_directory)
+		os.rename(self.temporary_directory, self.output_directory)
+		return TrafficMatrixSeries(self.output_directory)
+
+	# Writes out the open windows before the given one, and the empty windows between them.
+	def __write_windows_before(self, end_window):
+		while self.num_written_windows < end_window:
+			window = self.num_written_windows
+			server_keys, server_num_bytes = np.zeros(0, dtype=np.int64), np.zeros(0)
+			if window in self.open_windows:
+				server_keys, server_num_bytes = _merge_entries(*map(np.concatenate, zip(*self.open_windows.pop(window))))
+			src, dst = _decode_pairs(server_keys)
+			level_nodes = {"server": (src, dst)}
+			level_nodes["tor"] = (src // self.num_servers_per_tor, dst // self.num_servers_per_tor)
+			level_nodes["pod"] = (level_nodes["tor"][0] // self.num_tors_per_pod, level_nodes["tor"][1] // self.num_tors_per_pod)
+			for level in LEVELS:
+				keys, num_bytes = _merge_entries(_encode_pairs(*level_nodes[level]), server_num_bytes)
+				if self.decay > 0:
+					decayed_keys, decayed_num_bytes = self.decayed[level]
+					keys, num_bytes = _merge_entries(np.concatenate((decayed_keys, keys)), np.concatenate((self.decay * decayed_num_bytes, num_bytes)))
+				kept = num_bytes >= self.min_num_bytes
+				keys, num_bytes = keys[kept], num_bytes[kept]
+				if self.decay > 0:
+					self.decayed[level] = (keys, num_bytes)
+				entries = np.empty(len(keys), dtype=SERIES_ENTRY_DTYPE)
+				entries["src"], entries["dst"] = _decode_pairs(keys)
+				entries["num_bytes"] = num_bytes
+				entries.tofile(self.entry_files[level])
+				self.indptrs[level].append(self.indptrs[level][-1] + len(entries))
+			self.num_written_windows += 1
+		return
+
+# Server pairs are merged under a single int64 key, with src in the high 32 bits.
+def _encode_pairs(src, dst):
+	return (np.asarray(src, dtype=np.int64) << 32) | np.asarray(dst, dtype=np.int64)
+
+def _decode_pairs(keys):
+	return keys >> 32, keys & 0xffffffff
+
+# Returns the sorted distinct keys, and the sum of num_bytes of each.
+def _merge_entries(keys, num_bytes):
+	unique_keys, inverse = np.unique(keys, return_inverse=True)
+	return unique_keys, np.bincount(inverse.ravel(), weights=num_bytes, minlength=len(unique_keys))
+
+# Streams a trace (see iter_trace_chunks) into a series in output_directory, and returns the TrafficMatrixSeries.
+def ingest_trace(trace_filename, output_directory, window_length, num_servers_per_tor, num_tors_per_pod, trace_format="auto", chunk_size=1 << 20, columns=(0, 1, 2, 3), num_header_lines=0, **kwargs):
+	writer = TrafficMatrixSeriesWriter(output_directory, window_length, num_servers_per_tor, num_tors_per_pod, **kwargs)
+	for messages in iter_trace_chunks(trace_filename, trace_format=trace_format, chunk_size=chunk_size, columns=columns, num_header_lines=num_header_lines):
+		writer.add(messages)
+	return writer.close()
+
+## Reading.
+## A series written by TrafficMatrixSeriesWriter. The entries are memory-mapped, so only the windows that are accessed
+## are read from disk.
+class TrafficMatrixSeries(object):
+	def __init__(self, directory):
+		self.directory = directory
+		with open(os.path.join(directory, METADATA_FILENAME), "r") as f:
+			self.metadata = json.load(f)
+		self.indptrs = {}
+		self.entries = {}
+		for level in LEVELS:
+			self.indptrs[level] = np.load(os.path.join(directory, "{}_indptr.npy".format(level)))
+			entries_filename = os.path.join(directory, "{}_entries.bin".format(level))
+			self.entries[level] = np.memmap(entries_filename, dtype=SERIES_ENTRY_DTYPE, mode="r") if os.path.getsize(entries_filename) > 0 else np.zeros(0, dtype=SERIES_ENTRY_DTYPE)
+		return
+
+	def get_num_windows(self):
+		return self.metadata["num_windows"]
+
+	def get_num_nodes(self, level):
+		return self.metadata["num_nodes"][level]
+
+	# Returns the (start, end) time of a window.
+	def get_window_time_range(self, window):
+		start = self.metadata["start_time"] + window * self.metadata["window_length"]
+		return start, start + self.metadata["window_length"]
+
+	# Returns the entries of windows [start_window, end_window) of a level, as a SERIES_ENTRY_DTYPE array.
+	def get_entries(self, level, start_window=0, end_window=None):
+		end_window = self.get_num_windows() if end_window is None else end_window
+		return self.entries[level][self.indptrs[level][start_window]:self.indptrs[level][end_window]]
+
+	# Returns the traffic matrix of a window at a level, as a scipy CSR matrix of bytes.
+	def get_window(self, level, window):
+		return self.aggregate(level, window, window + 1)
+
+	# Yields (window, traffic matrix) for the windows [start_window, end_window) of a level.
+	def iter_windows(self, level, start_window=0, end_window=None):
+		end_window = self.get_num_windows() if end_window is None else end_window
+		for window in range(start_window, end_window):
+			yield window, self.get_window(level, window)
+
+	# Returns the sum of the traffic matrices of windows [start_window, end_window) of a level, as a scipy CSR matrix.
+	def aggregate(self, level, start_window=0, end_window=None):
+		entries = self.get_entries(level, start_window, end_window)
+		num_nodes = self.get_num_nodes(level)
+		return scipy.sparse.csr_matrix((np.asarray(entries["num_bytes"]), (np.asarray(entries["src"]), np.asarray(entries["dst"]))), shape=(num_nodes, num_nodes))
+
+	# Returns the server-level traffic of windows [start_window, end_window) as a PDF over server pairs, in the form of
+	# utilities.read_traffic_probability_arrays: ((src, dst, prob), num_nodes), with num_nodes the number of servers that
+	# appear in the pairs. Over all the windows of an undecayed series, this is the static PDF of the trace.
+	def to_traffic_probability(self, start_window=0, end_window=None):
+		traffic_matrix = self.aggregate("server", start_window, end_window).tocoo()
+		src, dst, num_bytes = traffic_matrix.row.astype(np.int64), traffic_matrix.col.astype(np.int64), traffic_matrix.data
+		num_nodes = int(max(src.max(), dst.max())) + 1 if len(src) else 0
+		return (src, dst, num_bytes / num_bytes.sum() if len(num_bytes) else num_bytes), num_nodes
+
+	# Writes the PDF of to_traffic_probability in the format of the traffic_probabilities files.
+	def write_traffic_probability_file(self, filename, start_window=0, end_window=None):
+		(src, dst, prob), _ = self.to_traffic_probability(start_window, end_window)
+		with open(filename, "w+") as f:
+			f.write("#tor_pair_id,src,dst,pdf_num_bytes\n")
+			f.write("".join(map("{},{},{},{:.4e}\n".format, range(len(prob)), src.tolist(), dst.tolist(), prob.tolist())))
+		return
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Streams a per-message trace into time-windowed server, ToR and pod traffic matrices.")
+	parser.add_argument("trace", help="CSV (time,src,dst,num_bytes), .bin or .npy trace.")
+	parser.add_argument("output_directory")
+	parser.add_argument("--window-length", type=float, required=True, help="Window length, in the time unit of the trace.")
+	parser.add_argument("--servers-per-tor", type=int, required=True)
+	parser.add_argument("--tors-per-pod", type=int, required=True)
+	parser.add_argument("--format", choices=("auto", "csv", "bin", "npy"), default="auto")
+	parser.add_argument("--columns", type=int, nargs=4, default=(0, 1, 2, 3), help="CSV columns of the time, src, dst and num_bytes.")
+	parser.add_argument("--header-lines", type=int, default=0)
+	parser.add_argument("--chunk-size", type=int, default=1 << 20, help="Messages read at a time.")
+	parser.add_argument("--decay", type=float, default=0.)
+	parser.add_argument("--min-num-bytes", type=float, default=0.)
+	parser.add_argument("--traffic-probability-file", default=None, help="Also write the static PDF of the trace to this file (without --decay).")
+	args = parser.parse_args()
+	assert(args.traffic_probability_file is None or args.decay == 0), "The static PDF is the sum of the undecayed windows"
+	series = ingest_trace(args.trace, args.output_directory, args.window_length, args.servers_per_tor, args.tors_per_pod,
+						trace_format=args.format, chunk_size=args.chunk_size, columns=tuple(args.columns), num_header_lines=args.header_lines,
+						decay=args.decay, min_num_bytes=args.min_num_bytes)
+	print("{} windows, {} messages, {} bytes".format(series.get_num_windows(), series.metadata["num_messages"], series.metadata["total_num_bytes"]))
+	if args.traffic_probability_file is not None:
+		series.write_traffic_probability_file(args.traffic_probability_file)
@@ -1,4 +1,7 @@
 import sys, os
+import hashlib
+import json
+import numpy as np
 
 ## Given a long representing the nanoseconds, returns a string of the time.
 def extract_timing_string(nanoseconds):
@@ -34,6 +37,52 @@ def read_traffic_probability_file(prob_filename):
 				traffic_probabilities[(src, dst)] = prob
 	return traffic_probabilities, max_index + 1
 
+# Reads in a traffic probability file in columnar form, returning the parallel (src, dst, prob) numpy arrays
+# and the number of nodes required. When use_cache is set, the parsed columns are kept in a binary sidecar file
+# next to the probability file, keyed by the file's size and modification time, and memory-mapped on later reads.
+def read_traffic_probability_arrays(prob_filename, use_cache=True):
+	cache_filename = prob_filename + ".cache.npy"
+	cache_key_filename = prob_filename + ".cache.key"
+	file_stat = os.stat(prob_filename)
+	cache_key = "{},{}".format(file_stat.st_size, repr(file_stat.st_mtime))
+	traffic_records = None
+	if use_cache and os.path.isfile(cache_filename) and os.path.isfile(cache_key_filename):
+		with open(cache_key_filename, "r") as f:
+			if f.read().strip() == cache_key:
+				traffic_records = np.load(cache_filename, mmap_mode="r")
+	if traffic_records is None:
+		columns = np.loadtxt(prob_filename, delimiter=",", comments="#", usecols=(1, 2, 3), ndmin=2)
+		traffic_records = np.empty(len(columns), dtype=TRAFFIC_PROBABILITY_DTYPE)
+		traffic_records["src"] = columns[:, 0]
+		traffic_records["dst"] = columns[:, 1]
+		traffic_records["prob"] = columns[:, 2]
+		if use_cache:
+			_write_traffic_probability_cache(traffic_records, cache_filename, cache_key_filename, cache_key)
+	src, dst, prob = traffic_records["src"], traffic_records["dst"], traffic_records["prob"]
+	num_nodes = 0
+	if len(traffic_records) > 0:
+		num_nodes = int(max(src.max(), dst.max())) + 1
+	return (src, dst, prob), num_nodes
+
+# Record layout of the binary traffic probability cache.
+TRAFFIC_PROBABILITY_DTYPE = np.dtype([("src", np.int64), ("dst", np.int64), ("prob", np.float64)])
+
+# Writes the traffic probability cache, the key file is written last so that a partially written cache is never used.
+# The cache is best effort: failures (e.g. a read-only directory) simply leave the file uncached.
+def _write_traffic_probability_cache(traffic_records, cache_filename, cache_key_filename, cache_key):
+	try:
+		if os.path.isfile(cache_key_filename):
+			os.remove(cache_key_filename)
+		with open(cache_filename + ".tmp", "wb") as f:
+			np.save(f, traffic_records)
+		os.rename(cache_filename + ".tmp", cache_filename)
+		with open(cache_key_filename + ".tmp", "w") as f:
+			f.write(cache_key)
+		os.rename(cache_key_filename + ".tmp", cache_key_filename)
+	except (IOError, OSError):
+		pass
+	return
+
 def write_simulation_configuration_file(output_base_dir,
 										output_subdir,
 										initial_topology_filename, 
@@ -58,9 +107,11 @@ def write_simulation_configuration_file(output_base_dir,
 
 	# Enable bandwidth steering during simulation
 	str_builder += "# Reconfig steering\n"
-	if network_property_dictionary["reconfiguration_type"] in ("on_demand", "rotation"):
+	if network_property_dictionary["reconfiguration_type"] in ("on_demand", "rotation", "preplanned"):
 		str_builder += "reconfiguration_type={}\n".format(network_property_dictionary["reconfiguration_type"])
 		str_builder += "reconfiguration_period_ns={}\n".format(network_property_dictionary["reconfiguration_period_ns"])
+	if network_property_dictionary["reconfiguration_type"] == "preplanned":
+		str_builder += "reconfiguration_schedule_file={}\n".format(network_property_dictionary["reconfiguration_schedule_filename"])
 	str_builder += "link_reconfig_latency_ns=0\n"
 	str_builder += "num_reconfigurable_uplinks={}\n\n".format(network_property_dictionary["num_reconfigurable_uplinks_per_pod"])
 	# Network device
@@ -107,4 +158,52 @@ def write_simulation_configuration_file(output_base_dir,
 	str_builder += "traffic_lambda_flow_starts_per_s={}\n".format(flow_arrival_per_sec)
 	str_builder += "traffic_flow_size_dist=pfabric_web_search_upper_bound\n"
 	str_builder += "traffic_probabilities_file={}\n\n".format(traffic_probability_filename)
-	return str_builder 
\ No newline at end of file
+	return str_builder 
+
+## Helpers for incremental, crash-safe generation of simulation files.
+# Returns the hex digest of a JSON-serializable description of the inputs of an artifact.
+def compute_input_digest(description):
+	return hashlib.sha1(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+# Returns the hex digest of the contents of a file.
+def compute_file_digest(filename, block_size=1 << 20):
+	sha1 = hashlib.sha1()
+	with open(filename, "rb") as f:
+		block = f.read(block_size)
+		while block:
+			sha1.update(block)
+			block = f.read(block_size)
+	return sha1.hexdigest()
+
+# Writes filename atomically: write_function is called with an open file object to a temporary file, which only
+# replaces filename once it has been fully written. A crash therefore never leaves a partially written file behind.
+def write_file_atomically(filename, write_function):
+	temporary_filename = "{}.tmp{}".format(filename, os.getpid())
+	with open(temporary_filename, "w+") as f:
+		write_function(f)
+	os.rename(temporary_filename, filename)
+	return
+
+# Reads the manifest of generated files, mapping each filename to the digests of its inputs and contents.
+def read_manifest(manifest_filename):
+	if not os.path.isfile(manifest_filename):
+		return {}
+	with open(manifest_filename, "r") as f:
+		return json.load(f)
+
+def write_manifest(manifest_filename, manifest):
+	write_file_atomically(manifest_filename, lambda f: json.dump(manifest, f, sort_keys=True, indent=1))
+	return
+
+# Checks whether filename was generated from inputs with the given digest, according to its manifest entry, and is still
+# on disk unchanged. The contents are re-hashed only if verify_contents is set; otherwise the file size is compared.
+def is_generated_file_up_to_date(filename, manifest_entry, input_digest, verify_contents=False):
+	if manifest_entry is None or manifest_entry["input_digest"] != input_digest or not os.path.isfile(filename):
+		return False
+	if os.path.getsize(filename) != manifest_entry["size"]:
+		return False
+	return not verify_contents or compute_file_digest(filename) == manifest_entry["content_digest"]
+
+# Returns the manifest entry of a freshly generated file.
+def make_manifest_entry(filename, input_digest):
+	return {"input_digest": input_digest, "content_digest": compute_file_digest(filename), "size": os.path.getsize(filename)}
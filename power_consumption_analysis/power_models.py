@@ -0,0 +1,180 @@
+'''
+Registry of the power models used by the power analyses.
+A power model gives the power in Watts of an EPS as a function of its radix (evaluated element-wise over arrays), and
+carries the OCS and transceiver powers of the design. Models are registered under a name and an integer version, and
+are built on first use. Models fitted to datasheets can keep their fitted parameters in a JSON cache file, keyed by the
+model and the datasheet they were fitted to, so that later runs load them rather than refitting.
+Nothing here depends on matplotlib, the plots live in power_plots.
+'''
+import os, sys
+import csv
+import hashlib
+import json
+import numpy as np
+
+# Maps an OCS radix to the power consumption
+# Polatis 384 x 384 7000 Series OCS, 100W power consumption
+# Calient S320 320 x 320 OCS, 45W power consumption normally
+OCS_POWER_MODELS = {320 : 45, 384 : 100}
+
+# Based on datasheets, collects the power (W) of switch as a function of radix.
+EPS_POWER_CONSUMPTIONS = {
+	"Mellanox QM8700 Series" : (80, 274),
+	"Mellanox SB7800" : (36, 136), #d
+	"tomahawk" : (128, 483), #d
+	"mellanox ethernet" : (16, 94.7), #d
+	"Mellanox Spectrum SN2700 32-Port 100GbE" : (32, 169),
+	"mellanox SN4600C" : (64, 482), #d
+}
+
+# per optical transceiver power
+TRANSCEIVER_POWER_W = 4.5
+
+# Linear model used before fitting to the datasheets.
+INITIAL_GRADIENT = 2.39
+INITIAL_Y_INTERCEPT = 188
+
+## A power model. get_eps_power(eps_radix) returns the power of k-radix packet switches element-wise, and the model is
+## callable as a shorthand for it. Every OCS of radix ocs_radix draws ocs_power_w, and every optical transceiver
+## transceiver_power_w.
+class PowerModel(object):
+	def __init__(self, name, version=1, ocs_radix=320, ocs_power_w=None, transceiver_power_w=TRANSCEIVER_POWER_W):
+		self.name = name
+		self.version = version
+		self.ocs_radix = ocs_radix
+		self.ocs_power_w = ocs_power_w if ocs_power_w is not None else OCS_POWER_MODELS[ocs_radix]
+		self.transceiver_power_w = transceiver_power_w
+		return
+
+	def get_eps_power(self, eps_radix):
+		raise NotImplementedError("{} does not model the EPS power".format(type(self).__name__))
+
+	def __call__(self, eps_radix):
+		return self.get_eps_power(eps_radix)
+
+	def __repr__(self):
+		return "{}(name={}, version={})".format(type(self).__name__, self.name, self.version)
+
+# EPS power growing linearly in the radix, gradient * k + y_intercept.
+class LinearPowerModel(PowerModel):
+	def __init__(self, name, gradient, y_intercept, **kwargs):
+		PowerModel.__init__(self, name, **kwargs)
+		self.gradient = float(gradient)
+		self.y_intercept = float(y_intercept)
+		return
+
+	def get_eps_power(self, eps_radix):
+		return self.gradient * np.asarray(eps_radix, dtype=np.float64) + self.y_intercept
+
+# EPS power interpolated linearly between the (radix, power) points of a datasheet, and extrapolated along the first and
+# last segments outside of them. Points of the same radix are averaged.
+class PiecewisePowerModel(PowerModel):
+	def __init__(self, name, datasheet, **kwargs):
+		PowerModel.__init__(self, name, **kwargs)
+		radices, powers = get_datasheet_points(datasheet)
+		self.radices = np.unique(radices)
+		self.powers = np.bincount(np.searchsorted(self.radices, radices), weights=powers) / np.bincount(np.searchsorted(self.radices, radices))
+		assert(len(self.radices) >= 2), "A piecewise power model needs at least two distinct radices"
+		return
+
+	def get_eps_power(self, eps_radix):
+		eps_radix = np.asarray(eps_radix, dtype=np.float64)
+		power = np.interp(eps_radix, self.radices, self.powers)
+		first_gradient = (self.powers[1] - self.powers[0]) / (self.radices[1] - self.radices[0])
+		last_gradient = (self.powers[-1] - self.powers[-2]) / (self.radices[-1] - self.radices[-2])
+		power = np.where(eps_radix < self.radices[0], self.powers[0] + first_gradient * (eps_radix - self.radices[0]), power)
+		return np.where(eps_radix > self.radices[-1], self.powers[-1] + last_gradient * (eps_radix - self.radices[-1]), power)
+
+## Datasheets, given as a dict of switch name to (radix, power in W) like EPS_POWER_CONSUMPTIONS.
+# Reads a datasheet from a CSV file with a header row and the columns name, radix, power_w.
+def read_datasheet_csv(filename):
+	datasheet = {}
+	with open(filename, "r") as f:
+		for row in csv.DictReader(f):
+			datasheet[row["name"].strip()] = (int(row["radix"]), float(row["power_w"]))
+	return datasheet
+
+# Returns the hex digest of the contents of a datasheet, independent of the order of its entries.
+def compute_datasheet_digest(datasheet):
+	contents = json.dumps(sorted([name, float(radix), float(power)] for name, (radix, power) in datasheet.items()))
+	return hashlib.sha1(contents.encode("utf-8")).hexdigest()
+
+# Returns the (radices, powers) arrays of a datasheet, ordered by switch name.
+def get_datasheet_points(datasheet):
+	names = sorted(datasheet)
+	return np.array([datasheet[name][0] for name in names], dtype=np.float64), np.array([datasheet[name][1] for name in names], dtype=np.float64)
+
+## Fitting.
+# Performs a linear fitting of eps radix to power on the datasheet, and returns the LinearPowerModel. If cache_filename is
+# given, the fitted parameters are read from that JSON file when it holds a fit of the same model to the same datasheet,
+# and are written back to it otherwise.
+def fit_linear_power_model(name, datasheet=EPS_POWER_CONSUMPTIONS, version=1, cache_filename=None, **kwargs):
+	key = "{},{},linear,{}".format(name, version, compute_datasheet_digest(datasheet))
+	cache = {}
+	if cache_filename is not None and os.path.isfile(cache_filename):
+		with open(cache_filename, "r") as f:
+			cache = json.load(f)
+	if key not in cache:
+		radices, powers = get_datasheet_points(datasheet)
+		fit_function = np.polyfit(radices, powers, 1)
+		cache[key] = [float(fit_function[0]), float(fit_function[1])]
+		if cache_filename is not None:
+			temporary_filename = "{}.tmp{}".format(cache_filename, os.getpid())
+			with open(temporary_filename, "w+") as f:
+				json.dump(cache, f, sort_keys=True)
+			os.rename(temporary_filename, cache_filename)
+	gradient, y_intercept = cache[key]
+	return LinearPowerModel(name, gradient, y_intercept, version=version, **kwargs)
+
+# Builds a power model of the given kind ("linear_fit" or "piecewise") from a CSV datasheet (see read_datasheet_csv).
+def create_power_model_from_csv(name, filename, kind="linear_fit", version=1, cache_filename=None, **kwargs):
+	datasheet = read_datasheet_csv(filename)
+	if kind == "linear_fit":
+		return fit_linear_power_model(name, datasheet, version=version, cache_filename=cache_filename, **kwargs)
+	elif kind == "piecewise":
+		return PiecewisePowerModel(name, datasheet, version=version, **kwargs)
+	raise ValueError("Unknown power model kind: {}".format(kind))
+
+## Registry.
+# Maps (name, version) to the function building the model, and to the model once it is built.
+POWER_MODEL_FACTORIES = {}
+_power_models = {}
+
+# Fitted parameters of the registered models are cached in this file, next to this module by default (None disables the
+# cache).
+fit_cache_filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), "power_model_fits.cache.json")
+
+DEFAULT_POWER_MODEL_NAME = "linear_fit"
+
+# Registers the model built by factory() under (name, version), replacing any previous one.
+def register_power_model(name, factory, version=1):
+	POWER_MODEL_FACTORIES[(name, version)] = factory
+	_power_models.pop((name, version), None)
+	return
+
+# Returns the model registered under name, at the given version or at the latest version if none is given.
+def get_power_model(name=DEFAULT_POWER_MODEL_NAME, version=None):
+	if version is None:
+		versions = [model_version for model_name, model_version in POWER_MODEL_FACTORIES if model_name == name]
+		if not versions:
+			raise KeyError("No power model is registered as {}".format(name))
+		version = max(versions)
+	if (name, version) not in _power_models:
+		_power_models[(name, version)] = POWER_MODEL_FACTORIES[(name, version)]()
+	return _power_models[(name, version)]
+
+# Returns the sorted (name, version) pairs of the registered models.
+def list_power_models():
+	return sorted(POWER_MODEL_FACTORIES)
+
+# Sets the JSON file caching the fitted parameters of the registered models, or disables the cache if filename is None.
+def set_fit_cache_filename(filename):
+	global fit_cache_filename
+	fit_cache_filename = filename
+	return
+
+# The fitted linear model of the power analysis, the linear model used before the fit, and the piecewise model through
+# the datasheet points.
+register_power_model("linear_fit", lambda: fit_linear_power_model("linear_fit", EPS_POWER_CONSUMPTIONS, cache_filename=fit_cache_filename))
+register_power_model("linear_initial", lambda: LinearPowerModel("linear_initial", INITIAL_GRADIENT, INITIAL_Y_INTERCEPT))
+register_power_model("piecewise", lambda: PiecewisePowerModel("piecewise", EPS_POWER_CONSUMPTIONS))
@@ -0,0 +1,79 @@
+import numpy as np
+import matplotlib as mpl
+#mpl.use("pgf")
+import matplotlib.pyplot as plt
+import matplotlib.image as img
+import matplotlib.ticker as mtick
+import power_models
+
+xylabel_fontsize=7.4
+xyticklabel_fontsize = 6.5
+linewidth_arg = 0.85
+latex_linewidth_inch = 6.9787
+fig_width = 0.33 * latex_linewidth_inch
+fig_height = 1.8
+legend_fontsize = 6.2
+markersize_arg = 4
+color_cycle = ['darkcyan', 'lime', 'orange', 'darkred', 'gray','blueviolet','deeppink']
+
+# Plots the datasheet points and the linear power model fitted to them.
+def plot_eps_power_linear_regression(model, datasheet=power_models.EPS_POWER_CONSUMPTIONS):
+	x, y = power_models.get_datasheet_points(datasheet)
+	mpl.rcParams.update({"pgf.texsystem": "pdflatex", 'font.family': 'serif', 'text.usetex': True, 'pgf.rcfonts': False, 'text.latex.preamble': r'\newcommand{\mathdefault}[1][]{}'})
+	fig, ax = plt.subplots(1,1, figsize=(0.17 * latex_linewidth_inch, fig_height), dpi=200)
+	ax.scatter(x, y, color=(0.,0.,0.), marker='.', s=12)
+	fitted_line_x = np.arange(14, 131, 2)
+	fitted_line_y = model.get_eps_power(fitted_line_x)
+	ax.plot(fitted_line_x, fitted_line_y, linestyle='-', color=(0,0,0), linewidth=linewidth_arg)
+	ax.set_xlim(xmin=14, xmax=130)
+	ax.grid(b=None, which='major', axis='y', linestyle='-', linewidth=0.5)
+	ax.grid(b=None, which='minor', axis='y', linestyle=':', linewidth=0.3)
+	text = r'$y={:.2f}x + {:.1f}$'.format(model.gradient, model.y_intercept)
+	ax.annotate(text, xy=(106, 300), xytext=(0.54, 0.58), textcoords='figure fraction', fontsize=xyticklabel_fontsize, rotation=60, ha='center', va= 'center')
+	xtick_locations = [32, 64, 96, 128]
+	ax.set_xticks(xtick_locations)
+	ax.set_xticklabels([r"{}".format(x) for x in xtick_locations], fontsize=xyticklabel_fontsize, rotation=35)
+	ax.tick_params(axis="y", labelsize=xyticklabel_fontsize)
+	ax.tick_params(axis="x", labelsize=xyticklabel_fontsize)
+	ax.set_ylabel(r"Power (W)", fontsize=xylabel_fontsize, labelpad=0.7)
+	ax.set_xlabel(r"EPS Radix", fontsize=xylabel_fontsize, labelpad=0.7)
+	plt.subplots_adjust(left=0.33, bottom=0.2, right=0.96, top=0.98, wspace=0.2, hspace=0.2)
+	return 
+
+# Plots a bar chart of the total power of every topology, with one panel per dict of results (as returned by
+# power_analysis.small_medium_sized_analysis and large_sized_analysis).
+def plot_power_comparison(results, axis_titles=('Small', 'Medium', 'Large'), ymax_vals=(0.08, 0.8, 8.9)):
+	mpl.rcParams.update({"pgf.texsystem": "pdflatex", 'font.family': 'serif', 'text.usetex': True, 'pgf.rcfonts': False, 'text.latex.preamble': r'\newcommand{\mathdefault}[1][]{}'})
+	fig, axes = plt.subplots(1, len(results), figsize=(0.31 * latex_linewidth_inch, fig_height), dpi=200)
+	topology_keys = ["expander", "tor_reconfigurable", "pod_mesh", "pod_tiered", "ft"]
+	for ax, topology_results, axis_title, ymax_val in zip(np.atleast_1d(axes), results, axis_titles, ymax_vals):
+		x, y = [], []
+		x_offset = 1
+		for topology_key in topology_keys:
+			x.append(x_offset)
+			y.append(topology_results[topology_key]/1E6)
+			x_offset += 2
+		barlist = ax.bar(x, y, color=color_cycle, width=1.3)
+		# Set hatches for pattern
+		for bar_hatch, hatch_pattern in zip(range(len(topology_keys)), ['', '', '', '', '']):
+			barlist[bar_hatch].set_hatch(hatch_pattern)
+		ax.ticklabel_format(axies='y', style='plain', useOffset=True)
+		ax.grid(b=None, which='major', axis='y', linestyle='-', linewidth=0.5)
+		ax.grid(b=None, which='minor', axis='y', linestyle=':', linewidth=0.3)
+		ax.tick_params(axis="y", labelsize=xyticklabel_fontsize)
+		ax.tick_params(axis="x", labelsize=xyticklabel_fontsize)
+		ax.set_title(axis_title, fontsize=xylabel_fontsize, pad=1.9)
+		ax.set_ylim(ymax=ymax_val)
+		rects = ax.patches
+		# Make some labels.
+		labels = [r"{:.3f}".format(power_consumption) for power_consumption in y]
+		for rect, label in zip(rects, labels):
+			height = rect.get_height()
+			ax.text(rect.get_x() + rect.get_width() / 2, height, label, ha='center', va='bottom', fontsize=xyticklabel_fontsize, rotation=90)
+		ax.set_xticks(x)
+		ax.set_xticklabels([r"{}".format(arg) for arg in ['EXP', 'TRN', 'PRN-M','PRN-2L', 'FT']], fontsize=xyticklabel_fontsize, rotation=90, ha='left', va='top', )
+	# Set the ylabel
+	np.atleast_1d(axes)[0].set_ylabel(r"Power consumption (MW)", fontsize=xylabel_fontsize, labelpad=0.7)
+	#axes[1].legend(['EXP', 'TRN-F', 'PRN-2L', 'FT'])
+	plt.subplots_adjust(left=0.2, bottom=0.27, right=0.98, top=0.93, wspace=0.67, hspace=0.2)
+	return
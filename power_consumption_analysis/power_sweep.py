@@ -0,0 +1,271 @@
+'''
+Vectorized power model evaluation over grids of design points.
+Every topology family of power_analysis (EXP, TRN, PRN-M, PRN-2L and FT) is designed and costed over whole arrays of
+target sizes, fat tree radices, oversubscription ratios and EPS/transceiver power scaling factors at once with NumPy,
+and the results are collected into a single tidy table (a structured array with one row per design point), which can
+be written out as CSV. Device counts are exact integers, powers are in Watts.
+'''
+import numpy as np
+import power_models
+
+# Candidate radices of the aggregation switches of a 2-tier pod, besides the radix of the ToRs.
+AGGREGATION_SWITCH_RADICES = [24, 32, 36, 48, 60, 64, 90, 94, 96, 100, 128]
+
+TOPOLOGY_NAMES = ["expander", "tor_reconfigurable", "pod_mesh", "pod_tiered", "ft"]
+TOPOLOGY_LABELS = {"expander" : "EXP", "tor_reconfigurable" : "TRN", "pod_mesh" : "PRN-M", "pod_tiered" : "PRN-2L", "ft" : "FT"}
+
+# Columns of the power table. Parameters a topology does not use are set to 0, and so are the results of the design
+# points without a feasible design, except for the powers, which are NaN.
+POWER_PARAMETER_COLUMNS = [("target_num_servers", np.int64), ("fattree_radix", np.int64), ("oversubscription_numerator", np.int64), ("oversubscription_denominator", np.int64), ("eps_power_scaling", np.float64), ("transceiver_scaling", np.float64)]
+POWER_RESULT_COLUMNS = [("feasible", bool), ("eps_radix", np.int64), ("aggregation_radix", np.int64), ("num_servers", np.int64), ("num_eps", np.int64), ("num_ocs", np.int64), ("num_transceivers", np.float64), ("eps_power_w", np.float64), ("ocs_power_w", np.float64), ("transceiver_power_w", np.float64), ("total_power_w", np.float64)]
+POWER_TABLE_DTYPE = np.dtype([("topology", "U32")] + POWER_PARAMETER_COLUMNS + POWER_RESULT_COLUMNS)
+
+## Vectorized designers. Each takes broadcastable arrays of parameters, and follows the scalar function of the same name
+## in power_analysis.
+# Computes the number of servers of a Moore-bound sized network of k-radix switches, each with k / 2 servers, element-wise.
+# The bound is evaluated as 1 + d * sum_{i < D} (d - 1)^i in float64, which is exact below 2^53.
+def compute_moore_bound_num_servers(k, diameter):
+	k, diameter = np.broadcast_arrays(np.asarray(k, dtype=np.int64), np.asarray(diameter, dtype=np.int64))
+	node_degree = (k // 2).astype(np.float64)
+	geometric_sum = np.zeros(k.shape)
+	for i in range(int(diameter.max()) if diameter.size else 0):
+		geometric_sum = np.where(i < diameter, geometric_sum * (node_degree - 1) + 1, geometric_sum)
+	return (1 + node_degree * geometric_sum) * (k // 2)
+
+# Given arrays of target numbers of servers, computes the minimum even eps radix of at least 16 whose Moore-bound network
+# of the given diameter holds 0.95 * number_of_servers servers, element-wise, by doubling the radix, then binary searching.
+def find_needed_eps_radix_from_moore_bound_with_target_size(number_of_servers, diameter):
+	number_of_servers, diameter = np.broadcast_arrays(np.asarray(number_of_servers, dtype=np.int64), np.asarray(diameter, dtype=np.int64))
+	lb = np.floor(0.95 * number_of_servers)
+	# Search over the radices k = 2 * i.
+	lo, hi = np.full(lb.shape, 8, dtype=np.int64), np.full(lb.shape, 8, dtype=np.int64)
+	too_small = compute_moore_bound_num_servers(2 * hi, diameter) < lb
+	while np.any(too_small):
+		lo, hi = np.where(too_small, hi + 1, lo), np.where(too_small, 2 * hi, hi)
+		too_small = compute_moore_bound_num_servers(2 * hi, diameter) < lb
+	while np.any(lo < hi):
+		mid = (lo + hi) // 2
+		large_enough = compute_moore_bound_num_servers(2 * mid, diameter) >= lb
+		lo, hi = np.where(large_enough, lo, np.minimum(mid + 1, hi)), np.where(large_enough, mid, hi)
+	return 2 * lo
+
+# Number of pods of num_servers_per_pod servers needed for a target number of servers, such that the pods hold at least
+# 0.95 * number_of_servers servers, element-wise.
+def _compute_num_pods(number_of_servers, num_servers_per_pod):
+	num_pods = number_of_servers // num_servers_per_pod
+	return num_pods + (num_pods * num_servers_per_pod < np.floor(0.95 * number_of_servers)).astype(np.int64)
+
+## Given arrays of target sizes in number of servers, finds the smallest eps radix in [fattree_eps_radix, 10 * fattree_eps_radix)
+## of the leaf edge ToR switch of a 2-tier pod-reconfigurable network such that:
+## 1) the total number of servers carried by the network is in the range of 0.95 * number_of_servers, and 1.05 * number_of_servers
+## 2) the number of uplinks from each pod is > per_pod_pair_link_multiplicity * number_of_pods
+## Returns the arrays (eps_radix, num_pods), which are 0 where no radix qualifies. The candidate radices are evaluated in
+## blocks of at most max_block_elements.
+def find_needed_eps_radix_for_pod_reconfigurable_with_target_size(number_of_servers, fattree_eps_radix, per_pod_pair_link_multiplicity=1, oversubscription_numerator=1, oversubscription_denominator=1, max_block_elements=1 << 22):
+	assert(np.all(np.asarray(per_pod_pair_link_multiplicity) >= 1))
+	number_of_servers, fattree_eps_radix, per_pod_pair_link_multiplicity, oversubscription_numerator, oversubscription_denominator = [x.ravel() for x in np.broadcast_arrays(np.asarray(number_of_servers, dtype=np.int64), np.asarray(fattree_eps_radix, dtype=np.int64), np.asarray(per_pod_pair_link_multiplicity), np.asarray(oversubscription_numerator, dtype=np.int64), np.asarray(oversubscription_denominator, dtype=np.int64))]
+	eps_radix, num_pods = np.zeros(len(number_of_servers), dtype=np.int64), np.zeros(len(number_of_servers), dtype=np.int64)
+	if len(number_of_servers) == 0:
+		return eps_radix, num_pods
+	# Radices of either parity, of which each design point only considers those of the parity of its fattree_eps_radix.
+	candidate_radices = np.arange(fattree_eps_radix.min(), 10 * fattree_eps_radix.max(), 1 if np.any(fattree_eps_radix % 2 != fattree_eps_radix[0] % 2) else 2)
+	rows_per_block = max(1, max_block_elements // max(1, len(candidate_radices)))
+	for start in range(0, len(number_of_servers), rows_per_block):
+		rows = slice(start, start + rows_per_block)
+		k = candidate_radices[None, :]
+		ntors_per_pod = k // 2
+		num_servers_per_pod = ntors_per_pod * k // 2
+		num_uplinks_per_pod = (ntors_per_pod * (k // 2) * oversubscription_denominator[rows, None]) // oversubscription_numerator[rows, None]
+		block_num_pods = _compute_num_pods(number_of_servers[rows, None], num_servers_per_pod)
+		in_range = (k >= fattree_eps_radix[rows, None]) & (k < 10 * fattree_eps_radix[rows, None]) & (k % 2 == fattree_eps_radix[rows, None] % 2)
+		feasible = in_range & (num_uplinks_per_pod > block_num_pods * per_pod_pair_link_multiplicity[rows, None])
+		first = np.argmax(feasible, axis=1)
+		found = feasible[np.arange(len(first)), first]
+		eps_radix[rows] = np.where(found, candidate_radices[first], 0)
+		num_pods[rows] = np.where(found, block_num_pods[np.arange(len(first)), first], 0)
+	return eps_radix, num_pods
+
+# Given arrays of pod ToR eps radices, computes the radix of the aggregation switches (the ToR radix or one of
+# AGGREGATION_SWITCH_RADICES) that minimizes the power of the aggregation layer of a pod, and the number of aggregation
+# switches per pod, element-wise. Ties go to the ToR radix, then to the earlier candidate.
+def minimize_aggregation_layer_power_for_pod_reconfigurable(eps_radix, oversubscription_numerator=1, oversubscription_denominator=1, model=None):
+	model = model if model is not None else power_models.get_power_model()
+	eps_radix, oversubscription_numerator, oversubscription_denominator = np.broadcast_arrays(np.asarray(eps_radix, dtype=np.int64), np.asarray(oversubscription_numerator, dtype=np.int64), np.asarray(oversubscription_denominator, dtype=np.int64))
+	total_uplinks_per_pod = (((eps_radix // 2) ** 2) * oversubscription_denominator) // oversubscription_numerator
+	total_aggregation_ports = ((eps_radix // 2) ** 2 + total_uplinks_per_pod)[..., None]
+	aggregation_radices = np.concatenate((eps_radix[..., None], np.broadcast_to(np.array(AGGREGATION_SWITCH_RADICES, dtype=np.int64), eps_radix.shape + (len(AGGREGATION_SWITCH_RADICES),))), axis=-1)
+	num_aggregation_switches = -(-total_aggregation_ports // aggregation_radices)
+	best = np.argmin(num_aggregation_switches * model.get_eps_power(aggregation_radices), axis=-1)[..., None]
+	return np.take_along_axis(aggregation_radices, best, axis=-1)[..., 0], np.take_along_axis(num_aggregation_switches, best, axis=-1)[..., 0]
+
+# Given arrays of target sizes in number of servers, finds the smallest eps radix in [fattree_radix, max_eps_radix] of a
+# mesh pod-reconfigurable network whose inter-pod graph is dense, i.e. per_pod_pair_link_multiplicity * (num_pods - 1)
+# is below the number of uplinks per pod. k / 2 of the links of each ToR go to servers, and the ceil(k / 4) + 1 ToRs of a
+# pod form a full mesh. Returns the arrays (eps_radix, num_pods, num_tors_per_pod, num_uplinks_per_pod), which are 0 where
+# no radix qualifies.
+def mesh_pod_designer(fattree_radix, target_total_servers, per_pod_pair_link_multiplicity=2, max_eps_radix=128):
+	fattree_radix, target_total_servers, per_pod_pair_link_multiplicity = [x.ravel() for x in np.broadcast_arrays(np.asarray(fattree_radix, dtype=np.int64), np.asarray(target_total_servers, dtype=np.int64), np.asarray(per_pod_pair_link_multiplicity))]
+	results = [np.zeros(len(fattree_radix), dtype=np.int64) for _ in range(4)]
+	if len(fattree_radix) == 0:
+		return tuple(results)
+	k = np.arange(fattree_radix.min(), max_eps_radix + 1, 1 if np.any(fattree_radix % 2 != fattree_radix[0] % 2) else 2)[None, :]
+	num_servers_per_tor = k // 2
+	num_tors_per_pod = (k + 3) // 4 + 1
+	num_interpod_links_per_tor = k - num_servers_per_tor - (num_tors_per_pod - 1)
+	num_uplinks_per_pod = num_interpod_links_per_tor * num_tors_per_pod
+	num_pods = _compute_num_pods(target_total_servers[:, None], num_tors_per_pod * num_servers_per_tor)
+	in_range = (k >= fattree_radix[:, None]) & (k % 2 == fattree_radix[:, None] % 2)
+	feasible = in_range & (per_pod_pair_link_multiplicity[:, None] * (num_pods - 1) < num_uplinks_per_pod)
+	first = np.argmax(feasible, axis=1)
+	found = feasible[np.arange(len(first)), first]
+	for result, values in zip(results, np.broadcast_arrays(k, num_pods, num_tors_per_pod, num_uplinks_per_pod)):
+		result[found] = values[np.arange(len(first)), first][found]
+	return tuple(results)
+
+## Vectorized power evaluation of each topology family. Each takes flat arrays of the parameter columns of its design
+## points and returns a dict of result columns, following the designs of power_analysis.small_medium_sized_analysis.
+## Every EPS draws eps_power_scaling * model.get_eps_power(radix), every OCS of model.ocs_radix ports model.ocs_power_w,
+## and every transceiver model.transceiver_power_w, where the number of transceivers is transceiver_scaling times the
+## number of EPS ports.
+# Fat tree with the fewest levels (at least 2) of fattree_radix switches that holds 0.95 * target_num_servers servers.
+def compute_fattree_power(params, model, max_levels=16, **_):
+	radix, target_num_servers = params["fattree_radix"], params["target_num_servers"]
+	levels = np.full(len(radix), 2, dtype=np.int64)
+	# Sizes in float64, since only the comparison with the target matters.
+	for _ in range(max_levels - 2):
+		levels += (2 * (radix // 2).astype(np.float64) ** levels < np.floor(0.95 * target_num_servers)).astype(np.int64)
+	num_eps = (2 * levels - 1) * (radix // 2) ** (levels - 1)
+	return dict(feasible=np.ones(len(radix), dtype=bool),
+				eps_radix=radix,
+				num_servers=2 * (radix // 2) ** levels,
+				num_eps=num_eps,
+				num_transceivers=params["transceiver_scaling"] * num_eps * radix,
+				eps_power_w=params["eps_power_scaling"] * num_eps * model.get_eps_power(radix))
+
+# 2-tier pod-reconfigurable network, with the smallest feasible pod ToR radix and the aggregation radix minimizing power.
+def compute_pod_tiered_power(params, model, pod_tiered_link_multiplicity=1, max_block_elements=1 << 22, **_):
+	eps_radix, num_pods = find_needed_eps_radix_for_pod_reconfigurable_with_target_size(params["target_num_servers"], params["fattree_radix"], pod_tiered_link_multiplicity, params["oversubscription_numerator"], params["oversubscription_denominator"], max_block_elements)
+	feasible = eps_radix > 0
+	tor_radix = np.where(feasible, eps_radix, 2)
+	aggregation_radix, num_aggregation_switches_per_pod = minimize_aggregation_layer_power_for_pod_reconfigurable(tor_radix, params["oversubscription_numerator"], params["oversubscription_denominator"], model)
+	ntors_per_pod = eps_radix // 2
+	total_uplinks_per_pod = (((eps_radix // 2) ** 2) * params["oversubscription_denominator"]) // params["oversubscription_numerator"]
+	aggregation_radix, num_aggregation_switches_per_pod = aggregation_radix * feasible, num_aggregation_switches_per_pod * feasible
+	return dict(feasible=feasible,
+				eps_radix=eps_radix,
+				aggregation_radix=aggregation_radix,
+				num_servers=num_pods * ntors_per_pod * (eps_radix // 2),
+				num_eps=num_pods * (ntors_per_pod + num_aggregation_switches_per_pod),
+				num_ocs=-(-num_pods * total_uplinks_per_pod // model.ocs_radix),
+				num_transceivers=params["transceiver_scaling"] * num_pods * (num_aggregation_switches_per_pod * aggregation_radix + ntors_per_pod * eps_radix),
+				eps_power_w=params["eps_power_scaling"] * num_pods * (ntors_per_pod * model.get_eps_power(eps_radix) + num_aggregation_switches_per_pod * model.get_eps_power(aggregation_radix)))
+
+# Mesh pod-reconfigurable network, with the smallest eps radix giving a dense inter-pod graph.
+def compute_pod_mesh_power(params, model, pod_mesh_link_multiplicity=2, max_mesh_eps_radix=128, **_):
+	eps_radix, num_pods, num_tors_per_pod, num_uplinks_per_pod = mesh_pod_designer(params["fattree_radix"], params["target_num_servers"], pod_mesh_link_multiplicity, max_mesh_eps_radix)
+	num_eps = num_pods * num_tors_per_pod
+	return dict(feasible=eps_radix > 0,
+				eps_radix=eps_radix,
+				num_servers=num_eps * (eps_radix // 2),
+				num_eps=num_eps,
+				num_ocs=-(-num_pods * num_uplinks_per_pod // model.ocs_radix),
+				num_transceivers=params["transceiver_scaling"] * num_eps * eps_radix,
+				eps_power_w=params["eps_power_scaling"] * num_eps * model.get_eps_power(eps_radix))
+
+# Flat ToR-reconfigurable network, with the smallest eps radix whose Moore bound at flat_diameter holds the target.
+def compute_tor_reconfigurable_power(params, model, flat_diameter=2, **_):
+	target_num_servers = params["target_num_servers"]
+	eps_radix = find_needed_eps_radix_from_moore_bound_with_target_size(target_num_servers, flat_diameter)
+	num_eps = -(-target_num_servers // (eps_radix // 2))
+	return dict(feasible=np.ones(len(eps_radix), dtype=bool),
+				eps_radix=eps_radix,
+				num_servers=num_eps * (eps_radix // 2),
+				num_eps=num_eps,
+				num_ocs=-(-num_eps * (eps_radix // 2) // model.ocs_radix),
+				num_transceivers=params["transceiver_scaling"] * num_eps * eps_radix,
+				eps_power_w=params["eps_power_scaling"] * num_eps * model.get_eps_power(eps_radix))
+
+# Flat static expander, the ToR-reconfigurable network without the OCS layer.
+def compute_expander_power(params, model, **kwargs):
+	results = compute_tor_reconfigurable_power(params, model, **kwargs)
+	results["num_ocs"] = np.zeros(len(results["num_eps"]), dtype=np.int64)
+	return results
+
+POWER_EVALUATORS = {
+	"expander" : compute_expander_power,
+	"tor_reconfigurable" : compute_tor_reconfigurable_power,
+	"pod_mesh" : compute_pod_mesh_power,
+	"pod_tiered" : compute_pod_tiered_power,
+	"ft" : compute_fattree_power,
+}
+
+## Sweep engine.
+# Evaluates the power of the topologies over the grid target_num_servers x fattree_radices x eps_power_scalings x
+# transceiver_scalings, and also x oversubscription_ratios for pod_tiered, whose (numerator, denominator) ratios only
+# apply to it, with the given power_models.PowerModel (by default power_models.get_power_model()). Returns the power table as a structured array of dtype POWER_TABLE_DTYPE, with the rows of each topology in
+# grid order, target_num_servers varying fastest, so that every power-vs-scale curve is a contiguous run of rows.
+# The remaining keyword arguments are passed on to the evaluators:
+#	flat_diameter: diameter of the Moore bound sizing the expander and ToR-reconfigurable networks
+#	pod_tiered_link_multiplicity, pod_mesh_link_multiplicity: number of uplinks needed per pod pair
+#	max_mesh_eps_radix: largest eps radix considered for the mesh pods
+#	max_block_elements: largest number of (design point, candidate radix) pairs evaluated at once
+def sweep_power(target_num_servers, fattree_radices=(32,), oversubscription_ratios=((1, 1),), eps_power_scalings=(1.,), transceiver_scalings=(1.,), topologies=TOPOLOGY_NAMES, model=None, **kwargs):
+	model = model if model is not None else power_models.get_power_model()
+	tables = []
+	for topology in topologies:
+		if topology not in POWER_EVALUATORS:
+			raise ValueError("Unknown topology: {}".format(topology))
+		if topology == "pod_tiered":
+			ratios = np.asarray(oversubscription_ratios, dtype=np.int64).reshape(-1, 2)
+		else:
+			ratios = np.zeros((1, 2), dtype=np.int64)
+		grid = _build_grid(("fattree_radix", fattree_radices, np.int64), ("oversubscription_id", np.arange(len(ratios)), np.int64), ("eps_power_scaling", eps_power_scalings, np.float64), ("transceiver_scaling", transceiver_scalings, np.float64), ("target_num_servers", target_num_servers, np.int64))
+		grid["oversubscription_numerator"] = ratios[grid["oversubscription_id"], 0]
+		grid["oversubscription_denominator"] = ratios[grid["oversubscription_id"], 1]
+		table = np.zeros(len(grid["target_num_servers"]), dtype=POWER_TABLE_DTYPE)
+		table["topology"] = topology
+		for column, _ in POWER_PARAMETER_COLUMNS:
+			table[column] = grid[column]
+		if len(table) > 0:
+			results = POWER_EVALUATORS[topology](grid, model, **kwargs)
+			for column in results:
+				table[column] = results[column]
+			table["ocs_power_w"] = table["num_ocs"] * float(model.ocs_power_w)
+			table["transceiver_power_w"] = table["num_transceivers"] * float(model.transceiver_power_w)
+			table["total_power_w"] = table["eps_power_w"] + table["ocs_power_w"] + table["transceiver_power_w"]
+			for column in ("eps_power_w", "ocs_power_w", "transceiver_power_w", "total_power_w"):
+				table[column][~table["feasible"]] = np.nan
+		tables.append(table)
+	if not tables:
+		return np.zeros(0, dtype=POWER_TABLE_DTYPE)
+	return np.concatenate(tables)
+
+# Returns the rows of the power table matching all of the given column values, e.g.
+# select_power_points(table, topology="ft", fattree_radix=32).
+def select_power_points(table, **column_values):
+	mask = np.ones(len(table), dtype=bool)
+	for column in column_values:
+		mask &= table[column] == column_values[column]
+	return table[mask]
+
+# Writes the power table to a CSV file, with a header row of column names.
+def write_power_csv(table, filename):
+	with open(filename, "w+") as f:
+		f.write(",".join(table.dtype.names) + "\n")
+		columns = [table[column].astype(str) for column in table.dtype.names]
+		for row in zip(*columns):
+			f.write(",".join(row) + "\n")
+	return
+
+# Builds the cartesian product of the (name, values, dtype) parameters, as a dict of flat arrays in which the last
+# parameter varies fastest.
+def _build_grid(*parameter_values):
+	mesh = np.meshgrid(*[np.asarray(values, dtype=dtype) for _, values, dtype in parameter_values], indexing="ij")
+	return dict((name, values.ravel()) for (name, _, _), values in zip(parameter_values, mesh))
+
+if __name__ == "__main__":
+	# Power-vs-scale curves from 1000 to 1000000 servers.
+	target_num_servers = np.unique(np.round(np.logspace(3, 6, 400)).astype(np.int64))
+	table = sweep_power(target_num_servers, fattree_radices=(16, 32, 64), oversubscription_ratios=((1, 1), (4, 1)))
+	write_power_csv(table, "power_sweep.csv")
+	print("Wrote {} design points to power_sweep.csv".format(len(table)))
@@ -0,0 +1,322 @@
+'''
+Vectorized design-space sweep over the network designers of scale_analysis.
+Every designer is evaluated over a whole grid of parameters at once with NumPy, and the results are collected into a
+single tidy table (a structured array with one row per design point), which can be written out as CSV.
+All arithmetic is integer. The designers take the dtype of their computation: np.int64 is fast, and the sweep checks that
+no value outgrows it; object arrays of Python integers are exact at any size (e.g. radix 1024 at diameter 6), at a
+fraction of the speed; float64 gives the magnitudes, and is used for the int64 range check.
+'''
+import numpy as np
+
+# Columns of the design-space table. Parameters a topology does not use are set to 0.
+DESIGN_SPACE_PARAMETER_COLUMNS = ["tor_num_uplinks", "eps_radix", "diameter", "num_dimensions", "oversubscription_numerator", "oversubscription_denominator", "levels"]
+DESIGN_SPACE_RESULT_COLUMNS = ["max_num_servers", "ocs_radix", "num_electrical_ports", "num_optical_ports"]
+
+# Returns the dtype of the design-space table, whose result columns hold Python integers if exact is set.
+def get_design_space_dtype(exact=False):
+	result_dtype = object if exact else np.int64
+	return np.dtype([("topology", "U16")] + [(column, np.int64) for column in DESIGN_SPACE_PARAMETER_COLUMNS] + [(column, result_dtype) for column in DESIGN_SPACE_RESULT_COLUMNS])
+
+DESIGN_SPACE_DTYPE = get_design_space_dtype()
+
+TOPOLOGY_NAMES = ["trn", "prn_2tiered", "prn_mesh", "dragonfly", "clos"]
+
+# Values of the int64 computation at or above this magnitude are treated as overflowing, leaving room for the float64
+# rounding of the range check.
+INT64_SAFE_LIMIT = 2 ** 62
+
+# Computes the maximum number of nodes we can support given a node degree and a diameter, element-wise.
+# The bound 1 + d * ((d - 1)^D - 1) / (d - 2) is evaluated as 1 + d * sum_{i < D} (d - 1)^i, which is exact in integers and
+# also gives 2 * D + 1 for d = 2. Degrees below 2 yield -1, like scale_analysis.compute_moore_bound.
+def compute_moore_bound(node_degree, diameter, dtype=np.int64):
+	node_degree, diameter = np.broadcast_arrays(_as_array(node_degree, dtype), np.asarray(diameter, dtype=np.int64))
+	# Horner's scheme for the geometric sum, one step per hop up to the largest diameter.
+	geometric_sum = _as_array(np.zeros(node_degree.shape), dtype)
+	max_diameter = int(diameter.max()) if diameter.size > 0 else 0
+	for hop in range(max_diameter):
+		geometric_sum = np.where(hop < diameter, geometric_sum * (node_degree - 1) + 1, geometric_sum)
+	return np.where(node_degree >= 2, 1 + node_degree * geometric_sum, -1)
+
+# Per ToR number of inter-pod links maximizing the number of pod uplinks (per_node_degree - n + 1) * n of a mesh pod, and
+# that number of pod uplinks, element-wise. The product is a concave parabola in n with its vertex at (per_node_degree + 1) / 2,
+# so the integer optimum is the nearest integer below or at it.
+def maximize_mesh_pod_degree(per_node_degree, dtype=np.int64):
+	per_node_degree = _as_array(per_node_degree, dtype)
+	per_tor_inter_pod_links = (per_node_degree + 1) // 2
+	return per_tor_inter_pod_links, (per_node_degree - per_tor_inter_pod_links + 1) * per_tor_inter_pod_links
+
+## Vectorized designers. Each takes broadcastable arrays of parameters and returns the arrays
+## (max_num_servers, ocs_radix, num_electrical_ports, num_optical_ports), which are 0 where tor_num_uplinks is 0.
+## They follow the scalar designers of the same name in scale_analysis.
+def tor_reconfigurable_network_designer(tor_num_uplinks, tor_level_diameter, num_dimensions=1, dtype=np.int64):
+	tor_num_uplinks, num_dimensions = np.broadcast_arrays(_as_array(tor_num_uplinks, dtype), _as_array(num_dimensions, dtype))
+	num_dimensions = np.maximum(np.minimum(tor_num_uplinks, num_dimensions), 1)
+	# The first leftover dimensions get one more uplink than the others.
+	per_dimension_num_uplinks = tor_num_uplinks // num_dimensions
+	leftover = tor_num_uplinks % num_dimensions
+	num_tors_in_larger_dim = compute_moore_bound(per_dimension_num_uplinks + 1, tor_level_diameter, dtype=dtype)
+	num_tors_in_smaller_dim = compute_moore_bound(per_dimension_num_uplinks, tor_level_diameter, dtype=dtype)
+	total_tors = num_tors_in_larger_dim ** leftover * num_tors_in_smaller_dim ** (num_dimensions - leftover)
+	max_ocs_radix = np.where(leftover > 0, np.maximum(num_tors_in_larger_dim, num_tors_in_smaller_dim), np.maximum(num_tors_in_smaller_dim, 0))
+	return _mask_zero_uplinks(tor_num_uplinks, total_tors * tor_num_uplinks, max_ocs_radix, total_tors * (2 * tor_num_uplinks), total_tors * tor_num_uplinks)
+
+def twotiered_pod_reconfigurable_network_designer(tor_num_uplinks, pod_level_diameter, oversubscription_numerator=1, oversubscription_denominator=1, dtype=np.int64):
+	tor_num_uplinks, oversubscription_numerator, oversubscription_denominator = np.broadcast_arrays(*[_as_array(x, dtype) for x in (tor_num_uplinks, oversubscription_numerator, oversubscription_denominator)])
+	num_tors_per_pod = tor_num_uplinks
+	fraction_of_northbound_links_per_pod = np.asarray(oversubscription_denominator, dtype=np.float64) * 2. / np.asarray(oversubscription_numerator + oversubscription_denominator, dtype=np.float64)
+	assert(np.all((fraction_of_northbound_links_per_pod <= 1) & (fraction_of_northbound_links_per_pod > 0)))
+	# The northbound fraction of the pod links, rounded down in integers.
+	num_uplinks_per_pod = (2 * oversubscription_denominator * tor_num_uplinks * num_tors_per_pod) // (oversubscription_numerator + oversubscription_denominator)
+	max_pods = compute_moore_bound(num_uplinks_per_pod, pod_level_diameter, dtype=dtype)
+	max_num_servers = tor_num_uplinks * (max_pods * num_tors_per_pod)
+	num_electrical_ports = max_pods * (num_tors_per_pod * 2 * (2 * tor_num_uplinks))
+	num_optical_ports = max_pods * num_uplinks_per_pod
+	return _mask_zero_uplinks(tor_num_uplinks, max_num_servers, max_pods, num_electrical_ports, num_optical_ports)
+
+# Design points where a ToR has no intra-pod links left (tor_num_uplinks = 1) are not valid meshes, and are reported as 0.
+def mesh_pod_reconfigurable_network_designer(tor_num_uplinks, pod_level_diameter, dtype=np.int64):
+	tor_num_uplinks = _as_array(tor_num_uplinks, dtype)
+	per_tor_inter_pod_links, pod_num_uplink = maximize_mesh_pod_degree(tor_num_uplinks, dtype=dtype)
+	per_tor_intra_pod_links = tor_num_uplinks - per_tor_inter_pod_links
+	num_pods = compute_moore_bound(pod_num_uplink, pod_level_diameter, dtype=dtype)
+	max_num_servers = num_pods * (per_tor_intra_pod_links + 1) * tor_num_uplinks
+	num_electrical_ports = (per_tor_intra_pod_links + tor_num_uplinks) * num_pods
+	num_ocs_ports = num_pods * (per_tor_intra_pod_links + 1) * per_tor_inter_pod_links
+	valid_uplinks = np.where(per_tor_intra_pod_links > 0, tor_num_uplinks, 0)
+	return _mask_zero_uplinks(valid_uplinks, max_num_servers, num_pods, num_electrical_ports, num_ocs_ports)
+
+def dragonfly_network_designer(switch_num_uplinks, pod_level_diameter=1, dtype=np.int64):
+	switch_num_uplinks = _as_array(switch_num_uplinks, dtype)
+	group_size = switch_num_uplinks
+	num_groups = group_size + 1
+	max_num_servers = num_groups * group_size * switch_num_uplinks
+	num_electrical_ports = num_groups * group_size * (2 * switch_num_uplinks)
+	return max_num_servers, num_groups, num_electrical_ports, _as_array(np.zeros(switch_num_uplinks.shape), dtype)
+
+def fully_subscribed_clos_designer(tor_num_uplinks, levels, dtype=np.int64):
+	tor_num_uplinks, levels = np.broadcast_arrays(_as_array(tor_num_uplinks, dtype), _as_array(levels, dtype))
+	max_num_servers = 2 * (tor_num_uplinks ** levels)
+	total_switches = (2 * levels - 1) * tor_num_uplinks ** (levels - 1)
+	zeros = _as_array(np.zeros(tor_num_uplinks.shape), dtype)
+	return _mask_zero_uplinks(tor_num_uplinks, max_num_servers, zeros, total_switches * tor_num_uplinks * 2, zeros)
+
+# Zeroes out the results of the design points without uplinks.
+def _mask_zero_uplinks(tor_num_uplinks, *results):
+	return tuple(np.where(tor_num_uplinks > 0, result, 0) for result in results)
+
+# Converts integer parameters to an array of the given dtype, where object arrays hold Python integers.
+def _as_array(values, dtype):
+	if dtype is object:
+		return np.asarray(values, dtype=np.int64).astype(object)
+	return np.asarray(values, dtype=dtype)
+
+## Sweep engine.
+# Evaluates the designers named in topologies over the full grid of their parameters, and returns the design-space table
+# as a structured array of dtype get_design_space_dtype(exact), with the rows of each topology in grid order, tor_num_uplinks
+# varying fastest.
+#	trn: tor_num_uplinks x diameters x num_dimensions
+#	prn_2tiered: tor_num_uplinks x diameters x oversubscription_ratios
+#	prn_mesh: tor_num_uplinks x diameters
+#	dragonfly: tor_num_uplinks
+#	clos: tor_num_uplinks x clos_levels
+# With exact unset, the results are computed in int64, and an OverflowError is raised if any of them would not fit;
+# with exact set, they are Python integers.
+def sweep_design_space(tor_num_uplinks, diameters=(1,), num_dimensions=(1,), oversubscription_ratios=((1, 1),), clos_levels=(3,), topologies=TOPOLOGY_NAMES, exact=False):
+	table_dtype = get_design_space_dtype(exact)
+	tables = []
+	for topology in topologies:
+		if topology == "trn":
+			grid = build_grid(("diameter", diameters), ("num_dimensions", num_dimensions), ("tor_num_uplinks", tor_num_uplinks))
+			designer, arguments = tor_reconfigurable_network_designer, (grid["tor_num_uplinks"], grid["diameter"], grid["num_dimensions"])
+		elif topology == "prn_2tiered":
+			oversubscription_ratios = np.asarray(oversubscription_ratios, dtype=np.int64).reshape(-1, 2)
+			grid = build_grid(("diameter", diameters), ("oversubscription_id", np.arange(len(oversubscription_ratios))), ("tor_num_uplinks", tor_num_uplinks))
+			grid["oversubscription_numerator"] = oversubscription_ratios[grid["oversubscription_id"], 0]
+			grid["oversubscription_denominator"] = oversubscription_ratios[grid["oversubscription_id"], 1]
+			designer, arguments = twotiered_pod_reconfigurable_network_designer, (grid["tor_num_uplinks"], grid["diameter"], grid["oversubscription_numerator"], grid["oversubscription_denominator"])
+		elif topology == "prn_mesh":
+			grid = build_grid(("diameter", diameters), ("tor_num_uplinks", tor_num_uplinks))
+			designer, arguments = mesh_pod_reconfigurable_network_designer, (grid["tor_num_uplinks"], grid["diameter"])
+		elif topology == "dragonfly":
+			grid = build_grid(("diameter", (1,)), ("tor_num_uplinks", tor_num_uplinks))
+			designer, arguments = dragonfly_network_designer, (grid["tor_num_uplinks"], grid["diameter"])
+		elif topology == "clos":
+			grid = build_grid(("levels", clos_levels), ("tor_num_uplinks", tor_num_uplinks))
+			designer, arguments = fully_subscribed_clos_designer, (grid["tor_num_uplinks"], grid["levels"])
+		else:
+			raise ValueError("Unknown topology: {}".format(topology))
+		if exact:
+			results = designer(*arguments, dtype=object)
+		else:
+			# The float64 magnitudes tell whether any int64 result wrapped around.
+			for result in designer(*arguments, dtype=np.float64):
+				if np.any(np.abs(result) >= INT64_SAFE_LIMIT):
+					raise OverflowError("{} design points exceed the int64 range, sweep them with exact=True".format(topology))
+			results = designer(*arguments, dtype=np.int64)
+		table = np.zeros(len(grid["tor_num_uplinks"]), dtype=table_dtype)
+		table["topology"] = topology
+		table["eps_radix"] = 2 * grid["tor_num_uplinks"]
+		for column in grid:
+			if column in table_dtype.names:
+				table[column] = grid[column]
+		for column, result in zip(DESIGN_SPACE_RESULT_COLUMNS, results):
+			table[column] = result
+		tables.append(table)
+	if not tables:
+		return np.zeros(0, dtype=table_dtype)
+	return np.concatenate(tables)
+
+# Returns the rows of the design-space table matching all of the given column values, e.g.
+# select_design_points(table, topology="trn", diameter=2).
+def select_design_points(table, **column_values):
+	mask = np.ones(len(table), dtype=bool)
+	for column in column_values:
+		mask &= table[column] == column_values[column]
+	return table[mask]
+
+# Writes the design-space table to a CSV file, with a header row of column names.
+def write_design_space_csv(table, filename):
+	with open(filename, "w+") as f:
+		f.write(",".join(table.dtype.names) + "\n")
+		columns = [table[column].astype(str) for column in table.dtype.names]
+		for row in zip(*columns):
+			f.write(",".join(row) + "\n")
+	return
+
+# Builds the cartesian product of the (name, values) or (name, values, dtype) parameters, as a dict of flat arrays in which
+# the last parameter varies fastest. The values are int64 unless a dtype is given. Also used by the power sweep.
+def build_grid(*parameters):
+	names = [parameter[0] for parameter in parameters]
+	mesh = np.meshgrid(*[np.asarray(parameter[1], dtype=parameter[2] if len(parameter) > 2 else np.int64) for parameter in parameters], indexing="ij")
+	return dict((name, values.ravel()) for name, values in zip(names, mesh))
+
+## Pinned results.
+# Network sizes of the scalability figure (eps radices 16 to 128) and of radix-1024 ToR-reconfigurable networks at diameters
+# 3 and 6, as computed by the scalar designers of scale_analysis with Python 2 integer semantics. Each entry is
+# (topology, tor_num_uplinks, diameter, num_dimensions, oversubscription_numerator, oversubscription_denominator, levels, max_num_servers).
+PINNED_DESIGN_POINTS = [
+	("trn", 8, 2, 1, 0, 0, 0, 520),
+	("trn", 8, 1, 2, 0, 0, 0, 200),
+	("prn_mesh", 8, 1, 0, 0, 0, 0, 840),
+	("prn_2tiered", 8, 1, 0, 1, 1, 0, 4160),
+	("prn_2tiered", 8, 1, 0, 4, 1, 0, 1664),
+	("dragonfly", 8, 1, 0, 0, 0, 0, 576),
+	("clos", 8, 0, 0, 0, 0, 3, 1024),
+	("clos", 8, 0, 0, 0, 0, 4, 8192),
+	("trn", 16, 2, 1, 0, 0, 0, 4112),
+	("trn", 16, 1, 2, 0, 0, 0, 1296),
+	("prn_mesh", 16, 1, 0, 0, 0, 0, 10512),
+	("prn_2tiered", 16, 1, 0, 1, 1, 0, 65792),
+	("prn_2tiered", 16, 1, 0, 4, 1, 0, 26368),
+	("dragonfly", 16, 1, 0, 0, 0, 0, 4352),
+	("clos", 16, 0, 0, 0, 0, 3, 8192),
+	("clos", 16, 0, 0, 0, 0, 4, 131072),
+	("trn", 32, 2, 1, 0, 0, 0, 32800),
+	("trn", 32, 1, 2, 0, 0, 0, 9248),
+	("prn_mesh", 32, 1, 0, 0, 0, 0, 148512),
+	("prn_2tiered", 32, 1, 0, 1, 1, 0, 1049600),
+	("prn_2tiered", 32, 1, 0, 4, 1, 0, 419840),
+	("dragonfly", 32, 1, 0, 0, 0, 0, 33792),
+	("clos", 32, 0, 0, 0, 0, 3, 65536),
+	("clos", 32, 0, 0, 0, 0, 4, 2097152),
+	("trn", 64, 2, 1, 0, 0, 0, 262208),
+	("trn", 64, 1, 2, 0, 0, 0, 69696),
+	("prn_mesh", 64, 1, 0, 0, 0, 0, 2232384),
+	("prn_2tiered", 64, 1, 0, 1, 1, 0, 16781312),
+	("prn_2tiered", 64, 1, 0, 4, 1, 0, 6713344),
+	("dragonfly", 64, 1, 0, 0, 0, 0, 266240),
+	("clos", 64, 0, 0, 0, 0, 3, 524288),
+	("clos", 64, 0, 0, 0, 0, 4, 33554432),
+	("trn", 512, 3, 1, 0, 0, 0, 68585521664),
+	("trn", 512, 3, 3, 0, 0, 0, 61799085884601080035328),
+	("trn", 512, 6, 1, 0, 0, 0, 9151560321507262976),
+	("trn", 512, 6, 3, 0, 0, 0, 7200053051345862515608851150240732601837568),
+]
+
+# Checks that the sweep reproduces every pinned design point exactly, and returns the number of points checked.
+def verify_pinned_design_points(pinned_design_points=PINNED_DESIGN_POINTS):
+	for topology, tor_num_uplinks, diameter, num_dimensions, oversubscription_numerator, oversubscription_denominator, levels, max_num_servers in pinned_design_points:
+		table = sweep_design_space([tor_num_uplinks], diameters=[diameter], num_dimensions=[num_dimensions], oversubscription_ratios=[(oversubscription_numerator, oversubscription_denominator)], clos_levels=[levels], topologies=[topology], exact=True)
+		assert(len(table) == 1 and table["max_num_servers"][0] == max_num_servers), "{} with {} uplinks per ToR, diameter {}, {} dimensions, {}:{} oversubscription and {} levels: expected {} servers, got {}".format(topology, tor_num_uplinks, diameter, num_dimensions, oversubscription_numerator, oversubscription_denominator, levels, max_num_servers, table["max_num_servers"])
+	return len(pinned_design_points)
+
+## OCS radix scalability.
+# Names of the curves of compute_ocs_scalability_surface, in the order of the legend of scale_analysis.ocs_scalability_analysis.
+OCS_SCALABILITY_TOPOLOGY_NAMES = ["trn_flat", "trn_2d", "prn_mesh", "prn_2tiered_1to1", "prn_2tiered_4to1"]
+
+# Computes the largest number of servers of each topology that OCSes of each radix can support, for each EPS radix, where
+# half the ports of an EPS connect servers and the other half are uplinks. Returns a dict from the names in
+# OCS_SCALABILITY_TOPOLOGY_NAMES to arrays of shape (len(eps_radices), len(ocs_radices)):
+#	trn_flat: ToRs directly attached to the OCSes, with a ToR-level diameter of trn_flat_diameter.
+#	trn_2d: ToRs attached to two dimensions of OCSes, each with half the uplinks and a diameter of trn_2d_diameter.
+#	prn_mesh: pods of a ToRs, fully meshed with h of their uplinks each (a - 1 + h = uplinks), such that the a * h pod
+#			  uplinks reach every other pod, with as many pods as the OCS radix. The curve is made non-decreasing along
+#			  ocs_radices, as a larger OCS can always be used as a smaller one.
+#	prn_2tiered_1to1, prn_2tiered_4to1: two-tiered pods of eps_radix / 2 ToRs, with 1:1 and 4:1 oversubscription.
+# Every entry is a closed-form expression, the smallest feasible h of prn_mesh being the smaller root of the quadratic
+# (uplinks + 1 - h) * h = ocs_radix - 1.
+def compute_ocs_scalability_surface(eps_radices, ocs_radices, trn_flat_diameter=2, trn_2d_diameter=1):
+	eps_radix = np.asarray(eps_radices, dtype=np.int64)[:, np.newaxis]
+	ocs_radix = np.asarray(ocs_radices, dtype=np.int64)[np.newaxis, :]
+	servers_per_tor = eps_radix // 2
+	num_uplinks_per_tor = eps_radix - servers_per_tor
+	surface = {}
+	# ToR flat
+	maximum_tors = compute_moore_bound(num_uplinks_per_tor, trn_flat_diameter)
+	surface["trn_flat"] = np.minimum(ocs_radix, maximum_tors) * servers_per_tor
+	# ToR 2D
+	maximum_tors_per_dim = compute_moore_bound(num_uplinks_per_tor // 2, trn_2d_diameter)
+	surface["trn_2d"] = np.minimum(ocs_radix, maximum_tors_per_dim) ** 2 * servers_per_tor
+	# Mesh pod: the smallest h in [1, uplinks - 1] with (uplinks + 1 - h) * h >= ocs_radix - 1 maximizes a = uplinks + 1 - h.
+	num_required_pod_uplinks = ocs_radix - 1
+	discriminant = np.maximum((num_uplinks_per_tor + 1) ** 2 - 4 * num_required_pod_uplinks, 0)
+	h = np.ceil(((num_uplinks_per_tor + 1) - np.sqrt(discriminant)) / 2.).astype(np.int64)
+	# Correct the rounding of the square root, then restrict h to its range.
+	pod_uplinks = lambda h: (num_uplinks_per_tor + 1 - h) * h
+	h = np.where(pod_uplinks(h - 1) >= num_required_pod_uplinks, h - 1, h)
+	h = np.where(pod_uplinks(h) < num_required_pod_uplinks, h + 1, h)
+	h = np.maximum(h, 1)
+	is_feasible = (h <= num_uplinks_per_tor - 1) & (pod_uplinks(h) >= num_required_pod_uplinks)
+	pod_mesh_num_servers = np.where(is_feasible, ocs_radix * (num_uplinks_per_tor + 1 - h) * servers_per_tor, 0)
+	surface["prn_mesh"] = np.maximum.accumulate(pod_mesh_num_servers, axis=1)
+	# 2-layered pods, no oversubscription and 4:1 oversubscription
+	num_tors_per_pod = eps_radix // 2
+	for name, oversubscription in (("prn_2tiered_1to1", 1), ("prn_2tiered_4to1", 4)):
+		num_uplinks_per_pod = (eps_radix // 2) * num_tors_per_pod // oversubscription
+		num_pods = np.minimum(ocs_radix, num_uplinks_per_pod + 1)
+		surface[name] = num_tors_per_pod * servers_per_tor * num_pods
+	return surface
+
+# Returns, for each topology of an OCS scalability surface, the boolean surface of the (EPS radix, OCS radix) pairs that
+# support at least target_num_servers servers.
+def compute_feasibility_surface(surface, target_num_servers):
+	return dict((name, surface[name] >= target_num_servers) for name in surface)
+
+# For each topology of an OCS scalability surface computed over ocs_radices, returns the smallest OCS radix supporting at least
+# target_num_servers servers for each EPS radix, or -1 where no OCS radix in the range does.
+def compute_minimum_ocs_radix(surface, ocs_radices, target_num_servers):
+	ocs_radices = np.asarray(ocs_radices)
+	minimum_ocs_radix = {}
+	for name, is_feasible in compute_feasibility_surface(surface, target_num_servers).items():
+		# The curves are non-decreasing in the OCS radix, so the first feasible radix is the minimum.
+		minimum_ocs_radix[name] = np.where(is_feasible.any(axis=1), ocs_radices[np.argmax(is_feasible, axis=1)], -1)
+	return minimum_ocs_radix
+
+# Writes an OCS scalability surface to a CSV file, with one (topology, eps_radix, ocs_radix, max_num_servers) row per entry.
+def write_ocs_scalability_surface_csv(surface, eps_radices, ocs_radices, filename):
+	eps_radix, ocs_radix = np.meshgrid(eps_radices, ocs_radices, indexing="ij")
+	with open(filename, "w+") as f:
+		f.write("topology,eps_radix,ocs_radix,max_num_servers\n")
+		for name in OCS_SCALABILITY_TOPOLOGY_NAMES:
+			for row in zip(eps_radix.ravel().tolist(), ocs_radix.ravel().tolist(), surface[name].ravel().tolist()):
+				f.write("{},{},{},{}\n".format(name, *row))
+	return
+
+if __name__ == "__main__":
+	print("Checked {} pinned design points".format(verify_pinned_design_points()))
+	table = sweep_design_space(np.arange(2, 65, 2), diameters=(1, 2, 3), num_dimensions=(1, 2, 3), oversubscription_ratios=((1, 1), (4, 1)), clos_levels=(3, 4))
+	write_design_space_csv(table, "design_space.csv")
+	print("Wrote {} design points to design_space.csv".format(len(table)))
+	eps_radices, ocs_radices = np.arange(8, 129, 4), np.arange(4, 1025, 4)
+	write_ocs_scalability_surface_csv(compute_ocs_scalability_surface(eps_radices, ocs_radices), eps_radices, ocs_radices, "ocs_scalability_surface.csv")
+	print("Wrote the OCS scalability surface to ocs_scalability_surface.csv")
@@ -0,0 +1,120 @@
+'''
+Solvers for the mesh pod degree problem of the pod-reconfigurable mesh designer: given the degree d of a ToR, find the number
+of inter-pod links n per ToR that maximizes the number of pod uplinks (d - n + 1) * n, where the other d - n links
+connect the d - n + 1 ToRs of a pod to each other.
+'''
+import os, sys
+import json
+import numpy as np
+import design_space_sweep
+
+## Backends. Each takes the per ToR node degree and returns (per_tor_inter_pod_links, pod_uplinks). Among equally good
+## solutions, the one with the fewest inter-pod links is returned.
+# Exact, by evaluating the objective at every integer n in [0, d].
+def solve_by_enumeration(per_node_degree):
+	num_inter_pod_links = np.arange(per_node_degree + 1)
+	pod_uplinks = (per_node_degree - num_inter_pod_links + 1) * num_inter_pod_links
+	best = int(np.argmax(pod_uplinks))
+	return best, int(pod_uplinks[best])
+
+# Exact, from the vertex of the parabola (see design_space_sweep.maximize_mesh_pod_degree).
+def solve_in_closed_form(per_node_degree):
+	per_tor_inter_pod_links, pod_uplinks = design_space_sweep.maximize_mesh_pod_degree(per_node_degree)
+	return int(per_tor_inter_pod_links), int(pod_uplinks)
+
+# Solves the continuous relaxation over the fraction delta of inter-pod links with Gurobi, then rounds delta * d to the
+# better of its two neighboring integers. Requires gurobipy and a Gurobi license.
+def solve_with_gurobi(per_node_degree):
+	import gurobipy
+	model = gurobipy.Model("Maximize pod degree given node degree: {}".format(per_node_degree))
+	model.setParam('OutputFlag', False)
+	# Let delta be the fraction of links used for INTER-pod wiring
+	delta = model.addVar(lb=0., ub=1, obj=1, vtype=gurobipy.GRB.CONTINUOUS, name="delta")
+	objective_function = gurobipy.QuadExpr()
+	objective_function.add(delta, mult=per_node_degree ** 2 + per_node_degree)
+	objective_function.add(delta * delta, mult=-per_node_degree ** 2)
+	model.setObjective(objective_function, gurobipy.GRB.MAXIMIZE)
+	model.optimize()
+	delta_val = delta.x
+	n1 = int(np.floor(per_node_degree * delta_val))
+	n2 = int(np.ceil(per_node_degree * delta_val))
+	pod_uplinks_1 = ((per_node_degree - n1) + 1) * n1
+	pod_uplinks_2 = ((per_node_degree - n2) + 1) * n2
+	if pod_uplinks_1 >= pod_uplinks_2:
+		return n1, pod_uplinks_1
+	return n2, pod_uplinks_2
+
+BACKENDS = {
+	"enumeration" : solve_by_enumeration,
+	"closed_form" : solve_in_closed_form,
+	"gurobi" : solve_with_gurobi,
+}
+
+## Memoizing front end to the backends.
+## Solutions are cached by (backend, per_node_degree). If cache_filename is given, the cache is loaded from that JSON file
+## and save() writes it back, so the solutions carry over between runs. Every backend in cross_check_backends is also run
+## on each newly solved input, and must agree with the main backend.
+class MeshPodDegreeSolver(object):
+	def __init__(self, backend="enumeration", cache_filename=None, cross_check_backends=()):
+		assert(backend in BACKENDS and all(x in BACKENDS for x in cross_check_backends))
+		self.backend = backend
+		self.cache_filename = cache_filename
+		self.cross_check_backends = list(cross_check_backends)
+		self.cache = {}
+		if cache_filename is not None and os.path.isfile(cache_filename):
+			with open(cache_filename, "r") as f:
+				self.cache = dict((key, tuple(value)) for key, value in json.load(f).items())
+		return
+
+	# Returns (per_tor_inter_pod_links, pod_uplinks) for the given per ToR node degree.
+	def solve(self, per_node_degree):
+		per_node_degree = int(per_node_degree)
+		assert(per_node_degree >= 0)
+		key = "{},{}".format(self.backend, per_node_degree)
+		if key not in self.cache:
+			solution = BACKENDS[self.backend](per_node_degree)
+			for cross_check_backend in self.cross_check_backends:
+				cross_check_solution = BACKENDS[cross_check_backend](per_node_degree)
+				# Backends may break ties differently, but must reach the same optimum.
+				assert(cross_check_solution[1] == solution[1]), "{} and {} disagree for per_node_degree={}: {} vs {}".format(self.backend, cross_check_backend, per_node_degree, solution, cross_check_solution)
+			self.cache[key] = (int(solution[0]), int(solution[1]))
+		return self.cache[key]
+
+	# Writes the cache to cache_filename, if any.
+	def save(self):
+		if self.cache_filename is None:
+			return
+		temporary_filename = "{}.tmp{}".format(self.cache_filename, os.getpid())
+		with open(temporary_filename, "w+") as f:
+			json.dump(self.cache, f, sort_keys=True)
+		os.rename(temporary_filename, self.cache_filename)
+		return
+
+	def clear_cache(self):
+		self.cache = {}
+		return
+
+# Solver used by maximize_mesh_pod_degree, replace it with set_default_solver to change the backend or enable a persistent cache.
+default_solver = MeshPodDegreeSolver()
+
+def set_default_solver(solver):
+	global default_solver
+	default_solver = solver
+	return
+
+# Returns (per_tor_inter_pod_links, pod_uplinks) for the given per ToR node degree, with the default solver.
+def maximize_mesh_pod_degree(per_node_degree):
+	return default_solver.solve(per_node_degree)
+
+if __name__ == "__main__":
+	# Cross-checks the exact backends, and Gurobi if it is available.
+	backends = ["closed_form"]
+	try:
+		import gurobipy
+		backends.append("gurobi")
+	except ImportError:
+		print("gurobipy is not available, skipping the Gurobi backend")
+	solver = MeshPodDegreeSolver(cross_check_backends=backends)
+	for per_node_degree in range(0, 257):
+		solver.solve(per_node_degree)
+	print("Backends enumeration, {} agree for per_node_degree in [0, 256]".format(", ".join(backends)))
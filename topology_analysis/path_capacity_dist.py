@@ -1,26 +1,56 @@
 import numpy as np
-import scipy.misc
+import scipy.special
+import scipy.stats
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 
+# Link counts up to this value are handled by the matrix product form of the two-hop kernel, larger ones by the min reduction.
+MAX_LINK_COUNT_FOR_MATRIX_PRODUCT = 64
+
+# Computes the direct plus two-hop path capacity between all pairs of nodes, where the capacity of the two-hop path
+# i -> k -> j is min(A[i][k], A[k][j]). topology is either one adjacency matrix of link counts, of shape (n, n), or a stack
+# of them, of shape (num_matrices, n, n), and the result has the same shape, with zeros on the diagonal.
+# Small link counts use sum_k min(a_ik, a_kj) = sum_t sum_k [a_ik >= t] [a_kj >= t], i.e. one matrix product per count
+# level t. Larger counts are reduced directly. Both forms work on blocks of matrices and of rows, so that at most about
+# max_block_elements intermediate values are held in memory, apart from the (n, n) operand of the matrix product.
+def compute_two_hop_path_capacity(topology, max_block_elements=1 << 24):
+	topology = np.asarray(topology)
+	is_single_matrix = topology.ndim == 2
+	if is_single_matrix:
+		topology = topology[np.newaxis]
+	num_matrices, n, _ = topology.shape
+	path_capacity = np.zeros(topology.shape, dtype=np.int64)
+	max_link_count = int(topology.max()) if topology.size > 0 else 0
+	if max_link_count <= MAX_LINK_COUNT_FOR_MATRIX_PRODUCT:
+		num_matrices_per_block = max(1, max_block_elements // (n * n))
+		num_rows_per_block = min(n, max(1, max_block_elements // n))
+		for matrix_start in range(0, num_matrices, num_matrices_per_block):
+			matrix_end = min(matrix_start + num_matrices_per_block, num_matrices)
+			for link_count in range(1, max_link_count + 1):
+				has_link_count = (topology[matrix_start:matrix_end] >= link_count).astype(np.float64)
+				for row_start in range(0, n, num_rows_per_block):
+					row_end = min(row_start + num_rows_per_block, n)
+					path_capacity[matrix_start:matrix_end, row_start:row_end] += np.rint(np.matmul(has_link_count[:, row_start:row_end], has_link_count)).astype(np.int64)
+	else:
+		num_rows_per_block = max(1, max_block_elements // (n * n))
+		for matrix_id in range(num_matrices):
+			for row_start in range(0, n, num_rows_per_block):
+				row_end = min(row_start + num_rows_per_block, n)
+				path_capacity[matrix_id, row_start:row_end] = np.minimum(topology[matrix_id, row_start:row_end, :, np.newaxis], topology[matrix_id, np.newaxis]).sum(axis=1)
+	# The sum above runs over every k, remove the terms k = i and k = j, which are not two-hop paths, and add the direct path.
+	diagonal = np.diagonal(topology, axis1=1, axis2=2)
+	path_capacity -= np.minimum(diagonal[:, :, np.newaxis], topology)
+	path_capacity -= np.minimum(topology, diagonal[:, np.newaxis, :])
+	path_capacity += topology
+	path_capacity[:, np.arange(n), np.arange(n)] = 0
+	if is_single_matrix:
+		return path_capacity[0]
+	return path_capacity
+
+# Computes the interpod path capacity with two hop forwarding.
 def compute_tor_level_connectivity_based_on_pod_level_connectivity(pod_level_graph, num_tors_per_pod):
-	num_pods = len(pod_level_graph)
-	# First, figure out the interpod capacity with two hop forwarding
-	interpod_path_capacity_graph = np.zeros((num_pods, num_pods), dtype=int)
-	for i in range(num_pods):
-		for j in range(num_pods):
-			if i != j:
-				# Figure out how many paths exists between pods i to j within 2 hop counts
-				num_paths = 0
-				# count direct path
-				if pod_level_graph[i][j] > 0:
-					num_paths += pod_level_graph[i][j]
-				# now count the indirect paths
-				for k in range(num_pods):
-					if k != i and k != j:
-						num_paths += min(pod_level_graph[i][k], pod_level_graph[k][j])
-				interpod_path_capacity_graph[i][j] += num_paths 
-	return 
+	interpod_path_capacity_graph = compute_two_hop_path_capacity(pod_level_graph)
+	return interpod_path_capacity_graph
 
 # Computes ocs_schedule progression type 1.
 def compute_ocs_schedule(num_tors, num_uplinks_per_tor, current_node_offset):
@@ -34,18 +64,15 @@ def compute_ocs_schedule(num_tors, num_uplinks_per_tor, current_node_offset):
 		current_node_offset = max((current_node_offset + 1) % num_tors, 1)
 	return current_schedule
 
+# Computes the direct plus two-hop path capacity from src to dst, in one topology or in each topology of a stack.
 def total_pathways_between_source_and_dest(topology, src, dst):
 	assert(src != dst)
-	n = len(topology)
-	num_paths = 0
-	# First check the direct paths
-	if topology[src][dst] > 0:
-		num_paths = topology[src][dst]
-	for k in range(n):
-		if k != src and k != dst:
-			path_capacity = min(topology[src][k], topology[k][dst])
-			if path_capacity > 0:
-				num_paths += path_capacity
+	topology = np.asarray(topology)
+	n = topology.shape[-1]
+	intermediate = np.ones(n, dtype=bool)
+	intermediate[[src, dst]] = False
+	# First the direct paths, then the paths through every other node.
+	num_paths = topology[..., src, dst] + np.minimum(topology[..., src, intermediate], topology[..., intermediate, dst]).sum(axis=-1)
 	return num_paths
 
 def find_permutation_recur(current_index, placements_so_far, num_points, all_placements):
@@ -75,54 +102,153 @@ def find_all_permutation_matrices(num_points):
 	return all_permutation_matrices
 
 
+# Ratio D(n - 1) / D(n) of the numbers of derangements (permutations without fixed points) of n - 1 and n points.
+# From D(n) = (n - 1) * (D(n - 1) + D(n - 2)), the ratio follows r(n) = 1 / ((n - 1) * (1 + r(n - 1))) with r(2) = 0,
+# which stays finite for any n, unlike D(n) itself.
+def derangement_ratio(num_points):
+	assert(num_points >= 2)
+	ratio = 0.
+	for n in range(3, num_points + 1):
+		ratio = 1. / ((n - 1) * (1. + ratio))
+	return ratio
+
+# Probability that a single random matching between num_points points gives no path of at most two hops between two
+# given distinct points. A path exists if the source is matched to the destination, or to an intermediate point that is
+# itself matched to the destination. The matching is either a uniformly random "permutation", or a uniformly random
+# "derangement", in which no point is matched to itself.
+#	permutation: 1 - 1/n - (n - 2)/(n (n - 1))
+#	derangement: 1 - 1/(n - 1) - D(n - 1)/D(n)
+def compute_zero_capacity_probability(num_points, matching="permutation"):
+	assert(num_points > 2 and matching in ("permutation", "derangement"))
+	n = num_points
+	if matching == "permutation":
+		return 1. - 1. / n - float(n - 2) / (n * (n - 1))
+	return 1. - 1. / (n - 1) - derangement_ratio(n)
+
 # Given the number of points, and the number of edges per point, this function computes all
 # the points along the convex hull of the matrix.
-def compute_interpod_connectivity_pdf(num_points, num_edges_per_point):
-	all_permutation_matrices = find_all_permutation_matrices(num_points)
-	# try to decompose a sum of num_edges_per_point across the number of permutations (num_points!)
-	# do this recursively 
-	# Go through each of the permutation matrices and find out for each permutation mask, what is the interpod capacity
-	pathway_capacity_timeseries = []
-	for permutation_matrix in all_permutation_matrices:
-		path_capacity = np.zeros((num_points, num_points), dtype=int)
-		for i in range(num_points):
-			for j in range(num_points):
-				if i != j:
-					num_pathways = total_pathways_between_source_and_dest(permutation_matrix, i, j)
-					path_capacity[i][j] = num_pathways
-		pathway_capacity_timeseries.append(path_capacity)
-
-	pair = (0, 3)
-	num_zeros = 0
-	# Compute the number of masks such that the path way capacity are zero
-	max_path_capacity = 0
-	for path_capacity_mask in pathway_capacity_timeseries:
-		max_path_capacity = max(max_path_capacity, path_capacity_mask[pair[0]][pair[1]])
-		if path_capacity_mask[pair[0]][pair[1]] == 0:
-			num_zeros += 1
-	zero_pathway_prob = (float(num_zeros) / len(all_permutation_matrices))
-	print("Max path capacity: {}".format(max_path_capacity))
-	print("num zeros: {}".format(num_zeros))
+# Each point has one edge in each of num_edges_per_point independent random matchings, and each matching adds at most one
+# path between two points, so the total path capacity is binomially distributed with the probability that a matching gives
+# a path. This is exact for any number of points.
+def compute_interpod_connectivity_pdf(num_points, num_edges_per_point, matching="permutation"):
+	zero_pathway_prob = compute_zero_capacity_probability(num_points, matching)
 	pdf = []
 	for i in range(num_edges_per_point + 1):
-		prob = scipy.misc.comb(num_edges_per_point, i) * (1 - zero_pathway_prob) ** i * (zero_pathway_prob) ** (num_edges_per_point - i)
+		prob = scipy.special.comb(num_edges_per_point, i) * (1 - zero_pathway_prob) ** i * (zero_pathway_prob) ** (num_edges_per_point - i)
 		pdf.append(prob)
-	print("length of pdf: {}".format(len(pdf)))
 	return np.arange(num_edges_per_point + 1), pdf
 
-def compute_tor_connectivity_pdf(num_tors, num_uplinks_per_tor):
-	tor_connectivity_schedules = []
-	for tor_schedule_offset in range(1, num_tors, 1):
-		schedule = compute_ocs_schedule(num_tors, num_uplinks_per_tor, tor_schedule_offset)
-		tor_connectivity_schedules.append(schedule)
-	tor_pair = (0, 1)
-	tor_pair_connectivity_timeseries = [total_pathways_between_source_and_dest(x, tor_pair[0], tor_pair[1]) for x in tor_connectivity_schedules]
+# Draws num_matchings random matchings between num_points points, as an array of shape (num_matchings, num_points)
+# whose row t maps each point to the point it is matched to in matching t.
+def sample_random_matchings(num_matchings, num_points, random_state, matching="permutation"):
+	matchings = np.argsort(random_state.rand(num_matchings, num_points), axis=1)
+	if matching == "derangement":
+		# Redraw the matchings with fixed points, about 1/e of them are accepted in each round.
+		rejected = np.flatnonzero(np.any(matchings == np.arange(num_points), axis=1))
+		while len(rejected) > 0:
+			matchings[rejected] = np.argsort(random_state.rand(len(rejected), num_points), axis=1)
+			rejected = rejected[np.any(matchings[rejected] == np.arange(num_points), axis=1)]
+	return matchings
+
+# Estimates the path capacity distribution between the points in pair when each point has num_edges_per_point edges,
+# one in each of num_edges_per_point random matchings, by sampling num_samples such topologies. Unlike
+# compute_interpod_connectivity_pdf, two-hop paths may combine edges of different matchings, and the capacity of a two-hop
+# path is the smaller of the link counts of its two hops. Samples are drawn from a RandomState seeded with seed, in
+# chunks of at most samples_per_chunk topologies.
+# Returns the path capacities, their estimated probabilities, and the lower and upper ends of the Wilson score confidence
+# interval of each probability at the given confidence level.
+def sample_interpod_connectivity_pdf(num_points, num_edges_per_point, num_samples=10000, pair=(0, 3), matching="permutation", seed=None, confidence=0.95, samples_per_chunk=None):
+	assert(num_points > 2 and pair[0] != pair[1] and matching in ("permutation", "derangement"))
+	src, dst = pair
+	random_state = np.random.RandomState(seed)
+	if samples_per_chunk is None:
+		samples_per_chunk = max(1, (1 << 22) // (num_edges_per_point * num_points))
+	intermediate = np.ones(num_points, dtype=bool)
+	intermediate[[src, dst]] = False
+	capacities = []
+	for chunk_start in range(0, num_samples, samples_per_chunk):
+		chunk_size = min(samples_per_chunk, num_samples - chunk_start)
+		matchings = sample_random_matchings(chunk_size * num_edges_per_point, num_points, random_state, matching).reshape(chunk_size, num_edges_per_point, num_points)
+		sample_ids = np.arange(chunk_size)[:, np.newaxis]
+		# Link counts from the source to every point, and from every point to the destination.
+		src_links = np.bincount((sample_ids * num_points + matchings[:, :, src]).ravel(), minlength=chunk_size * num_points).reshape(chunk_size, num_points)
+		sample_id, _, point = np.nonzero(matchings == dst)
+		dst_links = np.bincount(sample_id * num_points + point, minlength=chunk_size * num_points).reshape(chunk_size, num_points)
+		capacities.append(src_links[:, dst] + np.minimum(src_links[:, intermediate], dst_links[:, intermediate]).sum(axis=1))
+	capacities = np.concatenate(capacities)
+	counts = np.bincount(capacities)
+	pdf = counts / float(num_samples)
+	# Wilson score interval of each binomial proportion.
+	z = scipy.stats.norm.ppf(0.5 + confidence / 2.)
+	center = (pdf + z * z / (2. * num_samples)) / (1. + z * z / num_samples)
+	half_width = z * np.sqrt(pdf * (1. - pdf) / num_samples + z * z / (4. * num_samples * num_samples)) / (1. + z * z / num_samples)
+	return np.arange(len(counts)), pdf, center - half_width, center + half_width
+
+## OCS rotation schedules.
+# Every slot of the schedule of compute_ocs_schedule connects each ToR i to the ToRs i + offset (mod num_tors), for
+# num_uplinks_per_tor consecutive offsets that skip 0. A slot is thus described by its offset vector, and the capacity
+# between two ToRs only depends on the offset between them, delta = (dst - src) mod num_tors.
+
+# Computes the offset vectors of the num_tors - 1 slots of the rotation schedule, as an array of shape
+# (num_tors - 1, num_offsets), where slot s is the schedule of compute_ocs_schedule(num_tors, num_uplinks_per_tor, s + 1).
+# Offsets that would repeat within a slot are dropped, as they map onto the same circuit.
+def compute_ocs_schedule_offsets(num_tors, num_uplinks_per_tor):
+	assert(num_tors > num_uplinks_per_tor - 1 and num_tors > 1)
+	num_offsets = min(num_uplinks_per_tor, num_tors - 1)
+	first_offsets = np.arange(1, num_tors)
+	return (first_offsets[:, np.newaxis] - 1 + np.arange(num_offsets)) % (num_tors - 1) + 1
+
+# Computes the direct circuits and the direct plus two-hop path capacity of every slot of the rotation schedule, as two
+# arrays of shape (num_tors - 1, num_tors), where entry [slot, delta] is the value between any ToR i and ToR i + delta.
+# The two-hop paths i -> i + a -> i + a + b of a slot are counted by summing its offsets pairwise, so the cost is
+# O(num_uplinks_per_tor^2) per slot instead of the O(num_tors^2) of a dense schedule.
+def compute_ocs_schedule_capacity(num_tors, num_uplinks_per_tor):
+	offsets = compute_ocs_schedule_offsets(num_tors, num_uplinks_per_tor)
+	num_slots, num_offsets = offsets.shape
+	slot_ids = np.arange(num_slots)[:, np.newaxis]
+	direct_circuits = np.zeros((num_slots, num_tors), dtype=np.int64)
+	direct_circuits[slot_ids, offsets] = 1
+	two_hop_offsets = (offsets[:, :, np.newaxis] + offsets[:, np.newaxis, :]) % num_tors
+	two_hop_capacity = np.bincount((slot_ids[:, :, np.newaxis] * num_tors + two_hop_offsets).ravel(), minlength=num_slots * num_tors).reshape(num_slots, num_tors)
+	path_capacity = direct_circuits + two_hop_capacity
+	# Offset 0 is a ToR and itself.
+	path_capacity[:, 0] = 0
+	return direct_circuits, path_capacity
+
+# Computes, for every offset delta, the number of slots a ToR pair (i, i + delta) waits in the worst case until a slot with
+# a direct circuit between them, assuming the schedule repeats cyclically. Pairs with a direct circuit in the current slot
+# wait 0 slots, and pairs that never get a direct circuit (including delta = 0) are marked with -1.
+def compute_worst_case_direct_circuit_wait(num_tors, num_uplinks_per_tor):
+	direct_circuits, _ = compute_ocs_schedule_capacity(num_tors, num_uplinks_per_tor)
+	num_slots = len(direct_circuits)
+	# The index of the next slot with a direct circuit, looking ahead over two rounds of the schedule.
+	slot_ids = np.arange(2 * num_slots)[:, np.newaxis]
+	next_direct_circuit_slot = np.where(np.concatenate((direct_circuits, direct_circuits)) > 0, slot_ids, 3 * num_slots)
+	next_direct_circuit_slot = np.minimum.accumulate(next_direct_circuit_slot[::-1], axis=0)[::-1]
+	worst_case_wait = (next_direct_circuit_slot[:num_slots] - slot_ids[:num_slots]).max(axis=0)
+	worst_case_wait[worst_case_wait >= num_slots] = -1
+	return worst_case_wait
+
+# Expands a per-offset statistic of the rotation schedule into a (num_tors, num_tors) matrix, with entry [src, dst] taken
+# from offset (dst - src) mod num_tors.
+def expand_offset_statistic_to_tor_pairs(offset_statistic):
+	num_tors = len(offset_statistic)
+	tor_ids = np.arange(num_tors)
+	return np.asarray(offset_statistic)[(tor_ids[np.newaxis, :] - tor_ids[:, np.newaxis]) % num_tors]
+
+# Computes the distribution of the path capacity between tor_pair across the slots of the rotation schedule. If tor_pair is
+# None, the distribution is taken over all ordered pairs of distinct ToRs and all slots.
+def compute_tor_connectivity_pdf(num_tors, num_uplinks_per_tor, tor_pair=(0, 1)):
+	_, path_capacity = compute_ocs_schedule_capacity(num_tors, num_uplinks_per_tor)
+	if tor_pair is None:
+		# Every nonzero offset is shared by the same number of ToR pairs.
+		tor_pair_connectivity_timeseries = path_capacity[:, 1:].ravel()
+	else:
+		assert(tor_pair[0] != tor_pair[1])
+		tor_pair_connectivity_timeseries = path_capacity[:, (tor_pair[1] - tor_pair[0]) % num_tors]
 	# Here compute the pdf
-	max_entry = max(tor_pair_connectivity_timeseries)
-	pdf = [0] * (max_entry + 1)
-	for connectivity in tor_pair_connectivity_timeseries:
-		pdf[connectivity] += 1./len(tor_connectivity_schedules)
-	return np.arange(max_entry + 1), pdf
+	pdf = np.bincount(tor_pair_connectivity_timeseries) / float(len(tor_pair_connectivity_timeseries))
+	return np.arange(len(pdf)), pdf.tolist()
 
 def shade_curve(x, y, ymin, axis_reference, c_arg=(1,0,0)):
 	axis_reference.fill_between(x, y, ymin, alpha=0.09, color=c_arg)
@@ -2,8 +2,9 @@
 Topological analysis for maximum network size.
 '''
 import numpy as np
-from gurobipy import *
 import math
+import design_space_sweep
+import mesh_pod_degree_solver
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import matplotlib.image as img
@@ -21,42 +22,26 @@ markersize_arg = 4
 
 color_cycle = ['black','red','lime','blue','darkcyan','blueviolet','deeppink']
 
-# Computes the maximum number of nodes we can support given a node degree and a diameter
+# Computes the maximum number of nodes we can support given a node degree and a diameter, in exact integer arithmetic
 def compute_moore_bound(node_degree, diameter):
 	moore_bound = -1
 	if node_degree == 2:
 		moore_bound = 2 * diameter + 1
 	elif node_degree > 2:
-		moore_bound = 1 + node_degree * ((node_degree - 1) ** diameter - 1) / (node_degree - 2)
+		moore_bound = 1 + node_degree * ((node_degree - 1) ** diameter - 1) // (node_degree - 2)
 	return int(moore_bound)
 
 
-# Given a per ToR node degree, computes the relative subscription factor delta that maximizes pod level diameter.
+# Given a per ToR node degree, computes the number of inter-pod links per ToR that maximizes the pod degree, and that pod degree.
+# Solved by mesh_pod_degree_solver.default_solver, which uses exact enumeration unless configured otherwise.
 def maximize_mesh_pod_degree(per_node_degree):
-	model = Model("Maximize pod degree given node degree: {}".format(per_node_degree))
-	model.setParam( 'OutputFlag', False)
-	# Let delta be the fraction of links used for INTER-pod wiring
-	delta = model.addVar(lb=0., ub=1, obj=1, vtype=GRB.CONTINUOUS, name="delta")
-	objective_function = QuadExpr()
-	objective_function.add(delta, mult=per_node_degree ** 2 + per_node_degree)
-	objective_function.add(delta * delta, mult=-per_node_degree ** 2)
-	model.setObjective(objective_function, GRB.MAXIMIZE) 
-	model.optimize()
-	delta_val = delta.x
-	n1 = int(math.floor(per_node_degree * delta_val))
-	n2 = int(math.ceil(per_node_degree * delta_val))
-	pod_uplinks_1 = ((per_node_degree - n1) + 1) * n1
-	pod_uplinks_2 = ((per_node_degree - n2) + 1) * n2
-	if pod_uplinks_1 >= pod_uplinks_2:
-		return n1, pod_uplinks_1
-
-	return n2, pod_uplinks_2
+	return mesh_pod_degree_solver.maximize_mesh_pod_degree(per_node_degree)
 
 def tor_reconfigurable_network_designer(tor_num_uplinks, tor_level_diameter, num_dimensions=1):
 	if tor_num_uplinks == 0:
 		return 0, 0
 	num_dimensions = min(tor_num_uplinks, num_dimensions)
-	per_dimension_num_uplinks = tor_num_uplinks / num_dimensions
+	per_dimension_num_uplinks = tor_num_uplinks // num_dimensions
 	leftover = tor_num_uplinks % num_dimensions
 	num_uplinks_in_dim = [per_dimension_num_uplinks] * num_dimensions
 	for i in range(leftover):
@@ -79,7 +64,7 @@ def twotiered_pod_reconfigurable_network_designer(tor_num_uplinks, pod_level_dia
 	num_tors_per_pod = tor_num_uplinks
 	fraction_of_northbound_links_per_pod = float(oversubscription_ratio[1]) * 2. / (oversubscription_ratio[0] + oversubscription_ratio[1])
 	assert(fraction_of_northbound_links_per_pod <= 1 and fraction_of_northbound_links_per_pod > 0)
-	num_uplinks_per_pod = int(fraction_of_northbound_links_per_pod * (tor_num_uplinks * num_tors_per_pod))
+	num_uplinks_per_pod = int((2 * oversubscription_ratio[1] * tor_num_uplinks * num_tors_per_pod) // (oversubscription_ratio[0] + oversubscription_ratio[1]))
 	# Finally, since each pod has the number of uplinks computed, we want to find the maximum number of pods using moore 
 	# bound given per-pod uplinks and inter-pod diameter.
 	max_pods = int(compute_moore_bound(num_uplinks_per_pod, pod_level_diameter))
@@ -118,64 +103,15 @@ def fully_subscribed_clos_designer(tor_num_uplinks, levels):
 	total_switches = (2 * levels - 1) * tor_num_uplinks ** (levels - 1)
 	return max_num_servers, 0, total_switches * tor_num_uplinks * 2, 0
 
-def ocs_scalability_analysis():
+def ocs_scalability_analysis(eps_radix=32):
 	ocs_radices = np.arange(4, 320, 4)
-	eps_radix = 32
-	servers_per_tor = eps_radix // 2
-	num_uplinks_per_tor = eps_radix - servers_per_tor
-	# ToR 1D 2 hop
-	maximum_tors = compute_moore_bound(num_uplinks_per_tor, 2)
-	tors_1D_num_servers = []
-	for ocs_radix in ocs_radices:
-		if ocs_radix >= maximum_tors:
-			tors_1D_num_servers.append(maximum_tors * servers_per_tor)
-		else:
-			tors_1D_num_servers.append(ocs_radix * servers_per_tor)
-	# ToR 2D 2 hop
-	tors_2D_num_servers = []
-	maximum_tors_per_dim = compute_moore_bound(num_uplinks_per_tor // 2, 1)
-	print("maximum nD : {} maximum flat: {}".format(maximum_tors_per_dim ** 2, maximum_tors))
-	for ocs_radix in ocs_radices: 
-		if ocs_radix >= maximum_tors_per_dim:
-			total_tors = maximum_tors_per_dim ** 2
-			tors_2D_num_servers.append(total_tors * servers_per_tor)
-		else:
-			tors_per_dim = ocs_radix
-			total_tors = tors_per_dim ** 2
-			tors_2D_num_servers.append(total_tors * servers_per_tor)
-	# Mesh pod
-	pod_mesh_num_servers = []
-	for ocs_radix in ocs_radices:
-		number_of_groups = ocs_radix
-		# For each total number of pods, we need to make sure that a * h >= number_of_groups - 1, such that a - 1 + h = r/2
-		max_num_servers = 0
-		for h in range(1, num_uplinks_per_tor, 1):
-			a = num_uplinks_per_tor + 1 - h
-			if a * h >= number_of_groups - 1:
-				max_num_servers = max(max_num_servers, number_of_groups * a * servers_per_tor)
-		prev_entry_size = 0
-		if len(pod_mesh_num_servers) > 0:
-			prev_entry_size = pod_mesh_num_servers[-1]
-		new_entry = max(max_num_servers, prev_entry_size)
-		if new_entry == 0:
-			new_entry = 0.1
-		pod_mesh_num_servers.append(new_entry)
-	# 2-layered pod, no oversub
-	pod_2tiered_num_servers = []
-	for ocs_radix in ocs_radices:
-		num_tors_per_pod = (eps_radix / 2)
-		num_uplinks_per_pod = (eps_radix / 2) * num_tors_per_pod
-		num_pods = min(ocs_radix, num_uplinks_per_pod + 1)
-		total_servers = num_tors_per_pod * servers_per_tor * num_pods
-		pod_2tiered_num_servers.append(total_servers)
-	# 2-layered pod, 4:1 oversub
-	pod_2tiered_4to1_num_servers = []
-	for ocs_radix in ocs_radices:
-		num_tors_per_pod = (eps_radix / 2)
-		num_uplinks_per_pod = (eps_radix / 2) * num_tors_per_pod / 4
-		num_pods = min(ocs_radix, num_uplinks_per_pod + 1)
-		total_servers = num_tors_per_pod * servers_per_tor * num_pods
-		pod_2tiered_4to1_num_servers.append(total_servers)
+	surface = design_space_sweep.compute_ocs_scalability_surface([eps_radix], ocs_radices)
+	tors_1D_num_servers = surface["trn_flat"][0]
+	tors_2D_num_servers = surface["trn_2d"][0]
+	# Empty entries are plotted just above 0, for the log scale.
+	pod_mesh_num_servers = np.where(surface["prn_mesh"][0] == 0, 0.1, surface["prn_mesh"][0])
+	pod_2tiered_num_servers = surface["prn_2tiered_1to1"][0]
+	pod_2tiered_4to1_num_servers = surface["prn_2tiered_4to1"][0]
 	mpl.rcParams.update({"pgf.texsystem": "pdflatex", 'font.family': 'serif', 'text.usetex': True, 'pgf.rcfonts': False, 'text.latex.preamble': r'\newcommand{\mathdefault}[1][]{}'})
 	fig, ax = plt.subplots(1,1, figsize=(fig_width, fig_height), dpi=200)
 	ax.plot(ocs_radices, tors_1D_num_servers, linestyle='-', linewidth=linewidth_arg, color='darkcyan', marker='+', markerfacecolor='none', markersize=markersize_arg, markevery=12)
@@ -198,36 +134,38 @@ def ocs_scalability_analysis():
 	
 def scalability_analysis():
 	num_uplinks = np.arange(4, 65, 2)
+	design_space = design_space_sweep.sweep_design_space(num_uplinks, diameters=(1, 2, 3), num_dimensions=(1, 2, 3), oversubscription_ratios=((1, 1), (4, 1)), clos_levels=(3, 4))
+	select = lambda **column_values: design_space_sweep.select_design_points(design_space, **column_values)["max_num_servers"]
 	# Mesh pod-reconfigurable
-	mesh_pod = [mesh_pod_reconfigurable_network_designer(x, 1) for x in num_uplinks]
+	mesh_pod = select(topology="prn_mesh", diameter=1)
 	# 2-tiered clos pod-reconfigurable
-	tiered_1to1_pod = [twotiered_pod_reconfigurable_network_designer(x, 1, oversubscription_ratio=(1,1)) for x in num_uplinks]
-	tiered_4to1_pod = [twotiered_pod_reconfigurable_network_designer(x, 1, oversubscription_ratio=(4,1)) for x in num_uplinks]
+	tiered_1to1_pod = select(topology="prn_2tiered", diameter=1, oversubscription_numerator=1, oversubscription_denominator=1)
+	tiered_4to1_pod = select(topology="prn_2tiered", diameter=1, oversubscription_numerator=4, oversubscription_denominator=1)
 	# ToR-reconfigurables
-	tor_dimension1_diameter1 = [tor_reconfigurable_network_designer(x, 1, num_dimensions=1) for x in num_uplinks]
-	tor_dimension1_diameter2 = [tor_reconfigurable_network_designer(x, 2, num_dimensions=1) for x in num_uplinks]
-	tor_dimension1_diameter3 = [tor_reconfigurable_network_designer(x, 3, num_dimensions=1) for x in num_uplinks]
-	tor_dimension2_diameter1 = [tor_reconfigurable_network_designer(x, 1, num_dimensions=2) for x in num_uplinks]
-	tor_dimension3_diameter1 = [tor_reconfigurable_network_designer(x, 1, num_dimensions=3) for x in num_uplinks]
+	tor_dimension1_diameter1 = select(topology="trn", diameter=1, num_dimensions=1)
+	tor_dimension1_diameter2 = select(topology="trn", diameter=2, num_dimensions=1)
+	tor_dimension1_diameter3 = select(topology="trn", diameter=3, num_dimensions=1)
+	tor_dimension2_diameter1 = select(topology="trn", diameter=1, num_dimensions=2)
+	tor_dimension3_diameter1 = select(topology="trn", diameter=1, num_dimensions=3)
 	# Clos
-	clos_layer3 = [fully_subscribed_clos_designer(x, 3) for x in num_uplinks]
-	clos_layer4 = [fully_subscribed_clos_designer(x, 4) for x in num_uplinks]
+	clos_layer3 = select(topology="clos", levels=3)
+	clos_layer4 = select(topology="clos", levels=4)
 
 	# Dragonfly (Canonical)
-	dfly_canonical = [dragonfly_network_designer(x, 1) for x in num_uplinks]
+	dfly_canonical = select(topology="dragonfly")
 
 	# Plotting
 	mpl.rcParams.update({"pgf.texsystem": "pdflatex", 'font.family': 'serif', 'text.usetex': True, 'pgf.rcfonts': False, 'text.latex.preamble': r'\newcommand{\mathdefault}[1][]{}'})
 	fig, ax1 = plt.subplots(1, 1, figsize=(fig_width, fig_height), dpi=200)
 	eps_radices = [2 * x for x in num_uplinks]
-	ax1.plot(eps_radices, [x[0] for x in tor_dimension1_diameter2], linestyle='--', linewidth=linewidth_arg, color='darkcyan', marker='+', markerfacecolor='none', markersize=markersize_arg, markevery=4)
-	ax1.plot(eps_radices, [x[0] for x in tor_dimension2_diameter1], linestyle='-.', linewidth=linewidth_arg, color='darkblue', marker='^', markerfacecolor='none', markersize=markersize_arg, markevery=4)
-	ax1.plot(eps_radices, [x[0] for x in mesh_pod], color='lime',  marker='s', markevery=4, linewidth=linewidth_arg, markerfacecolor='none', markersize=markersize_arg)
-	ax1.plot(eps_radices, [x[0] for x in tiered_1to1_pod], color='red', marker='x', markevery=4, linewidth=linewidth_arg, markerfacecolor='none', markersize=markersize_arg)
-	ax1.plot(eps_radices, [x[0] for x in tiered_4to1_pod], color='darkred', marker='d', markevery=4, linewidth=linewidth_arg, markerfacecolor='none', markersize=markersize_arg)
-	ax1.plot(eps_radices, [x[0] for x in dfly_canonical], linestyle=(0, (1, 1)), linewidth=linewidth_arg, color='orange', marker='h', markerfacecolor='none', markersize=markersize_arg, markevery=6)
-	ax1.plot(eps_radices, [x[0] for x in clos_layer3], linewidth=linewidth_arg, color='black', linestyle='--')
-	ax1.plot(eps_radices, [x[0] for x in clos_layer4], linewidth=linewidth_arg, color='black')
+	ax1.plot(eps_radices, tor_dimension1_diameter2, linestyle='--', linewidth=linewidth_arg, color='darkcyan', marker='+', markerfacecolor='none', markersize=markersize_arg, markevery=4)
+	ax1.plot(eps_radices, tor_dimension2_diameter1, linestyle='-.', linewidth=linewidth_arg, color='darkblue', marker='^', markerfacecolor='none', markersize=markersize_arg, markevery=4)
+	ax1.plot(eps_radices, mesh_pod, color='lime',  marker='s', markevery=4, linewidth=linewidth_arg, markerfacecolor='none', markersize=markersize_arg)
+	ax1.plot(eps_radices, tiered_1to1_pod, color='red', marker='x', markevery=4, linewidth=linewidth_arg, markerfacecolor='none', markersize=markersize_arg)
+	ax1.plot(eps_radices, tiered_4to1_pod, color='darkred', marker='d', markevery=4, linewidth=linewidth_arg, markerfacecolor='none', markersize=markersize_arg)
+	ax1.plot(eps_radices, dfly_canonical, linestyle=(0, (1, 1)), linewidth=linewidth_arg, color='orange', marker='h', markerfacecolor='none', markersize=markersize_arg, markevery=6)
+	ax1.plot(eps_radices, clos_layer3, linewidth=linewidth_arg, color='black', linestyle='--')
+	ax1.plot(eps_radices, clos_layer4, linewidth=linewidth_arg, color='black')
 	
 	#ax1.plot(eps_radices, [x[0] for x in tor_dimension1_diameter3], linestyle='--', linewidth=linewidth_arg, color='gray')
 	#ax1.plot([x[0] for x in clos_layer4], num_uplinks, linewidth=linewidth_arg)